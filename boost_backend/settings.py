@@ -76,6 +76,10 @@ MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware', # Requis pour servir les CSS/JS sur Render
+    'core.middleware.InstrumentationMiddleware',  # Durée totale, compression comprise (cf. core/metrics.py)
+    'core.middleware.QueryBudgetMiddleware',      # DEBUG uniquement : N+1 et budgets SQL (cf. core/querybudget.py)
+    'core.middleware.CompressionMiddleware',      # Après WhiteNoise : les statiques ne sont jamais recompressés
+    'core.middleware.PayloadMetricsMiddleware',   # Taille avant compression
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -102,6 +106,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'boost_backend.wsgi.application'
+ASGI_APPLICATION = 'boost_backend.asgi.application'
 
 # --- BASE DE DONNÉES (NEON.TECH) ---
 DATABASES = {
@@ -120,6 +125,41 @@ db_from_env = dj_database_url.config(conn_max_age=600)
 if db_from_env:
     DATABASES['default'].update(db_from_env)
 
+# --- ASGI (python -m uvicorn boost_backend.asgi:application --workers 4) ---
+# Threads par worker pour l'ORM et le stockage des vues async (core/async_views.py) ;
+# chaque thread peut garder une connexion ouverte à la base.
+ASYNC_IO_THREADS = int(os.environ.get('ASYNC_IO_THREADS', '16'))
+
+# --- COMPRESSION & BUDGET DES RÉPONSES ---
+# Réponses authentifiées : gzip avec bourrage aléatoire uniquement (BREACH,
+# cf. CompressionMiddleware).
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', '1024'))  # octets
+PAYLOAD_BUDGET_BYTES = int(os.environ.get('PAYLOAD_BUDGET_BYTES', str(256 * 1024)))
+# Budgets par endpoint (nom de route DRF), ex. {'feed-list': 64 * 1024}
+PAYLOAD_BUDGETS = {}
+
+# --- CACHE ---
+# Les compteurs de version (ETag) doivent être partagés entre les workers :
+# Redis en production, mémoire locale en développement (un seul processus).
+# Les tâches de fond (run_boost_scheduler, refresh_audience_cube, build_feed_snapshots)
+# publient leurs résultats dans ce cache : Redis est requis pour que les workers
+# les voient aussitôt. En mémoire locale, l'index des boosts n'est gardé que
+# quelques secondes et le fil est calculé sans instantané.
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 # --- AUTHENTIFICATION ---
 AUTH_USER_MODEL = 'core.User'
 
@@ -138,8 +178,89 @@ REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
     'DEFAULT_PERMISSION_CLASSES': ['rest_framework.permissions.IsAuthenticated'],
     'EXCEPTION_HANDLER': 'rest_framework.views.exception_handler',
+    # orjson seulement avec FAST_SERIALIZATION ; sinon le rendu JSON de DRF (cf. core/renderers.py)
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
+# Chemin de sérialisation rapide (.values() + orjson) pour les listes en lecture seule
+FAST_SERIALIZATION = os.environ.get('FAST_SERIALIZATION', 'False') == 'True'
+
+# Durée (secondes) pendant laquelle un ETag du fil reste valide : seules les écritures
+# qui concernent le lecteur l'invalident avant (cf. FeedViewSet.get_version_scopes)
+FEED_VALIDATOR_WINDOW = int(os.environ.get('FEED_VALIDATOR_WINDOW', '300'))
+
+# --- INSTRUMENTATION (core/metrics.py, /api/_metrics) ---
+# Fraction des requêtes dont le SQL et le rendu sont mesurés (la durée l'est toujours) :
+# le relevé du SQL a un coût par ordre, on n'en échantillonne qu'une petite part en production.
+METRICS_SAMPLE_RATE = float(os.environ.get('METRICS_SAMPLE_RATE', '1.0' if DEBUG else '0.05'))
+# Requêtes journalisées avec leur SQL au-delà de N ms (0 = désactivé), et nombre d'ordres SQL relevés
+SLOW_REQUEST_MS = int(os.environ.get('SLOW_REQUEST_MS', '1000'))
+SLOW_REQUEST_SQL = int(os.environ.get('SLOW_REQUEST_SQL', '5'))
+# Adresses autorisées à lire /api/_metrics (Prometheus sur la même machine)
+METRICS_ALLOWED_IPS = os.environ.get('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',')
+# Budgets SQL (core/querybudget.py) : une même forme de requête exécutée plus de N fois
+# dans une requête HTTP est un N+1 (signalé en DEBUG, fait échouer les tests)
+QUERY_REPEAT_LIMIT = int(os.environ.get('QUERY_REPEAT_LIMIT', '2'))
+
+# --- COMMENTAIRES ---
+# Réponses incluses par fil dans /api/comments/threads/ (?replies=, plafonné)
+COMMENT_THREAD_REPLIES = int(os.environ.get('COMMENT_THREAD_REPLIES', '3'))
+COMMENT_THREAD_REPLIES_MAX = int(os.environ.get('COMMENT_THREAD_REPLIES_MAX', '20'))
+
+# --- INTERACTIONS (core/interactions.py) ---
+# Fenêtre de durabilité (secondes) des likes, unlikes et partages en attente ; 0 = écriture immédiate
+INTERACTION_FLUSH_INTERVAL = int(os.environ.get('INTERACTION_FLUSH_INTERVAL', '2'))
+# Écriture anticipée dès que le tampon atteint N événements
+INTERACTION_BUFFER_SIZE = int(os.environ.get('INTERACTION_BUFFER_SIZE', '1000'))
+# Actions maximales par requête de /api/interactions/batch/
+INTERACTION_BATCH_MAX = int(os.environ.get('INTERACTION_BATCH_MAX', '500'))
+
+# --- FIL DES PROFILS (core/timelines.py) ---
+# Cache (secondes) de la première page du fil d'un profil ; 0 = désactivé
+PROFILE_TIMELINE_CACHE_TTL = int(os.environ.get('PROFILE_TIMELINE_CACHE_TTL', '300'))
+
+# --- INSTANTANÉS DU FIL (core/snapshots.py) ---
+# Période (secondes) du calcul (python manage.py build_feed_snapshots --loop)
+FEED_SNAPSHOT_INTERVAL = int(os.environ.get('FEED_SNAPSHOT_INTERVAL', '300'))
+# Durée de vie d'un instantané : au-delà, sans nouveau passage, le fil est classé en entier
+FEED_SNAPSHOT_TTL = int(os.environ.get('FEED_SNAPSHOT_TTL', '900'))
+# Posts classés par segment, dont la première moitié est servie (10 pages de 10) ; 0 = désactivé
+FEED_SNAPSHOT_SIZE = int(os.environ.get('FEED_SNAPSHOT_SIZE', '200'))
+# Amis + abonnements au-delà desquels le fil d'un lecteur est classé en entier
+FEED_SNAPSHOT_MAX_AFFINITY = int(os.environ.get('FEED_SNAPSHOT_MAX_AFFINITY', '20'))
+# Utilisateurs minimum d'un segment pour qu'il ait son propre instantané
+FEED_SNAPSHOT_MIN_USERS = int(os.environ.get('FEED_SNAPSHOT_MIN_USERS', '50'))
+
+# --- BOOSTS ---
+# Période (secondes) de l'ordonnanceur (python manage.py run_boost_scheduler --loop)
+BOOST_SCHEDULER_INTERVAL = int(os.environ.get('BOOST_SCHEDULER_INTERVAL', '60'))
+# Durée de vie maximale de l'index des boosts actifs en cache (invalidé à chaque écriture).
+# Sans Redis, les transitions de l'ordonnanceur (autre processus) n'invalident pas le
+# cache des workers : elles n'apparaissent dans le fil qu'à l'expiration de l'index.
+BOOST_INDEX_TTL = int(os.environ.get('BOOST_INDEX_TTL', '300' if REDIS_URL else '15'))
+# Durée de vie du cube d'audience en cache (cf. core/audience.py). Sans Redis, un cube
+# recalculé par refresh_audience_cube (autre processus) n'est relu en base qu'à l'expiration.
+AUDIENCE_CUBE_CACHE_TTL = int(os.environ.get('AUDIENCE_CUBE_CACHE_TTL', '3600' if REDIS_URL else '60'))
+# Coût facturé pour 1000 impressions d'un post boosté
+BOOST_CPM = os.environ.get('BOOST_CPM', '2.00')
+# Tampon des impressions : écriture en masse toutes les N secondes ou à N lignes
+BOOST_IMPRESSION_FLUSH_INTERVAL = int(os.environ.get('BOOST_IMPRESSION_FLUSH_INTERVAL', '5'))
+BOOST_IMPRESSION_BUFFER_SIZE = int(os.environ.get('BOOST_IMPRESSION_BUFFER_SIZE', '1000'))
+# Avance de dépense (fraction du budget) à partir de laquelle le bonus est nul
+BOOST_PACING_TOLERANCE = float(os.environ.get('BOOST_PACING_TOLERANCE', '0.1'))
+# Conservation (secondes) des clés d'idempotence de /api/boosts/{id}/pay/
+IDEMPOTENCY_KEY_TTL = int(os.environ.get('IDEMPOTENCY_KEY_TTL', '86400'))
+
+# --- STATISTIQUES DES BOOSTS (python manage.py aggregate_boost_stats) ---
+# Délai avant d'agréger une heure close (impressions encore dans le tampon)
+ROLLUP_LAG = int(os.environ.get('ROLLUP_LAG', '120'))
+ROLLUP_INTERVAL = int(os.environ.get('ROLLUP_INTERVAL', '300'))
+# Rattrapage borné : heures traitées au plus par passage
+ROLLUP_MAX_HOURS = int(os.environ.get('ROLLUP_MAX_HOURS', '168'))
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
@@ -196,6 +317,24 @@ DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# --- UPLOADS (core/uploads.py) ---
+# Dépôt local servi tout de suite (URL provisoire), avant l'envoi au stockage distant
+MEDIA_STAGING_ROOT = os.path.join(MEDIA_ROOT, 'staging')
+MEDIA_STAGING_URL = MEDIA_URL + 'staging/'
+# Stockage distant ; core.storage.LocalStubStorage pour travailler hors ligne
+MEDIA_REMOTE_BACKEND = os.environ.get('MEDIA_REMOTE_BACKEND', 'cloudinary_storage.storage.MediaCloudinaryStorage')
+MEDIA_PUSH_WORKERS = int(os.environ.get('MEDIA_PUSH_WORKERS', '4'))
+MEDIA_PUSH_MAX_ATTEMPTS = int(os.environ.get('MEDIA_PUSH_MAX_ATTEMPTS', '5'))
+# Délai avant le 2e essai (secondes), doublé à chaque échec
+MEDIA_PUSH_RETRY_DELAY = int(os.environ.get('MEDIA_PUSH_RETRY_DELAY', '5'))
+# Envoi sans nouvelles depuis ce délai : relancé par l'ordonnanceur (worker arrêté)
+MEDIA_PUSH_STALE_AFTER = int(os.environ.get('MEDIA_PUSH_STALE_AFTER', '300'))
+# Conservation de la copie locale après l'envoi (clients qui ont encore l'URL provisoire)
+MEDIA_STAGING_TTL = int(os.environ.get('MEDIA_STAGING_TTL', '3600'))
+# Simulation d'un stockage lent ou instable (LocalStubStorage uniquement)
+MEDIA_STUB_LATENCY = float(os.environ.get('MEDIA_STUB_LATENCY', '0'))
+MEDIA_STUB_FAILURE_RATE = float(os.environ.get('MEDIA_STUB_FAILURE_RATE', '0'))
+
 # --- DIVERS ---
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -229,6 +368,13 @@ STORAGES = {
     "staticfiles": {
         "BACKEND": "whitenoise.storage.StaticFilesStorage",
     },
+    "media_staging": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+        "OPTIONS": {"location": MEDIA_STAGING_ROOT, "base_url": MEDIA_STAGING_URL},
+    },
+    "media_remote": {
+        "BACKEND": MEDIA_REMOTE_BACKEND,
+    },
 }
 WHITENOISE_MANIFEST_STRICT = False
 WHITENOISE_USE_FINDERS = True
\ No newline at end of file
@@ -15,11 +15,11 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings               # <--- Import nécessaire
 from django.conf.urls.static import static     # <--- Import nécessaire
 from rest_framework_simplejwt.views import TokenRefreshView
-from core.views import MyTokenObtainPairView
+from core.views import MyTokenObtainPairView, staged_media
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -28,6 +28,8 @@ urlpatterns = [
     path('api/', include('core.urls')),
     path('api/token/', MyTokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    # URL provisoires des uploads, avant les médias servis en DEBUG (cf. core.views.staged_media).
+    re_path(rf"^{settings.MEDIA_STAGING_URL.lstrip('/')}(?P<path>.+)$", staged_media),
 ]
 
 
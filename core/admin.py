@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import User, Page, Post, Boost, PageSubscription, Like, Comment, Share
+from .models import User, Page, Post, Boost, PageSubscription, Like, Comment, Share, MediaUpload
 
 # Enregistrement des modèles
 @admin.register(User)
@@ -21,7 +21,7 @@ class PostAdmin(admin.ModelAdmin):
 
 @admin.register(Boost)
 class BoostAdmin(admin.ModelAdmin):
-    list_display = ('id', 'user', 'target_type', 'status', 'start_date', 'end_date')
+    list_display = ('id', 'user', 'target_type', 'status', 'start_date', 'end_date', 'impressions', 'spent')
     list_filter = ('status', 'target_type', 'start_date', 'end_date')
 
 @admin.register(PageSubscription)
@@ -38,6 +38,15 @@ class CommentAdmin(admin.ModelAdmin):
     list_display = ('user', 'post', 'created_at')
     search_fields = ('content',)
 
+    def get_readonly_fields(self, request, obj=None):
+        # Fil fixé à la création (cf. core/signals.py) : pas de déplacement.
+        return ('post', 'parent_comment') if obj else ()
+
 @admin.register(Share)
 class ShareAdmin(admin.ModelAdmin):
-    list_display = ('user', 'post', 'id')
\ No newline at end of file
+    list_display = ('user', 'post', 'id')
+
+@admin.register(MediaUpload)
+class MediaUploadAdmin(admin.ModelAdmin):
+    list_display = ('name', 'user', 'status', 'attempts', 'created_at', 'updated_at')
+    list_filter = ('status',)
@@ -0,0 +1,184 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.paginator import Page as DjangoPage
+from django.db import close_old_connections
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from . import boosts, uploads
+from .renderers import ORJSONRenderer
+from .serializers import PostSerializer
+from .views import FeedViewSet, GlobalSearchView, MediaUploadView
+
+# Versions async (ASGI) des endpoints dominés par les entrées/sorties :
+# /api/async/feed/, /api/async/search/ et /api/async/upload/, avec les mêmes
+# réponses que leurs équivalents DRF. Sous ASGI, un worker n'est plus bloqué
+# pendant l'écriture d'un upload, et les lectures indépendantes du fil (amis,
+# abonnements, boosts, puis comptage et page) partent en parallèle.
+#
+# L'ORM reste synchrone : chaque lecture passe par run_io(), dans un pool de
+# ASYNC_IO_THREADS threads. Chaque thread a sa propre connexion à la base :
+# la taille du pool borne aussi le nombre de connexions ouvertes par worker.
+
+executor = ThreadPoolExecutor(max_workers=settings.ASYNC_IO_THREADS, thread_name_prefix='async-io')
+renderer = ORJSONRenderer()
+
+
+def run_io(func, *args):
+    """Exécute func(*args) dans le pool sans bloquer la boucle d'événements."""
+    def call():
+        # Même cycle de vie des connexions que pour une requête synchrone (CONN_MAX_AGE).
+        close_old_connections()
+        try:
+            return func(*args)
+        finally:
+            close_old_connections()
+    return sync_to_async(call, thread_sensitive=False, executor=executor)()
+
+
+def render(data, status_code=status.HTTP_200_OK):
+    return HttpResponse(renderer.render(data), content_type='application/json', status=status_code)
+
+
+async def authenticate(request):
+    """
+    Authentification DRF (JWT) : (requête DRF, None), ou (None, réponse 401).
+    La lecture de l'utilisateur est une requête SQL, faite hors de la boucle.
+    """
+    authenticators = [authenticator() for authenticator in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    drf_request = Request(request, authenticators=authenticators)
+    try:
+        user = await run_io(lambda: drf_request.user)
+    except exceptions.APIException as exc:
+        error = exc
+    else:
+        if user.is_authenticated:
+            return drf_request, None
+        error = exceptions.NotAuthenticated()
+
+    # Même corps que le gestionnaire d'exceptions de DRF.
+    data = error.detail if isinstance(error.detail, (list, dict)) else {'detail': error.detail}
+    response = render(data, status.HTTP_401_UNAUTHORIZED)
+    if authenticators:
+        response.headers['WWW-Authenticate'] = authenticators[0].authenticate_header(drf_request)
+    return None, response
+
+
+@require_GET
+async def feed(request):
+    drf_request, error = await authenticate(request)
+    if error is not None:
+        return error
+
+    view = FeedViewSet(request=drf_request, action='list', format_kwarg=None, args=(), kwargs={})
+    scopes = await run_io(view.get_version_scopes, drf_request)
+    etag, last_modified = await run_io(view.get_validators, drf_request, scopes)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = await feed_page(view, drf_request)
+        if response.status_code != status.HTTP_200_OK:
+            return response
+    return view.set_validators(response, etag, last_modified)
+
+
+async def feed_page(view, drf_request):
+    # Lecteur servi par un instantané (cf. core/snapshots.py) : lectures du cache et une page.
+    response = await run_io(view.snapshot_response, drf_request)
+    if response is not None:
+        return render(response.data)
+
+    user = drf_request.user
+    now = timezone.now()
+    friend_ids, page_ids, active_boosts = await asyncio.gather(
+        run_io(view.viewer_friends, user),
+        run_io(lambda: list(view.subscribed_page_ids(user))),
+        run_io(boosts.active_boosts, now),
+    )
+    queryset = await run_io(view.build_queryset, user, now, friend_ids, page_ids, active_boosts)
+
+    # Même pagination que PageNumberPagination, mais comptage et page en parallèle.
+    paginator = view.paginator
+    page_size = paginator.get_page_size(drf_request)
+    try:
+        number = int(drf_request.query_params.get(paginator.page_query_param, 1))
+    except ValueError:
+        number = 0
+    if number < 1:
+        return render({'detail': paginator.invalid_page_message}, status.HTTP_404_NOT_FOUND)
+
+    fast_serializer = None
+    rows = queryset
+    if getattr(settings, 'FAST_SERIALIZATION', False):
+        fast_serializer = view.fast_serializer_class(context=view.get_serializer_context())
+        rows = fast_serializer.values(queryset)
+
+    offset = (number - 1) * page_size
+    count, rows = await asyncio.gather(
+        run_io(queryset.count),
+        run_io(list, rows[offset:offset + page_size]),
+    )
+    if not rows and number > 1:
+        return render({'detail': paginator.invalid_page_message}, status.HTTP_404_NOT_FOUND)
+
+    view.record_impressions(rows)
+    if fast_serializer is not None:
+        data = await run_io(fast_serializer.serialize, rows)
+    else:
+        data = await run_io(serialize_page, view, rows)
+
+    django_paginator = paginator.django_paginator_class(queryset, page_size)
+    django_paginator.count = count
+    paginator.page = DjangoPage(rows, number, django_paginator)
+    paginator.request = drf_request
+    return render(paginator.get_paginated_response(data).data)
+
+
+def serialize_page(view, posts):
+    # Comme FeedViewSet.paginate_queryset : is_liked et likes en attente en une lecture pour la page.
+    PostSerializer.attach_engagement(posts, view.request.user)
+    return view.get_serializer(posts, many=True).data
+
+
+@require_GET
+async def search(request):
+    drf_request, error = await authenticate(request)
+    if error is not None:
+        return error
+
+    query = drf_request.query_params.get('q', '').strip()
+    if not query:
+        return render({'users': [], 'pages': []})
+
+    users, pages = await asyncio.gather(
+        run_io(GlobalSearchView.search_users, query),
+        run_io(GlobalSearchView.search_pages, query),
+    )
+    return render({'users': users, 'pages': pages})
+
+
+# Authentification par JWT (en-tête Authorization, pas de cookie) : pas de CSRF,
+# comme pour les vues DRF.
+@csrf_exempt
+@require_POST
+async def upload(request):
+    drf_request, error = await authenticate(request)
+    if error is not None:
+        return error
+
+    # Le multipart est lu depuis un fichier temporaire au-delà de quelques Mo.
+    file_obj = await run_io(lambda: request.FILES.get('file'))
+    if not file_obj:
+        return render({'error': 'Aucun fichier fourni'}, status.HTTP_400_BAD_REQUEST)
+    try:
+        return render(await run_io(MediaUploadView.store, drf_request, file_obj))
+    except uploads.UnsupportedMedia as exc:
+        return render({'error': str(exc)}, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,151 @@
+from collections import Counter, defaultdict
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from . import locations
+from .models import User, AudienceCube
+
+# Cube d'audience : nombre d'utilisateurs par ville × genre × tranche d'âge,
+# avec les agrégats partiels ('*' = toutes valeurs) précalculés. Une estimation
+# de portée lit quelques cellules au lieu de parcourir la table User.
+#
+# Clés des cellules : 'ville|genre|tranche', ex. 'douala|FEMALE|25', 'douala|*|*',
+# où la ville est User.city_key (cf. core/locations.py).
+# Les centres d'intérêt sont comptés par ville (et '*') ; leur intersection avec
+# les autres critères est estimée en les supposant indépendants.
+
+AGE_BAND = 5
+WILDCARD = '*'
+UNKNOWN = '?'
+CACHE_KEY = 'audience-cube'
+
+GENDERS = {
+    'M': 'MALE', 'MALE': 'MALE', 'H': 'MALE', 'HOMME': 'MALE',
+    'F': 'FEMALE', 'FEMALE': 'FEMALE', 'FEMME': 'FEMALE',
+}
+
+
+def normalize_gender(value):
+    return GENDERS.get((value or '').strip().upper(), UNKNOWN)
+
+
+def normalize_interests(values):
+    return {item.strip().lower() for item in values or [] if isinstance(item, str) and item.strip()}
+
+
+def age_band(birth_date, today):
+    if birth_date is None:
+        return UNKNOWN
+    age = today.year - birth_date.year - ((today.month, today.day) < (birth_date.month, birth_date.day))
+    return str(age // AGE_BAND * AGE_BAND)
+
+
+def cell_key(city, gender, band):
+    return f'{city}|{gender}|{band}'
+
+
+def build_cube(today=None):
+    """Un seul parcours de User (colonnes utiles uniquement, par lots)."""
+    today = today or timezone.localdate()
+    cells = Counter()
+    interests = defaultdict(Counter)
+    cities, bands = set(), set()
+    regions = defaultdict(set)
+
+    rows = (
+        User.objects.filter(is_active=True)
+        .values_list('city_key', 'region_key', 'gender', 'birth_date', 'interests')
+        .iterator(chunk_size=5000)
+    )
+    for city, region, gender, birth_date, user_interests in rows:
+        city, gender, band = city or UNKNOWN, normalize_gender(gender), age_band(birth_date, today)
+        cities.add(city)
+        if region:
+            regions[region].add(city)
+        bands.add(band)
+        for c in (city, WILDCARD):
+            for g in (gender, WILDCARD):
+                for b in (band, WILDCARD):
+                    cells[cell_key(c, g, b)] += 1
+        tags = normalize_interests(user_interests)
+        interests[city].update(tags)
+        interests[WILDCARD].update(tags)
+
+    return {
+        'age_band': AGE_BAND,
+        'cities': sorted(cities),
+        'regions': {region: sorted(keys) for region, keys in regions.items()},
+        'bands': sorted(int(b) for b in bands if b != UNKNOWN),
+        'cells': dict(cells),
+        'interests': {city: dict(counts) for city, counts in interests.items()},
+    }
+
+
+def refresh():
+    data = build_cube()
+    cube = AudienceCube.objects.create(data=data, total_users=data['cells'].get(cell_key(WILDCARD, WILDCARD, WILDCARD), 0))
+    AudienceCube.objects.exclude(pk=cube.pk).delete()
+    cache.set(CACHE_KEY, cube, settings.AUDIENCE_CUBE_CACHE_TTL)
+    return cube
+
+
+def current_cube():
+    cube = cache.get(CACHE_KEY)
+    if cube is None:
+        cube = AudienceCube.objects.order_by('-computed_at').first()
+        if cube is not None:
+            # Durée finie : les workers qui ne partagent pas le cache du recalcul le relisent.
+            cache.set(CACHE_KEY, cube, settings.AUDIENCE_CUBE_CACHE_TTL)
+    return cube
+
+
+def _band_weights(data, age_min, age_max):
+    """Tranches couvertes par [age_min, age_max], avec la fraction couverte (âges supposés uniformes)."""
+    if age_min is None and age_max is None:
+        return [(WILDCARD, 1.0)]
+    width = data['age_band']
+    low = age_min if age_min is not None else 0
+    high = age_max if age_max is not None else 200
+    weights = []
+    for band in data['bands']:
+        overlap = min(high, band + width - 1) - max(low, band) + 1
+        if overlap > 0:
+            weights.append((str(band), overlap / width))
+    return weights
+
+
+def estimate(data, location=None, gender=None, age_min=None, age_max=None, interests=None):
+    """
+    Portée estimée d'un ciblage, avec la même sémantique que le Feed : même ville
+    ou ville de la région ciblée (clés canoniques), genre exact ('ALL' = tous),
+    âge dans [age_min, age_max], au moins un centre d'intérêt en commun.
+    Le coût dépend du nombre de villes et de tranches, pas du nombre d'utilisateurs.
+    """
+    cells = data['cells']
+    city_key, region_key = locations.resolve(location)
+    if city_key:
+        cities = [city_key]
+    elif region_key:
+        cities = data['regions'].get(region_key, [])
+    else:
+        cities = [WILDCARD]
+
+    gender = (gender or '').strip().upper()
+    gender = WILDCARD if gender in ('', 'ALL') else normalize_gender(gender)
+
+    bands = _band_weights(data, age_min, age_max)
+    tags = normalize_interests(interests)
+
+    reach = 0.0
+    for city in cities:
+        matched = sum(cells.get(cell_key(city, gender, band), 0) * weight for band, weight in bands)
+        if matched and tags:
+            population = cells.get(cell_key(city, WILDCARD, WILDCARD), 0)
+            counts = data['interests'].get(city, {})
+            miss = 1.0
+            for tag in tags:
+                miss *= 1 - counts.get(tag, 0) / population
+            matched *= 1 - miss
+        reach += matched
+    return round(reach)
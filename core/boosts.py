@@ -0,0 +1,127 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import versions
+from .models import Boost, BoostStatus, IdempotencyKey
+
+# Index des boosts actifs lu par le Feed à chaque requête. Il est mis en cache
+# sous la version 'boosts' (incrémentée à chaque écriture sur Boost, à chaque
+# transition de l'ordonnanceur et quand des impressions épuisent un budget) :
+# le Feed ne touche plus la table Boost tant qu'aucun statut ne change. Les
+# dépenses (spent, pacing) y sont vues avec au plus BOOST_INDEX_TTL de retard.
+
+INDEX_FIELDS = (
+    'id', 'target_id', 'target_type', 'budget', 'start_date', 'end_date',
+    'audience_location', 'audience_city_key', 'audience_region_key', 'audience_age_min', 'audience_age_max',
+    'audience_gender', 'audience_interests', 'audience_interests_mask', 'spent',
+)
+
+
+def _index_key(version):
+    return f'boost-index:{version}'
+
+
+def active_boosts(now=None):
+    """Boosts actifs dans leur fenêtre de diffusion à l'instant `now`."""
+    now = now or timezone.now()
+    current, _ = versions.get_versions('boosts')
+    key = _index_key(current['boosts'])
+
+    index = cache.get(key)
+    if index is None:
+        index = list(
+            Boost.objects.filter(status=BoostStatus.ACTIVE, end_date__gte=now)
+            .only(*INDEX_FIELDS)
+        )
+        cache.set(key, index, settings.BOOST_INDEX_TTL)
+
+    # Entre deux passages de l'ordonnanceur, un boost peut avoir expiré :
+    # le filtre sur les dates reste appliqué, mais sur une liste courte.
+    return [boost for boost in index if boost.start_date <= now <= boost.end_date]
+
+
+def run_lifecycle(now=None):
+    """
+    Transitions de statut en masse :
+      - ACTIVE / SCHEDULED dont end_date est passée ou le budget épuisé -> COMPLETED ;
+      - SCHEDULED dont start_date est atteinte -> ACTIVE.
+    Retourne (activés, terminés). `update()` ne déclenche pas les signaux :
+    la version 'boosts' est incrémentée ici.
+    """
+    now = now or timezone.now()
+
+    completed = Boost.objects.filter(
+        Q(end_date__lt=now) | Q(spent__gte=F('budget')),
+        status__in=[BoostStatus.ACTIVE, BoostStatus.SCHEDULED],
+    ).update(status=BoostStatus.COMPLETED)
+
+    activated = Boost.objects.filter(
+        status=BoostStatus.SCHEDULED,
+        start_date__lte=now,
+    ).update(status=BoostStatus.ACTIVE)
+
+    if activated or completed:
+        versions.bump('boosts')
+    return activated, completed
+
+
+def status_after_payment(boost, now=None):
+    """Statut d'un boost payé (ou repris) selon sa fenêtre de diffusion."""
+    now = now or timezone.now()
+    if boost.end_date < now:
+        return BoostStatus.COMPLETED
+    if boost.start_date > now:
+        return BoostStatus.SCHEDULED
+    return BoostStatus.ACTIVE
+
+
+def pacing_factor(boost, now=None):
+    """
+    Coefficient (0..1) appliqué au bonus de classement d'un boost pour que la
+    dépense suive le budget de façon régulière entre start_date et end_date.
+    En avance sur la courbe idéale, le bonus diminue linéairement et s'annule
+    à BOOST_PACING_TOLERANCE d'avance (fraction du budget) ; à l'heure ou en
+    retard, il est entier.
+    """
+    now = now or timezone.now()
+    if boost.budget <= 0 or boost.spent >= boost.budget:
+        return 0.0
+
+    duration = (boost.end_date - boost.start_date).total_seconds()
+    if duration <= 0:
+        return 1.0
+    elapsed = min(1.0, max(0.0, (now - boost.start_date).total_seconds() / duration))
+    spent = float(boost.spent / boost.budget)
+
+    ahead = spent - elapsed
+    if ahead <= 0:
+        return 1.0
+    return max(0.0, 1.0 - ahead / settings.BOOST_PACING_TOLERANCE)
+
+
+def transition(boost, from_statuses, to_status, **fields):
+    """
+    Changement de statut atomique : UPDATE ... WHERE status IN (from_statuses).
+    Seules les colonnes modifiées sont écrites, et deux requêtes concurrentes ne
+    peuvent pas appliquer la même transition : une seule obtient True.
+    """
+    updated = Boost.objects.filter(pk=boost.pk, status__in=from_statuses).update(status=to_status, **fields)
+    if not updated:
+        return False
+    boost.status = to_status
+    for name, value in fields.items():
+        setattr(boost, name, value)
+    # update() ne déclenche pas post_save (cf. core/signals.py).
+    versions.bump('boosts')
+    return True
+
+
+def purge_idempotency_keys(now=None):
+    now = now or timezone.now()
+    deleted, _ = IdempotencyKey.objects.filter(
+        created_at__lt=now - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+    ).delete()
+    return deleted
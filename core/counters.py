@@ -0,0 +1,27 @@
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Post, Page, Comment, PageSubscription
+
+# Compteurs dénormalisés : tenus à jour à l'écriture par les signaux
+# (core/signals.py), recalculés ici après un chargement en masse.
+
+
+def _rebuild(model, field, related, fk):
+    """Une seule requête ensembliste ; retourne le nombre de lignes modifiées."""
+    counts = (
+        related.objects.filter(**{fk: OuterRef('pk')}).order_by()
+        .values(fk).annotate(n=Count('pk')).values('n')
+    )
+    actual = Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+    return model.objects.annotate(actual=actual).filter(~Q(**{field: actual})).update(**{field: actual})
+
+
+def rebuild_comment_counts():
+    """Recalcule Post.comments_count."""
+    return _rebuild(Post, 'comments_count', Comment, 'post')
+
+
+def rebuild_subscriber_counts():
+    """Recalcule Page.subscribers_count."""
+    return _rebuild(Page, 'subscribers_count', PageSubscription, 'page')
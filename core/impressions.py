@@ -0,0 +1,110 @@
+import atexit
+import logging
+import os
+import threading
+from collections import defaultdict
+from decimal import Decimal
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import versions
+from .models import Boost, BoostImpression, BoostStatus
+
+logger = logging.getLogger(__name__)
+
+
+def impression_cost():
+    """Coût d'un affichage, dérivé du CPM (coût pour 1000 impressions)."""
+    return Decimal(str(settings.BOOST_CPM)) / 1000
+
+
+class ImpressionBuffer:
+    """
+    Tampon en mémoire des impressions servies par le Feed. Le chemin de requête
+    ne fait qu'un append sous verrou ; un thread d'arrière-plan vide le tampon
+    toutes les BOOST_IMPRESSION_FLUSH_INTERVAL secondes (ou dès qu'il atteint
+    BOOST_IMPRESSION_BUFFER_SIZE) : insertion en masse dans le registre puis
+    une mise à jour des compteurs par boost.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = []
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def record(self, boost_id, post_id, user_id):
+        with self._lock:
+            self._pending.append((boost_id, post_id, user_id, timezone.now()))
+            full = len(self._pending) >= settings.BOOST_IMPRESSION_BUFFER_SIZE
+        self._ensure_thread()
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        """Écrit les impressions en attente. Retourne le nombre de lignes écrites."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return 0
+
+        cost = impression_cost()
+        per_boost = defaultdict(int)
+        for boost_id, _, _, _ in pending:
+            per_boost[boost_id] += 1
+
+        try:
+            with transaction.atomic():
+                BoostImpression.objects.bulk_create(
+                    [
+                        BoostImpression(boost_id=boost_id, post_id=post_id, user_id=user_id, cost=cost, created_at=at)
+                        for boost_id, post_id, user_id, at in pending
+                    ],
+                    batch_size=1000,
+                )
+                for boost_id, count in per_boost.items():
+                    Boost.objects.filter(pk=boost_id).update(
+                        impressions=F('impressions') + count,
+                        spent=F('spent') + cost * count,
+                    )
+                # Budget épuisé : terminé sans attendre le passage de l'ordonnanceur.
+                exhausted = Boost.objects.filter(
+                    pk__in=per_boost, status=BoostStatus.ACTIVE, spent__gte=F('budget'),
+                ).update(status=BoostStatus.COMPLETED)
+        except Exception:
+            logger.exception(f"Échec de l'écriture de {len(pending)} impressions, nouvel essai au prochain passage")
+            with self._lock:
+                room = settings.BOOST_IMPRESSION_BUFFER_SIZE * 10 - len(self._pending)
+                self._pending[:0] = pending[:max(0, room)]
+            return 0
+
+        # Les dépenses seules n'invalident pas l'index des boosts actifs : le
+        # pacing tolère un retard de BOOST_INDEX_TTL. Seul un changement de
+        # statut le fait relire.
+        if exhausted:
+            versions.bump('boosts')
+        return len(pending)
+
+    def _ensure_thread(self):
+        # Après un fork (workers gunicorn), le thread du parent n'existe plus.
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='boost-impressions', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(settings.BOOST_IMPRESSION_FLUSH_INTERVAL)
+            self._wake.clear()
+            close_old_connections()
+            self.flush()
+
+
+buffer = ImpressionBuffer()
+atexit.register(buffer.flush)
@@ -0,0 +1,273 @@
+import atexit
+import logging
+import os
+import threading
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import versions
+from .models import Post, Page, Like, PageSubscription, Share
+
+logger = logging.getLogger(__name__)
+
+# Écriture différée des likes, unlikes et partages. Un tap ne fait qu'une
+# écriture en mémoire (et une dans le cache partagé) ; les événements sont
+# fusionnés par (utilisateur, post) puis écrits en masse toutes les
+# INTERACTION_FLUSH_INTERVAL secondes : c'est la fenêtre de durabilité (un
+# worker tué perd au plus ce qu'il a reçu pendant cette fenêtre).
+# INTERACTION_FLUSH_INTERVAL = 0 écrit immédiatement, dans la requête.
+#
+# Le dernier état voulu d'un like est aussi posé dans le cache (clé par
+# utilisateur et post), partagé entre les workers : le lecteur voit ses
+# propres likes en attente quel que soit le worker qui le sert, et l'écriture
+# applique toujours le dernier tap, même s'il a été reçu par un autre worker.
+
+
+def _intent_key(user_id, post_id):
+    return f'like-intent:{user_id}:{post_id}'
+
+
+def _intent_ttl():
+    # Bien au-delà de la fenêtre : l'état en base a rattrapé l'intention avant l'expiration.
+    return max(60, 10 * settings.INTERACTION_FLUSH_INTERVAL)
+
+
+def pending_likes(user_id, post_ids):
+    """{post_id: aimé ou non} des likes/unlikes du lecteur pas encore écrits (une lecture du cache)."""
+    post_ids = list(post_ids)
+    if not post_ids:
+        return {}
+    keys = {_intent_key(user_id, post_id): post_id for post_id in post_ids}
+    return {keys[key]: liked for key, liked in cache.get_many(list(keys)).items()}
+
+
+def overlay(liked, likes_count, pending):
+    """(is_liked, likes_count) vus par le lecteur, son like en attente compris."""
+    if pending is None or pending == liked:
+        return liked, likes_count
+    return pending, likes_count + 1 if pending else max(0, likes_count - 1)
+
+
+# Lots d'actions rejouées par un client hors ligne : action -> (cible, état voulu, statut renvoyé)
+BATCH_ACTIONS = {
+    'like': ('post', True, 'liked'),
+    'unlike': ('post', False, 'unliked'),
+    'subscribe': ('page', True, 'subscribed'),
+    'unsubscribe': ('page', False, 'unsubscribed'),
+}
+
+
+def apply_batch(user_id, items):
+    """
+    Applique un lot [(action, uuid de la cible)] dans l'ordre, en une transaction :
+    une lecture par type de cible, puis un bulk_create(ignore_conflicts=True) et
+    une suppression ensembliste par table. Une cible répétée prend son dernier état.
+    Retourne le statut de chaque élément ('liked', ..., ou 'not_found').
+    """
+    targets = {'post': set(), 'page': set()}
+    for action, target in items:
+        targets[BATCH_ACTIONS[action][0]].add(target)
+    # Posts : {id: page du post} (portées de version).
+    existing = {
+        'post': dict(Post.objects.filter(pk__in=targets['post']).values_list('pk', 'page_id')) if targets['post'] else {},
+        'page': set(Page.objects.filter(pk__in=targets['page']).values_list('pk', flat=True)) if targets['page'] else set(),
+    }
+
+    wanted = {'post': {}, 'page': {}}
+    statuses = []
+    for action, target in items:
+        kind, state, label = BATCH_ACTIONS[action]
+        if target not in existing[kind]:
+            statuses.append('not_found')
+            continue
+        wanted[kind][target] = state
+        statuses.append(label)
+
+    likes, subscriptions = wanted['post'], wanted['page']
+    with transaction.atomic():
+        Like.objects.bulk_create(
+            [Like(user_id=user_id, post_id=post_id) for post_id, liked in likes.items() if liked],
+            ignore_conflicts=True,
+        )
+        unliked = [post_id for post_id, liked in likes.items() if not liked]
+        if unliked:
+            Like.objects.filter(user_id=user_id, post_id__in=unliked).delete()
+        # Abonnements réellement créés : Page.subscribers_count (la suppression passe par les signaux).
+        subscribed = insert_subscriptions(user_id, [page_id for page_id, state in subscriptions.items() if state])
+        if subscribed:
+            Page.objects.filter(pk__in=subscribed).update(subscribers_count=F('subscribers_count') + 1)
+        unsubscribed = [page_id for page_id, state in subscriptions.items() if not state]
+        if unsubscribed:
+            PageSubscription.objects.filter(user_id=user_id, page_id__in=unsubscribed).delete()
+
+    # Les taps encore en tampon pour ces posts sont plus anciens : le lot devient l'intention à jour.
+    if likes:
+        cache.set_many({_intent_key(user_id, post_id): liked for post_id, liked in likes.items()}, _intent_ttl())
+    # bulk_create ne déclenche pas les signaux : invalidation des validateurs ici.
+    if likes or subscriptions:
+        versions.bump(
+            *(f'post:{post_id}' for post_id in likes), *(f'page:{page_id}' for page_id in subscriptions),
+            *{scope for post_id in likes for scope in versions.page_posts_scopes(existing['post'][post_id])},
+            f'feed:{user_id}', f'activity:{user_id}',
+        )
+    return statuses
+
+
+def insert_subscriptions(user_id, page_ids):
+    """
+    Abonne l'utilisateur aux pages `page_ids` : {pages réellement abonnées par cet appel}.
+    INSERT … ON CONFLICT DO NOTHING RETURNING (PostgreSQL, SQLite ≥ 3.35) : un
+    abonnement créé par un lot concurrent n'est pas renvoyé, même s'il n'était
+    pas encore visible au début de la transaction, donc pas compté deux fois.
+    bulk_create(ignore_conflicts=True) ne dit pas quelles lignes ont été écrites.
+    """
+    if not page_ids:
+        return set()
+    meta = PageSubscription._meta
+    fields = [meta.get_field('user'), meta.get_field('page'), meta.get_field('subscribed_at')]
+    now = timezone.now()
+    params = []
+    for page_id in page_ids:
+        params += [
+            field.get_db_prep_value(value, connection)
+            for field, value in zip(fields, (user_id, page_id, now))
+        ]
+    quote = connection.ops.quote_name
+    sql = (
+        f"INSERT INTO {quote(meta.db_table)} ({', '.join(quote(field.column) for field in fields)}) "
+        f"VALUES {', '.join(['(%s, %s, %s)'] * len(page_ids))} "
+        f"ON CONFLICT DO NOTHING RETURNING {quote(fields[1].column)}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return {fields[1].to_python(row[0]) for row in cursor.fetchall()}
+
+
+class InteractionBuffer:
+    """
+    Tampon en mémoire des interactions, sur le modèle de ImpressionBuffer
+    (core/impressions.py) : seul le dernier état du like est gardé par
+    (utilisateur, post), les partages répétés dans la fenêtre n'en font qu'un.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._likes = {}
+        self._shares = {}
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def like(self, user_id, post_id, liked=True, page_id=None):
+        cache.set(_intent_key(user_id, post_id), liked, _intent_ttl())
+        with self._lock:
+            self._likes[(user_id, post_id)] = liked
+        self._recorded(user_id, post_id, page_id)
+
+    def unlike(self, user_id, post_id, page_id=None):
+        self.like(user_id, post_id, liked=False, page_id=page_id)
+
+    def share(self, user_id, post_id, page_id=None):
+        with self._lock:
+            self._shares.setdefault((user_id, post_id), True)
+        self._recorded(user_id, post_id, page_id)
+
+    def _recorded(self, user_id, post_id, page_id):
+        # Les réponses du post, de sa page et du fil du lecteur changent (compteur, is_liked) dès le tap.
+        versions.bump(f'post:{post_id}', f'activity:{user_id}', *versions.page_posts_scopes(page_id))
+        if settings.INTERACTION_FLUSH_INTERVAL <= 0:
+            self.flush()
+            return
+        with self._lock:
+            full = len(self._likes) + len(self._shares) >= settings.INTERACTION_BUFFER_SIZE
+        self._ensure_thread()
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        """Écrit les interactions en attente. Retourne le nombre d'événements écrits."""
+        with self._lock:
+            likes, self._likes = self._likes, {}
+            shares, self._shares = self._shares, {}
+        if not likes and not shares:
+            return 0
+
+        # Dernier tap connu, tous workers confondus.
+        intents = cache.get_many([_intent_key(user_id, post_id) for user_id, post_id in likes])
+        states = {
+            pair: intents.get(_intent_key(*pair), liked) for pair, liked in likes.items()
+        }
+        # Un post supprimé entre-temps ferait échouer tout le lot (clé étrangère).
+        # {id: page du post} des posts encore présents (portées de version).
+        post_ids = {post_id for _, post_id in [*states, *shares]}
+        existing = dict(Post.objects.filter(pk__in=post_ids).values_list('pk', 'page_id'))
+
+        unliked = defaultdict(list)
+        for (user_id, post_id), liked in states.items():
+            if not liked and post_id in existing:
+                unliked[user_id].append(post_id)
+
+        try:
+            with transaction.atomic():
+                Like.objects.bulk_create(
+                    [
+                        Like(user_id=user_id, post_id=post_id)
+                        for (user_id, post_id), liked in states.items() if liked and post_id in existing
+                    ],
+                    batch_size=1000, ignore_conflicts=True,
+                )
+                if unliked:
+                    Like.objects.filter(reduce(or_, (
+                        Q(user_id=user_id, post_id__in=posts) for user_id, posts in unliked.items()
+                    ))).delete()
+                Share.objects.bulk_create(
+                    [Share(user_id=user_id, post_id=post_id) for user_id, post_id in shares if post_id in existing],
+                    batch_size=1000,
+                )
+                # bulk_create ne déclenche pas les signaux. Le bump du tap a pu être lu
+                # avant cette écriture (cache rempli avec l'ancien état) : nouveau bump,
+                # appliqué au commit du lot.
+                written = post_ids & existing.keys()
+                if written:
+                    versions.bump(
+                        *(f'post:{post_id}' for post_id in written),
+                        *{f'activity:{user_id}' for user_id, post_id in [*states, *shares] if post_id in existing},
+                        *{scope for post_id in written for scope in versions.page_posts_scopes(existing[post_id])},
+                    )
+        except Exception:
+            logger.exception(
+                f"Échec de l'écriture de {len(likes) + len(shares)} interactions, nouvel essai au prochain passage"
+            )
+            with self._lock:
+                # Les taps reçus pendant l'écriture sont plus récents : ils l'emportent.
+                self._likes = {**likes, **self._likes}
+                self._shares = {**shares, **self._shares}
+            return 0
+        return len(likes) + len(shares)
+
+    def _ensure_thread(self):
+        # Après un fork (workers gunicorn), le thread du parent n'existe plus.
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='interactions', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(settings.INTERACTION_FLUSH_INTERVAL)
+            self._wake.clear()
+            close_old_connections()
+            self.flush()
+
+
+buffer = InteractionBuffer()
+atexit.register(buffer.flush)
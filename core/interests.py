@@ -0,0 +1,120 @@
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, Func, IntegerField
+
+from .models import Interest, User, Boost
+
+# Taxonomie des centres d'intérêt : chaque nom normalisé reçoit un bit (0..62)
+# dans un masque BIGINT (User.interests_mask, Boost.audience_interests_mask).
+# Intérêts communs = popcount(masque_a & masque_b), en Python comme en SQL.
+# Au-delà de 63 intérêts, les suivants n'ont pas de bit (bit NULL) : ils sont
+# comparés par leur nom (cf. overflow()), cas rare puisque les bits vont en
+# priorité aux intérêts ciblés par des boosts.
+
+MAX_BITS = 63
+CACHE_KEY = 'interest-taxonomy'
+
+
+def normalize(values):
+    """Liste JSON libre -> noms normalisés, dédoublonnés, triés."""
+    return sorted({item.strip().lower() for item in values or [] if isinstance(item, str) and item.strip()})
+
+
+def taxonomy():
+    """{nom: bit ou None}, partagé via le cache."""
+    known = cache.get(CACHE_KEY)
+    if known is None:
+        known = dict(Interest.objects.values_list('name', 'bit'))
+        cache.set(CACHE_KEY, known, None)
+    return known
+
+
+def intern(values):
+    """Enregistre les intérêts inconnus (premier bit libre) et retourne la taxonomie."""
+    known = taxonomy()
+    missing = [name for name in normalize(values) if name not in known]
+    if not missing:
+        return known
+    for name in missing:
+        _create(name)
+    cache.delete(CACHE_KEY)
+    return taxonomy()
+
+
+def _create(name):
+    # Deux processus peuvent choisir le même bit libre : l'unicité de `bit` tranche.
+    for _ in range(5):
+        used = set(Interest.objects.exclude(bit=None).values_list('bit', flat=True))
+        free = next((bit for bit in range(MAX_BITS) if bit not in used), None)
+        try:
+            with transaction.atomic():
+                Interest.objects.get_or_create(name=name, defaults={'bit': free})
+            return
+        except IntegrityError:
+            continue
+    Interest.objects.get_or_create(name=name, defaults={'bit': None})
+
+
+def mask_for(values, known=None):
+    known = known if known is not None else intern(values)
+    mask = 0
+    for name in normalize(values):
+        bit = known.get(name)
+        if bit is not None:
+            mask |= 1 << bit
+    return mask
+
+
+def overflow(values, known):
+    """Intérêts sans bit : comparés par nom, en complément du masque."""
+    return {name for name in normalize(values) if name in known and known[name] is None}
+
+
+def has_overflow(known):
+    return any(bit is None for bit in known.values())
+
+
+class BitCount(Func):
+    """popcount(expression) en SQL (PostgreSQL >= 14, repli arithmétique ailleurs)."""
+    output_field = IntegerField()
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return super().as_sql(compiler, connection, template='bit_count(CAST(%(expressions)s AS bit(64)))', **extra_context)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        # SQLite sans popcount : somme des bits 0..62.
+        sql, params = compiler.compile(self.source_expressions[0])
+        terms = ' + '.join(f'(({sql} >> {bit}) & 1)' for bit in range(MAX_BITS))
+        return f'({terms})', params * MAX_BITS
+
+
+def shared(field, mask):
+    """Expression SQL : nombre d'intérêts communs entre la colonne `field` et `mask`."""
+    return BitCount(F(field).bitand(mask))
+
+
+def rebuild_masks(batch_size=5000):
+    """
+    Recalcule tous les masques (après un chargement en masse qui contourne save()).
+    Retourne le nombre de lignes modifiées.
+    """
+    changed = 0
+    # Les boosts d'abord : leurs intérêts reçoivent les premiers bits libres.
+    for model, source, target in ((Boost, 'audience_interests', 'audience_interests_mask'), (User, 'interests', 'interests_mask')):
+        rows = model.objects.values_list('pk', source, target).iterator(chunk_size=batch_size)
+        known = taxonomy()
+        pending = []
+        for pk, values, current in rows:
+            if any(name not in known for name in normalize(values)):
+                known = intern(values)
+            mask = mask_for(values, known)
+            if mask != current:
+                pending.append(model(pk=pk, **{target: mask}))
+            if len(pending) >= batch_size:
+                model.objects.bulk_update(pending, [target])
+                changed += len(pending)
+                pending = []
+        if pending:
+            model.objects.bulk_update(pending, [target])
+            changed += len(pending)
+    return changed
@@ -0,0 +1,84 @@
+import logging
+import re
+import unicodedata
+from django.core.cache import cache
+
+from .models import City, Region, User, Boost
+
+# Dimension géographique ville -> région. Les textes libres (User.city,
+# Boost.audience_location) sont ramenés à des clés canoniques à l'écriture
+# ('Extrême-Nord' -> 'extreme-nord', ' yaoundé ' -> 'yaounde') ; le ciblage
+# devient une comparaison d'égalité sur ces clés, indexées côté User.
+
+CACHE_KEY = 'location-hierarchy'
+
+# Un boost cible une seule ville ou région : 'Douala, Yaoundé' donnerait la
+# clé inconnue 'douala-yaounde', qui ne correspond à personne.
+LIST_SEPARATORS = re.compile(r'[,;/|&+]|\bet\b', re.IGNORECASE)
+
+logger = logging.getLogger(__name__)
+
+
+def location_key(text):
+    """Clé canonique : sans accents, minuscules, séparateurs réduits à '-'."""
+    if not text:
+        return None
+    folded = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+    key = re.sub(r'[^a-z0-9]+', '-', folded.lower()).strip('-')
+    return key or None
+
+
+def split_targets(text):
+    """'Douala, Yaoundé' -> ['Douala', 'Yaoundé'] ; un seul lieu -> une liste d'un élément."""
+    return [part.strip() for part in LIST_SEPARATORS.split(text or '') if part.strip()]
+
+
+def hierarchy():
+    """{'cities': {clé_ville: clé_région}, 'regions': [clés]}, partagé via le cache."""
+    data = cache.get(CACHE_KEY)
+    if data is None:
+        data = {
+            'cities': dict(City.objects.values_list('key', 'region__key')),
+            'regions': list(Region.objects.values_list('key', flat=True)),
+        }
+        cache.set(CACHE_KEY, data, None)
+    return data
+
+
+def resolve(text):
+    """
+    Texte libre -> (clé_ville, clé_région).
+    Ville connue : les deux clés ; région : (None, région) ; lieu inconnu : (clé, None),
+    qui reste comparable à la ville d'un utilisateur saisie de la même façon.
+    """
+    key = location_key(text)
+    if key is None:
+        return None, None
+    known = hierarchy()
+    if key in known['cities']:
+        return key, known['cities'][key]
+    if key in known['regions']:
+        return None, key
+    return key, None
+
+
+def rebuild_keys():
+    """
+    Recalcule les clés après un chargement en masse (qui contourne save()) :
+    une mise à jour par valeur distincte du texte source, pas par ligne.
+    """
+    changed = 0
+    for model, source, city_field, region_field in (
+        (User, 'city', 'city_key', 'region_key'),
+        (Boost, 'audience_location', 'audience_city_key', 'audience_region_key'),
+    ):
+        for value in model.objects.order_by().values_list(source, flat=True).distinct():
+            if len(split_targets(value)) > 1:
+                logger.warning(f"{model.__name__}.{source} vise plusieurs lieux, clé inconnue : {value!r}")
+            city_key, region_key = resolve(value)
+            changed += (
+                model.objects.filter(**{source: value})
+                .exclude(**{city_field: city_key, region_field: region_key})
+                .update(**{city_field: city_key, region_field: region_key})
+            )
+    return changed
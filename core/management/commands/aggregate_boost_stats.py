@@ -0,0 +1,44 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.rollups import aggregate
+
+
+class Command(BaseCommand):
+    help = (
+        "Agrège les impressions, dépenses et interactions des boosts par heure et par jour "
+        "(lues par /api/boosts/{id}/stats/). Un passage unique (cron) ou une boucle (--loop)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help="Tourner en continu au lieu d'un passage unique")
+        parser.add_argument('--interval', type=int, default=settings.ROLLUP_INTERVAL,
+                            help="Secondes entre deux passages en mode --loop")
+
+    def handle(self, *args, **options):
+        if not options['loop']:
+            self.catch_up()
+            return
+
+        self.stdout.write(f"Agrégateur des statistiques démarré (toutes les {options['interval']}s)")
+        try:
+            while True:
+                started = time.monotonic()
+                close_old_connections()
+                self.catch_up()
+                time.sleep(max(0, options['interval'] - (time.monotonic() - started)))
+        except KeyboardInterrupt:
+            self.stdout.write("Agrégateur arrêté.")
+
+    def catch_up(self):
+        # Un passage traite au plus ROLLUP_MAX_HOURS : on enchaîne jusqu'à être à jour.
+        total = 0
+        while True:
+            hours = aggregate()
+            total += hours
+            if hours < settings.ROLLUP_MAX_HOURS:
+                break
+        if total:
+            self.stdout.write(self.style.SUCCESS(f"{total} heure(s) agrégée(s)"))
@@ -0,0 +1,75 @@
+import time
+from types import SimpleNamespace
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from rest_framework.renderers import JSONRenderer
+from core.models import Post, Comment
+from core.renderers import ORJSONRenderer
+from core.serializers import (
+    PostSerializer, CommentSerializer, UserSerializer,
+    FastPostSerializer, FastCommentSerializer, FastUserSerializer,
+)
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Compare le chemin DRF (ModelSerializer + JSONRenderer) et le chemin rapide (.values() + orjson)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=100, help='Nombre de lignes sérialisées par itération')
+        parser.add_argument('--repeat', type=int, default=20, help="Nombre d'itérations par cas")
+
+    def handle(self, *args, **options):
+        limit = options['limit']
+        repeat = options['repeat']
+
+        viewer = User.objects.first()
+        if viewer is None:
+            raise CommandError('Base vide : lancez populate_db.py ou load_transport_data avant le benchmark.')
+        context = {'request': SimpleNamespace(user=viewer)}
+
+        cases = [
+            ('posts', Post.objects.select_related('author').order_by('-created_at'), PostSerializer, FastPostSerializer),
+            ('comments', Comment.objects.select_related('user').order_by('-created_at'), CommentSerializer, FastCommentSerializer),
+            ('users', User.objects.order_by('-created_at'), UserSerializer, FastUserSerializer),
+        ]
+
+        drf_renderer = JSONRenderer()
+        fast_renderer = ORJSONRenderer()
+        mismatches = []
+
+        for name, queryset, serializer_class, fast_serializer_class in cases:
+            def drf_path():
+                data = serializer_class(queryset[:limit], many=True, context=context).data
+                return drf_renderer.render(data)
+
+            def fast_path():
+                fast_serializer = fast_serializer_class(context=context)
+                data = fast_serializer.serialize(fast_serializer.values(queryset[:limit]))
+                return fast_renderer.render(data)
+
+            drf_time, drf_output = self._measure(drf_path, repeat)
+            fast_time, fast_output = self._measure(fast_path, repeat)
+
+            identical = drf_output == fast_output
+            if not identical:
+                mismatches.append(name)
+
+            speedup = drf_time / fast_time if fast_time else float('inf')
+            self.stdout.write(
+                f"{name:<10} drf={drf_time * 1000:8.2f} ms  rapide={fast_time * 1000:8.2f} ms  "
+                f"x{speedup:5.1f}  octets={len(fast_output)}  identique={'oui' if identical else 'NON'}"
+            )
+
+        if mismatches:
+            raise CommandError(f"Sorties différentes pour : {', '.join(mismatches)}")
+        self.stdout.write(self.style.SUCCESS('Sorties identiques octet pour octet.'))
+
+    @staticmethod
+    def _measure(func, repeat):
+        output = func()  # échauffement
+        start = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        return (time.perf_counter() - start) / repeat, output
@@ -0,0 +1,40 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.snapshots import build
+
+
+class Command(BaseCommand):
+    help = (
+        "Calcule les instantanés du fil par segment d'audience (lus par /api/feed/ pour les "
+        "lecteurs sans amis ni abonnements). Un passage unique (cron) ou une boucle (--loop)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help="Tourner en continu au lieu d'un passage unique")
+        parser.add_argument('--interval', type=int, default=settings.FEED_SNAPSHOT_INTERVAL,
+                            help="Secondes entre deux passages en mode --loop")
+
+    def handle(self, *args, **options):
+        if not options['loop']:
+            self.build()
+            return
+
+        self.stdout.write(f"Calcul des instantanés du fil démarré (toutes les {options['interval']}s)")
+        try:
+            while True:
+                started = time.monotonic()
+                close_old_connections()
+                self.build()
+                time.sleep(max(0, options['interval'] - (time.monotonic() - started)))
+        except KeyboardInterrupt:
+            self.stdout.write("Calcul des instantanés arrêté.")
+
+    def build(self):
+        started = time.monotonic()
+        segments, posts = build()
+        self.stdout.write(self.style.SUCCESS(
+            f"{segments} instantané(s) du fil, {posts} post(s) en {time.monotonic() - started:.2f}s"
+        ))
@@ -0,0 +1,140 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from core.models import User, Page, Post, Friendship, FriendStatus
+
+# (nom, url, tables autorisées en parcours séquentiel)
+# Les exceptions documentent des parcours connus, pas des oublis : la recherche
+# utilise icontains ('%q%'), qu'aucun index B-tree ne peut servir.
+ENDPOINTS = [
+    ('feed', '/api/feed/', set()),
+    ('posts', '/api/posts/', set()),
+    ('posts-mine', '/api/posts/mine/', set()),
+    ('post', '/api/posts/{post}/', set()),
+    ('page', '/api/pages/{page}/', set()),
+    ('page-posts', '/api/pages/{page}/posts/', set()),
+    ('page-subscribers', '/api/pages/{page}/subscribers/', set()),
+    ('pages', '/api/pages/', set()),
+    ('comments', '/api/comments/?post={post}', set()),
+    ('comment-threads', '/api/comments/threads/?post={post}', set()),
+    ('friendships', '/api/friendships/', set()),
+    ('user', '/api/users/{user}/', set()),
+    ('user-posts', '/api/users/{user}/posts/', set()),
+    ('user-friends', '/api/users/{user}/friends/', set()),
+    ('boosts', '/api/boosts/', set()),
+    ('search', '/api/search/?q=trans', {'core_user', 'core_page'}),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Exécute EXPLAIN sur les requêtes SQL de chaque endpoint (base PostgreSQL peuplée) "
+        "et échoue si un parcours séquentiel apparaît sur une table volumineuse."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--email', help="Utilisateur dont on simule les requêtes (défaut: le plus connecté)")
+        parser.add_argument('--min-rows', type=int, default=1000,
+                            help="En dessous de ce nombre de lignes, un Seq Scan est le bon choix du planificateur")
+        parser.add_argument('--endpoint', action='append', help="Limiter à certains endpoints (par nom)")
+        parser.add_argument('--strict', action='store_true',
+                            help="Signaler aussi les Seq Scan sans filtre (construction d'une jointure par hachage)")
+        parser.add_argument('--verbose-plans', action='store_true', help="Afficher chaque requête analysée")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Ce harnais nécessite PostgreSQL (EXPLAIN FORMAT JSON).')
+
+        user = self.pick_user(options['email'])
+        post = Post.objects.filter(page__isnull=False).order_by('-created_at').first()
+        page = post.page if post else Page.objects.first()
+        if post is None or page is None:
+            raise CommandError('Base vide : lancez populate_db.py avant le harnais.')
+
+        self.min_rows = options['min_rows']
+        self.strict = options['strict']
+        self.table_sizes = self.load_table_sizes()
+
+        client = APIClient()
+        client.force_authenticate(user)
+
+        failures = []
+        for name, url, allowed in ENDPOINTS:
+            if options['endpoint'] and name not in options['endpoint']:
+                continue
+            url = url.format(post=post.pk, page=page.pk, user=user.pk)
+
+            with CaptureQueriesContext(connection) as ctx:
+                response = client.get(url)
+            if response.status_code != 200:
+                failures.append(f'{name}: HTTP {response.status_code}')
+                continue
+
+            scans = []
+            for query in ctx.captured_queries:
+                sql = query['sql']
+                if not sql.lstrip().upper().startswith('SELECT'):
+                    continue
+                for table in self.seq_scans(sql):
+                    if table not in allowed and self.table_sizes.get(table, 0) >= self.min_rows:
+                        scans.append((table, sql))
+                if options['verbose_plans']:
+                    self.stdout.write(f'    {sql[:160]}')
+
+            status = self.style.ERROR('ÉCHEC') if scans else self.style.SUCCESS('ok')
+            self.stdout.write(f'{status} {name:<14} {len(ctx.captured_queries):3d} requêtes  {url}')
+            for table, sql in scans:
+                self.stdout.write(f'    Seq Scan sur {table} ({self.table_sizes[table]} lignes): {sql[:200]}')
+                failures.append(f'{name}: {table}')
+
+        if failures:
+            raise CommandError(f"Parcours séquentiels détectés : {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS('Aucun parcours séquentiel inattendu.'))
+
+    def pick_user(self, email):
+        if email:
+            try:
+                return User.objects.get(email=email)
+            except User.DoesNotExist:
+                raise CommandError(f'Utilisateur introuvable : {email}')
+        fship = Friendship.objects.filter(status=FriendStatus.ACCEPTED).first()
+        if fship is not None:
+            return fship.requester
+        user = User.objects.filter(Q(pages__isnull=False)).first() or User.objects.first()
+        if user is None:
+            raise CommandError('Base vide : lancez populate_db.py avant le harnais.')
+        return user
+
+    @staticmethod
+    def load_table_sizes():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT relname, reltuples::bigint FROM pg_class "
+                "WHERE relkind = 'r' AND relnamespace = 'public'::regnamespace"
+            )
+            return dict(cursor.fetchall())
+
+    def seq_scans(self, sql):
+        """
+        Tables lues séquentiellement par le plan. Par défaut seuls les Seq Scan
+        portant un filtre comptent : un prédicat évalué ligne à ligne signale un
+        index manquant, alors qu'une table lue en entier pour une jointure par
+        hachage est un choix de coût du planificateur (--strict pour les voir).
+        """
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+
+        tables = []
+        nodes = [plan[0]['Plan']]
+        while nodes:
+            node = nodes.pop()
+            if node.get('Node Type') == 'Seq Scan' and (self.strict or 'Filter' in node):
+                tables.append(node['Relation Name'])
+            nodes.extend(node.get('Plans', []))
+        return tables
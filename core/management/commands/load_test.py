@@ -0,0 +1,143 @@
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+from core.models import User
+
+# (chemin sous WSGI (vues DRF), chemin sous ASGI (core/async_views.py))
+ENDPOINTS = {
+    'feed': ('/api/feed/', '/api/async/feed/'),
+    'search': ('/api/search/?q=a', '/api/async/search/?q=a'),
+    'upload': ('/api/upload/', '/api/async/upload/'),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Test de charge comparant un serveur WSGI (vues DRF) et un serveur ASGI (vues async) "
+        "à plusieurs niveaux de concurrence. Serveurs à lancer au préalable, même nombre de workers, ex. :\n"
+        "  gunicorn boost_backend.wsgi -w 4 -b 127.0.0.1:8000\n"
+        "  python -m uvicorn boost_backend.asgi:application --workers 4 --port 8001"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wsgi', help='URL du serveur WSGI, ex. http://127.0.0.1:8000')
+        parser.add_argument('--asgi', help='URL du serveur ASGI, ex. http://127.0.0.1:8001')
+        parser.add_argument('--endpoint', action='append', choices=sorted(ENDPOINTS),
+                            help='Endpoints à tester (défaut: feed et search)')
+        parser.add_argument('--concurrency', default='1,8,32,64', help='Niveaux de concurrence (clients simultanés)')
+        parser.add_argument('--requests', type=int, default=200, help='Requêtes par niveau')
+        parser.add_argument('--slo', type=float, default=1000, help='p95 maximal (ms) pour qu\'un niveau soit tenu')
+        parser.add_argument('--timeout', type=float, default=30, help='Délai maximal par requête (s)')
+        parser.add_argument('--email', help='Utilisateur authentifié (défaut: le premier)')
+        parser.add_argument('--upload-file', help='Fichier envoyé par le cas upload (envoyé réellement au stockage)')
+
+    def handle(self, *args, **options):
+        servers = [(name, options[name].rstrip('/')) for name in ('wsgi', 'asgi') if options[name]]
+        if not servers:
+            raise CommandError('Indiquez au moins --wsgi ou --asgi.')
+        endpoints = options['endpoint'] or ['feed', 'search']
+        if 'upload' in endpoints and not options['upload_file']:
+            raise CommandError('Le cas upload nécessite --upload-file.')
+        try:
+            levels = [int(level) for level in options['concurrency'].split(',')]
+        except ValueError:
+            raise CommandError('--concurrency attend une liste d\'entiers, ex. 1,8,32')
+
+        self.timeout = options['timeout']
+        self.token = str(AccessToken.for_user(self.pick_user(options['email'])))
+        self.upload = self.multipart(options['upload_file']) if options['upload_file'] else None
+
+        limits = []
+        for endpoint in endpoints:
+            for server, base_url in servers:
+                path = ENDPOINTS[endpoint][0 if server == 'wsgi' else 1]
+                url = base_url + path
+                self.call(url, endpoint)  # échauffement (connexions, caches)
+                held = None
+                for level in levels:
+                    stats = self.run_level(url, endpoint, level, options['requests'])
+                    ok = stats['errors'] == 0 and stats['p95'] <= options['slo']
+                    if ok:
+                        held = level
+                    self.stdout.write(
+                        f"{endpoint:<7} {server:<5} c={level:<4} {stats['rps']:8.1f} req/s  "
+                        f"p50={stats['p50']:7.1f} ms  p95={stats['p95']:7.1f} ms  p99={stats['p99']:7.1f} ms  "
+                        f"erreurs={stats['errors']}{'' if ok else '  (non tenu)'}"
+                    )
+                limits.append((endpoint, server, held))
+
+        self.stdout.write('')
+        for endpoint, server, held in limits:
+            label = f'c={held}' if held is not None else 'aucun niveau tenu'
+            self.stdout.write(self.style.SUCCESS(
+                f"Concurrence maximale tenue (p95 <= {options['slo']:.0f} ms, sans erreur) : {endpoint} {server} {label}"
+            ))
+
+    def run_level(self, url, endpoint, level, total):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(level) as pool:
+            results = list(pool.map(lambda _: self.call(url, endpoint), range(total)))
+        elapsed = time.perf_counter() - start
+
+        latencies = sorted(latency for ok, latency in results if ok)
+        errors = sum(1 for ok, _ in results if not ok)
+        return {
+            'rps': total / elapsed,
+            'p50': self.percentile(latencies, 50),
+            'p95': self.percentile(latencies, 95),
+            'p99': self.percentile(latencies, 99),
+            'errors': errors,
+        }
+
+    def call(self, url, endpoint):
+        """(succès, latence en ms) d'une requête."""
+        headers = {'Authorization': f'Bearer {self.token}', 'Accept-Encoding': 'identity'}
+        data = None
+        if endpoint == 'upload':
+            data, headers['Content-Type'] = self.upload
+        start = time.perf_counter()
+        try:
+            with urlopen(Request(url, data=data, headers=headers), timeout=self.timeout) as response:
+                response.read()
+                ok = response.status == 200
+        except (HTTPError, URLError, TimeoutError, ConnectionError):
+            ok = False
+        return ok, (time.perf_counter() - start) * 1000
+
+    @staticmethod
+    def percentile(values, rank):
+        if not values:
+            return float('nan')
+        return values[min(len(values) - 1, int(len(values) * rank / 100))]
+
+    @staticmethod
+    def multipart(path):
+        try:
+            with open(path, 'rb') as handle:
+                content = handle.read()
+        except OSError as exc:
+            raise CommandError(f'Fichier illisible : {exc}')
+        boundary = uuid.uuid4().hex
+        body = (
+            f'--{boundary}\r\n'
+            f'Content-Disposition: form-data; name="file"; filename="{os.path.basename(path)}"\r\n'
+            'Content-Type: application/octet-stream\r\n\r\n'
+        ).encode() + content + f'\r\n--{boundary}--\r\n'.encode()
+        return body, f'multipart/form-data; boundary={boundary}'
+
+    @staticmethod
+    def pick_user(email):
+        if email:
+            try:
+                return User.objects.get(email=email)
+            except User.DoesNotExist:
+                raise CommandError(f'Utilisateur introuvable : {email}')
+        user = User.objects.order_by('id').first()
+        if user is None:
+            raise CommandError('Base vide : lancez populate_db.py avant le test de charge.')
+        return user
@@ -1,198 +1,304 @@
 import random
-from datetime import datetime, timedelta
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
 from core.models import Page, Post, Boost, TargetType, BoostStatus, PageSubscription, Like, Comment, Share
+from core import counters, interests, locations, versions
 
 User = get_user_model()
 
+# Espace de noms des identifiants déterministes : une même entité de démonstration
+# garde le même UUID d'une exécution à l'autre, ce qui permet l'upsert.
+DEMO_NAMESPACE = uuid.UUID('5f0c3c1e-7a4b-4a8e-9d43-2b6f1c0e8a11')
+
+DEMO_PASSWORDS = {
+    'admin': 'admin123',
+    'manager': 'manager123',
+    'chauffeur': 'chauffeur123',
+}
+
+NOMS_CHAUFFEURS = [
+    ('Jean', 'Dupont'), ('Pierre', 'Martin'), ('Mohamed', 'Benali'),
+    ('Marie', 'Dubois'), ('Sophie', 'Lambert'), ('Thomas', 'Robert'),
+    ('Fatima', 'El Mansour'), ('David', 'Simon'), ('Laura', 'Petit'),
+    ('Ahmed', 'Khan')
+]
+
+AGENCES = [
+    {
+        'name': 'Transports Express',
+        'description': 'Service de transport rapide et fiable dans toute la région',
+        'category': 'Transport de marchandises',
+    },
+    {
+        'name': 'Camions & Cie',
+        'description': 'Spécialiste du transport longue distance',
+        'category': 'Transport international',
+    },
+    {
+        'name': 'Eco-Transports',
+        'description': 'Solutions de transport écologiques et durables',
+        'category': 'Transport vert',
+    },
+]
+
+TYPES_TRANSPORT = ['Camion frigorifique', 'Porte-voitures', 'Plateau', 'Fourgon', 'Camion-citerne']
+VILLES_DEPART = ['Paris', 'Lyon', 'Marseille', 'Bordeaux', 'Lille', 'Strasbourg', 'Nantes', 'Toulouse']
+VILLES_ARRIVEE = ['Berlin', 'Madrid', 'Rome', 'Bruxelles', 'Amsterdam', 'Genève', 'Barcelone', 'Milan']
+COMMENTAIRES = [
+    "Intéressant ! Je vais vous contacter.",
+    "Quel est le tarif pour 10 tonnes ?",
+    "Disponible la semaine prochaine ?",
+    "Avez-vous des véhicules réfrigérés ?",
+    "Je suis intéressé, contactez-moi en MP.",
+    "Très professionnel, je recommande !"
+]
+
+
+def demo_uuid(*parts):
+    return uuid.uuid5(DEMO_NAMESPACE, ':'.join(str(part) for part in parts))
+
+
 class Command(BaseCommand):
     help = 'Charge des données de démonstration pour l\'application de transport routier'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=1,
+                            help="Multiplie le nombre d'agences, de gestionnaires et de chauffeurs")
+        parser.add_argument('--seed', type=int, default=2024,
+                            help='Graine aléatoire : même graine, mêmes données (rechargement idempotent)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
     def handle(self, *args, **options):
+        self.scale = max(1, options['scale'])
+        self.batch_size = options['batch_size']
+        self.rng = random.Random(options['seed'])
+        self.now = timezone.now()
+
         self.stdout.write(self.style.SUCCESS('Début du chargement des données de transport...'))
-        
-        # Création des utilisateurs
-        admin = User.objects.create_superuser(
-            username='admin_transport',
-            email='admin@transport.com',
-            password='admin123',
-            first_name='Admin',
-            last_name='Transport'
+
+        # Un hachage par mot de passe distinct, pas un par utilisateur.
+        with self.stage('Hachage des mots de passe') as counter:
+            self.hashes = {role: make_password(password) for role, password in DEMO_PASSWORDS.items()}
+            counter(len(self.hashes))
+
+        with transaction.atomic():
+            admin, managers, chauffeurs = self.load_users()
+            users = [admin] + managers + chauffeurs
+            pages = self.load_pages(managers)
+            publications = self.load_posts(pages, chauffeurs)
+            self.load_interactions(users, publications)
+            self.load_boosts(pages, publications)
+            # bulk_create ne passe pas par les signaux (masques d'intérêts, clés de localisation, compteurs).
+            with self.stage("Masques des centres d'intérêt") as counter:
+                counter(interests.rebuild_masks())
+            with self.stage("Clés de localisation") as counter:
+                counter(locations.rebuild_keys())
+            with self.stage("Compteurs de commentaires") as counter:
+                counter(counters.rebuild_comment_counts())
+            with self.stage("Compteurs d'abonnés") as counter:
+                counter(counters.rebuild_subscriber_counts())
+
+        # Les écritures en masse ne déclenchent pas les signaux : on invalide les ETag.
+        versions.bump(
+            'users', *(f'user:{user.pk}' for user in users), *(f'profile:{user.pk}' for user in users),
+            *(f'page:{page.pk}' for page in pages),
         )
-        
-        users = [admin]
-        
-        # Création de gestionnaires d'agence
-        managers = []
-        for i in range(1, 4):
-            user = User.objects.create_user(
-                username=f'manager{i}',
-                email=f'manager{i}@transport.com',
-                password='manager123',
-                first_name=f'Manager {i}',
-                last_name='Agence'
-            )
-            managers.append(user)
-            users.append(user)
-        
-        # Création de chauffeurs
-        chauffeurs = []
-        noms_chauffeurs = [
-            ('Jean', 'Dupont'), ('Pierre', 'Martin'), ('Mohamed', 'Benali'),
-            ('Marie', 'Dubois'), ('Sophie', 'Lambert'), ('Thomas', 'Robert'),
-            ('Fatima', 'El Mansour'), ('David', 'Simon'), ('Laura', 'Petit'),
-            ('Ahmed', 'Khan')
-        ]
-        
-        for i, (prenom, nom) in enumerate(noms_chauffeurs, 1):
-            user = User.objects.create_user(
-                username=f'chauffeur{i}',
-                email=f'chauffeur{i}@transport.com',
-                password='chauffeur123',
-                first_name=prenom,
-                last_name=nom
-            )
-            chauffeurs.append(user)
-            users.append(user)
-        
-        self.stdout.write(self.style.SUCCESS(f'Création de {len(users)} utilisateurs terminée.'))
-        
-        # Création des pages d'agences de transport
-        agences = [
-            {
-                'name': 'Transports Express',
-                'description': 'Service de transport rapide et fiable dans toute la région',
-                'category': 'Transport de marchandises',
-                'manager': managers[0]
-            },
-            {
-                'name': 'Camions & Cie',
-                'description': 'Spécialiste du transport longue distance',
-                'category': 'Transport international',
-                'manager': managers[1]
-            },
-            {
-                'name': 'Eco-Transports',
-                'description': 'Solutions de transport écologiques et durables',
-                'category': 'Transport vert',
-                'manager': managers[2]
-            }
-        ]
-        
-        pages = []
-        for agence in agences:
-            page = Page.objects.create(
-                owner=agence['manager'],
-                name=agence['name'],
-                description=agence['description'],
-                category=agence['category'],
-                profile_picture_url='https://example.com/transport-logo.png',
-                cover_photo_url='https://example.com/transport-cover.jpg'
-            )
-            pages.append(page)
-            
+
+        self.stdout.write(self.style.SUCCESS('Chargement des données de transport terminé avec succès !'))
+        self.stdout.write(self.style.SUCCESS('\nComptes de démonstration :'))
+        self.stdout.write(self.style.SUCCESS(f'Admin: email=admin@transport.com, mot de passe=admin123'))
+        self.stdout.write(self.style.SUCCESS(f'Manager 1: email=manager1@transport.com, mot de passe=manager123'))
+        self.stdout.write(self.style.SUCCESS(f'Chauffeur 1: email=chauffeur1@transport.com, mot de passe=chauffeur123'))
+
+    @contextmanager
+    def stage(self, label):
+        """Chronomètre une étape et affiche son débit en lignes par seconde."""
+        rows = 0
+
+        def counter(count):
+            nonlocal rows
+            rows += count
+
+        started = time.perf_counter()
+        yield counter
+        elapsed = max(time.perf_counter() - started, 1e-6)
+        self.stdout.write(self.style.SUCCESS(
+            f'{label} : {rows} lignes en {elapsed:.2f}s ({rows / elapsed:,.0f} lignes/s)'
+        ))
+
+    def upsert(self, model, objs, unique_fields, update_fields):
+        model.objects.bulk_create(
+            objs, batch_size=self.batch_size,
+            update_conflicts=True, unique_fields=unique_fields, update_fields=update_fields,
+        )
+        return len(objs)
+
+    def insert_missing(self, model, objs):
+        model.objects.bulk_create(objs, batch_size=self.batch_size, ignore_conflicts=True)
+        return len(objs)
+
+    def load_users(self):
+        with self.stage('Utilisateurs') as counter:
+            specs = [dict(
+                email='admin@transport.com', username='admin_transport', password=self.hashes['admin'],
+                first_name='Admin', last_name='Transport', is_staff=True, is_superuser=True,
+            )]
+            # Création de gestionnaires d'agence
+            for i in range(1, 3 * self.scale + 1):
+                specs.append(dict(
+                    email=f'manager{i}@transport.com', username=f'manager{i}', password=self.hashes['manager'],
+                    first_name=f'Manager {i}', last_name='Agence', is_staff=False, is_superuser=False,
+                ))
+            # Création de chauffeurs
+            for i in range(1, len(NOMS_CHAUFFEURS) * self.scale + 1):
+                prenom, nom = NOMS_CHAUFFEURS[(i - 1) % len(NOMS_CHAUFFEURS)]
+                specs.append(dict(
+                    email=f'chauffeur{i}@transport.com', username=f'chauffeur{i}', password=self.hashes['chauffeur'],
+                    first_name=prenom, last_name=nom, is_staff=False, is_superuser=False,
+                ))
+
+            objs = [User(id=demo_uuid('user', spec['email']), date_joined=self.now, **spec) for spec in specs]
+            # Upsert sur l'email : un compte existant (même créé par une ancienne version
+            # du script) est mis à jour au lieu de faire échouer la contrainte d'unicité.
+            counter(self.upsert(
+                User, objs, unique_fields=['email'],
+                update_fields=['username', 'password', 'first_name', 'last_name', 'is_staff', 'is_superuser'],
+            ))
+
+            by_email = User.objects.in_bulk([spec['email'] for spec in specs], field_name='email')
+            users = [by_email[spec['email']] for spec in specs]
+
+        manager_count = 3 * self.scale
+        return users[0], users[1:1 + manager_count], users[1 + manager_count:]
+
+    def load_pages(self, managers):
+        # Création des pages d'agences de transport (une par gestionnaire)
+        with self.stage("Pages d'agences") as counter:
+            pages = []
+            for i, manager in enumerate(managers):
+                agence = AGENCES[i % len(AGENCES)]
+                suffix = f' {i // len(AGENCES) + 1}' if i >= len(AGENCES) else ''
+                pages.append(Page(
+                    id=demo_uuid('page', manager.email),
+                    owner=manager,
+                    name=agence['name'] + suffix,
+                    description=agence['description'],
+                    category=agence['category'],
+                    profile_picture_url='https://example.com/transport-logo.png',
+                    cover_photo_url='https://example.com/transport-cover.jpg',
+                ))
+            counter(self.upsert(
+                Page, pages, unique_fields=['id'],
+                update_fields=['owner', 'name', 'description', 'category', 'profile_picture_url', 'cover_photo_url'],
+            ))
+
             # Abonnement du manager à sa page
-            PageSubscription.objects.create(user=agence['manager'], page=page)
-        
-        self.stdout.write(self.style.SUCCESS(f'Création de {len(pages)} pages d\'agences terminée.'))
-        
-        # Création des publications
-        publications = []
-        types_transport = ['Camion frigorifique', 'Porte-voitures', 'Plateau', 'Fourgon', 'Camion-citerne']
-        villes_depart = ['Paris', 'Lyon', 'Marseille', 'Bordeaux', 'Lille', 'Strasbourg', 'Nantes', 'Toulouse']
-        villes_arrivee = ['Berlin', 'Madrid', 'Rome', 'Bruxelles', 'Amsterdam', 'Genève', 'Barcelone', 'Milan']
-        
-        # Publications des agences
-        for page in pages:
-            for i in range(5):  # 5 publications par agence
-                type_transport = random.choice(types_transport)
-                depart = random.choice(villes_depart)
-                arrivee = random.choice([v for v in villes_arrivee if v != depart])
-                
-                post = Post.objects.create(
-                    author=page.owner,
-                    page=page,
-                    content=f"{type_transport} disponible pour un transport de {depart} à {arrivee}. "
-                            f"Capacité: {random.randint(1, 30)} tonnes. Contactez-nous pour un devis !",
-                    media=[{"type": "IMAGE", "url": f"https://example.com/transport-{random.randint(1, 10)}.jpg"}]
-                )
-                publications.append(post)
-        
-        # Publications des chauffeurs
-        for chauffeur in chauffeurs[:5]:  # 5 premiers chauffeurs publient
-            type_transport = random.choice(types_transport)
-            post = Post.objects.create(
-                author=chauffeur,
-                content=f"Chauffeur {type_transport} disponible pour des missions. "
-                        f"Expérience: {random.randint(1, 15)} ans. Permis poids lourd.",
-                media=[{"type": "IMAGE", "url": f"https://example.com/driver-{random.randint(1, 5)}.jpg"}]
-            )
-            publications.append(post)
-        
-        self.stdout.write(self.style.SUCCESS(f'Création de {len(publications)} publications terminée.'))
-        
-        # Création des interactions (likes, commentaires, partages)
+            counter(self.insert_missing(PageSubscription, [
+                PageSubscription(user=page.owner, page=page) for page in pages
+            ]))
+        return pages
+
+    def load_posts(self, pages, chauffeurs):
+        rng = self.rng
+        with self.stage('Publications') as counter:
+            publications = []
+            # Publications des agences (5 par agence)
+            for page in pages:
+                for i in range(5):
+                    type_transport = rng.choice(TYPES_TRANSPORT)
+                    depart = rng.choice(VILLES_DEPART)
+                    arrivee = rng.choice([v for v in VILLES_ARRIVEE if v != depart])
+                    publications.append(Post(
+                        id=demo_uuid('post', page.pk, i),
+                        author=page.owner,
+                        page=page,
+                        content=f"{type_transport} disponible pour un transport de {depart} à {arrivee}. "
+                                f"Capacité: {rng.randint(1, 30)} tonnes. Contactez-nous pour un devis !",
+                        media=[{"type": "IMAGE", "url": f"https://example.com/transport-{rng.randint(1, 10)}.jpg"}]
+                    ))
+
+            # Publications des chauffeurs (la première moitié publie)
+            for chauffeur in chauffeurs[:len(chauffeurs) // 2]:
+                type_transport = rng.choice(TYPES_TRANSPORT)
+                publications.append(Post(
+                    id=demo_uuid('post', chauffeur.pk, 0),
+                    author=chauffeur,
+                    content=f"Chauffeur {type_transport} disponible pour des missions. "
+                            f"Expérience: {rng.randint(1, 15)} ans. Permis poids lourd.",
+                    media=[{"type": "IMAGE", "url": f"https://example.com/driver-{rng.randint(1, 5)}.jpg"}]
+                ))
+
+            counter(self.upsert(Post, publications, unique_fields=['id'], update_fields=['author', 'page', 'content', 'media']))
+        return publications
+
+    def load_interactions(self, users, publications):
+        rng = self.rng
+        likes, comments, shares = [], [], []
         for post in publications:
             # Entre 0 et 10 likes par publication
-            for user in random.sample(users, random.randint(0, min(10, len(users)))):
-                Like.objects.get_or_create(user=user, post=post)
-            
+            for user in rng.sample(users, rng.randint(0, min(10, len(users)))):
+                likes.append(Like(user=user, post=post))
+
             # Entre 0 et 5 commentaires par publication
-            for _ in range(random.randint(0, 5)):
-                Comment.objects.create(
-                    user=random.choice(users),
+            for i in range(rng.randint(0, 5)):
+                comment_id = demo_uuid('comment', post.pk, i)
+                # Commentaires de premier niveau : chacun est la racine de son fil.
+                comments.append(Comment(
+                    id=comment_id,
+                    user=rng.choice(users),
                     post=post,
-                    content=random.choice([
-                        "Intéressant ! Je vais vous contacter.",
-                        "Quel est le tarif pour 10 tonnes ?",
-                        "Disponible la semaine prochaine ?",
-                        "Avez-vous des véhicules réfrigérés ?",
-                        "Je suis intéressé, contactez-moi en MP.",
-                        "Très professionnel, je recommande !"
-                    ])
-                )
-            
+                    content=rng.choice(COMMENTAIRES),
+                    thread_id=comment_id,
+                ))
+
             # Entre 0 et 3 partages par publication
-            for user in random.sample(users, random.randint(0, min(3, len(users)))):
-                Share.objects.create(user=user, post=post)
-        
-        self.stdout.write(self.style.SUCCESS('Création des interactions terminée.'))
-        
+            for user in rng.sample(users, rng.randint(0, min(3, len(users)))):
+                shares.append(Share(id=demo_uuid('share', post.pk, user.pk), user=user, post=post))
+
+        with self.stage('Likes') as counter:
+            counter(self.insert_missing(Like, likes))
+        with self.stage('Commentaires') as counter:
+            counter(self.upsert(Comment, comments, unique_fields=['id'], update_fields=['user', 'content']))
+        with self.stage('Partages') as counter:
+            counter(self.insert_missing(Share, shares))
+
+    def load_boosts(self, pages, publications):
+        rng = self.rng
+        boosts = []
         # Création des boosts pour certaines publications (environ 20% des publications)
-        for post in random.sample(publications, int(len(publications) * 0.2)):
-            start_date = datetime.now() - timedelta(days=random.randint(1, 30))
-            end_date = start_date + timedelta(days=random.randint(7, 30))
-            
-            Boost.objects.create(
-                user=post.author,
-                target_id=post.id,
-                target_type=TargetType.POST,
-                budget=random.uniform(50, 500),
-                start_date=start_date,
-                end_date=end_date,
-                status=random.choice([s[0] for s in BoostStatus.choices])
-            )
-        
+        for post in rng.sample(publications, int(len(publications) * 0.2)):
+            boosts.append(self.build_boost(post.author, post.id, TargetType.POST, rng.uniform(50, 500)))
+
         # Boost pour les pages (1 par page)
         for page in pages:
-            start_date = datetime.now() - timedelta(days=random.randint(1, 30))
-            end_date = start_date + timedelta(days=random.randint(7, 30))
-            
-            Boost.objects.create(
-                user=page.owner,
-                target_id=page.id,
-                target_type=TargetType.PAGE,
-                budget=random.uniform(100, 1000),
-                start_date=start_date,
-                end_date=end_date,
-                status=random.choice([s[0] for s in BoostStatus.choices])
-            )
-        
-        self.stdout.write(self.style.SUCCESS('Création des boosts terminée.'))
-        
-        self.stdout.write(self.style.SUCCESS('Chargement des données de transport terminé avec succès !'))
-        self.stdout.write(self.style.SUCCESS('\nComptes de démonstration :'))
-        self.stdout.write(self.style.SUCCESS(f'Admin: email=admin@transport.com, mot de passe=admin123'))
-        self.stdout.write(self.style.SUCCESS(f'Manager 1: email=manager1@transport.com, mot de passe=manager123'))
-        self.stdout.write(self.style.SUCCESS(f'Chauffeur 1: email=chauffeur1@transport.com, mot de passe=chauffeur123'))
+            boosts.append(self.build_boost(page.owner, page.id, TargetType.PAGE, rng.uniform(100, 1000)))
+
+        with self.stage('Boosts') as counter:
+            counter(self.upsert(
+                Boost, boosts, unique_fields=['id'],
+                update_fields=['user', 'budget', 'start_date', 'end_date', 'status', 'ranking_weight'],
+            ))
+
+    def build_boost(self, user, target_id, target_type, budget):
+        rng = self.rng
+        start_date = self.now - timedelta(days=rng.randint(1, 30))
+        boost = Boost(
+            id=demo_uuid('boost', target_type, target_id),
+            user=user,
+            target_id=target_id,
+            target_type=target_type,
+            budget=Decimal(str(round(budget, 2))),
+            start_date=start_date,
+            end_date=start_date + timedelta(days=rng.randint(7, 30)),
+            status=rng.choice([BoostStatus.ACTIVE, BoostStatus.PAUSED, BoostStatus.COMPLETED]),
+        )
+        boost.calculate_weight()  # bulk_create ne passe pas par save()
+        return boost
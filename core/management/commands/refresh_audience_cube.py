@@ -0,0 +1,16 @@
+import time
+from django.core.management.base import BaseCommand
+
+from core.audience import refresh
+
+
+class Command(BaseCommand):
+    help = "Recalcule le cube d'audience utilisé par /api/boosts/reach_estimate/ (à lancer périodiquement, ex. cron)."
+
+    def handle(self, *args, **options):
+        started = time.time()
+        cube = refresh()
+        self.stdout.write(self.style.SUCCESS(
+            f"Cube d'audience recalculé : {cube.total_users} utilisateurs, "
+            f"{len(cube.data['cells'])} cellules en {time.time() - started:.2f}s"
+        ))
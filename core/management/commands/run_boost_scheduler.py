@@ -0,0 +1,44 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.boosts import run_lifecycle, purge_idempotency_keys
+from core.uploads import sweep as sweep_uploads
+
+
+class Command(BaseCommand):
+    help = (
+        "Fait évoluer le statut des boosts : programmés -> actifs à start_date, "
+        "actifs -> terminés après end_date. Un passage unique (cron) ou une boucle (--loop)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help="Tourner en continu au lieu d'un passage unique")
+        parser.add_argument('--interval', type=int, default=settings.BOOST_SCHEDULER_INTERVAL,
+                            help="Secondes entre deux passages en mode --loop")
+
+    def handle(self, *args, **options):
+        if not options['loop']:
+            self.tick()
+            return
+
+        self.stdout.write(f"Ordonnanceur des boosts démarré (toutes les {options['interval']}s)")
+        try:
+            while True:
+                started = time.monotonic()
+                # Processus long : ne pas garder une connexion fermée côté serveur.
+                close_old_connections()
+                self.tick()
+                time.sleep(max(0, options['interval'] - (time.monotonic() - started)))
+        except KeyboardInterrupt:
+            self.stdout.write("Ordonnanceur arrêté.")
+
+    def tick(self):
+        activated, completed = run_lifecycle()
+        if activated or completed:
+            self.stdout.write(self.style.SUCCESS(f"{activated} boost(s) activé(s), {completed} terminé(s)"))
+        purge_idempotency_keys()
+        retried, purged = sweep_uploads()
+        if retried or purged:
+            self.stdout.write(self.style.SUCCESS(f"{retried} upload(s) relancé(s), {purged} copie(s) locale(s) supprimée(s)"))
@@ -0,0 +1,176 @@
+import contextvars
+import logging
+import random
+import threading
+import time
+from collections import defaultdict
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Instrumentation des requêtes (cf. InstrumentationMiddleware, core/middleware.py) :
+# durée, requêtes SQL et temps passé en base, temps du renderer JSON et taille
+# de la réponse, par endpoint et action. Les compteurs SQL passent par un
+# execute_wrapper posé sur chaque connexion à son ouverture (core/signals.py) :
+# il ne fait qu'un ContextVar.get() hors d'une requête échantillonnée
+# (METRICS_SAMPLE_RATE), et suit aussi les threads de run_io (core/async_views.py),
+# qui reçoivent une copie du contexte de la requête.
+#
+# Les agrégats sont par processus : /api/_metrics renvoie ceux du worker qui répond.
+
+
+class MetricsRegistry:
+    """
+    Agrégats en mémoire du processus (nombre, somme, maximum) par métrique et
+    par jeu de labels. Assez léger pour être alimenté à chaque requête.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                self._series[key] = {'count': 1, 'sum': value, 'max': value}
+            else:
+                series['count'] += 1
+                series['sum'] += value
+                if value > series['max']:
+                    series['max'] = value
+
+    def snapshot(self):
+        """Copie des séries : [(nom, {labels}, {'count', 'sum', 'max'}), ...]"""
+        with self._lock:
+            return [
+                (name, dict(labels), dict(series))
+                for (name, labels), series in sorted(self._series.items())
+            ]
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+registry = MetricsRegistry()
+
+
+def endpoint_name(request):
+    """Nom stable de l'endpoint (nom de route DRF, ex. 'feed-list'), indépendant des ids."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    return match.view_name
+
+
+def view_action(request, view_func):
+    """Action DRF servie ('list', 'like', ...) ou, hors ViewSet, la méthode HTTP."""
+    method = request.method.lower()
+    actions = getattr(view_func, 'actions', None)
+    if actions:
+        return actions.get(method, method)
+    return method
+
+
+def endpoint_labels(request):
+    return {'endpoint': endpoint_name(request), 'action': getattr(request, 'metrics_action', None) or request.method.lower()}
+
+
+class Sample:
+    """Requêtes SQL et temps de rendu d'une requête HTTP échantillonnée."""
+    def __init__(self):
+        # (durée, sql) ; list.append est sûr entre les threads de run_io.
+        self.queries = []
+        self.render_seconds = []
+
+
+_current = contextvars.ContextVar('metrics_sample', default=None)
+
+# Texte SQL journalisé par ordre (les listes IN peuvent être très longues).
+SQL_LOG_CHARS = 2000
+
+
+def start():
+    """Échantillonne la requête courante : le Sample à passer à finish(), ou None."""
+    sample = Sample() if random.random() < settings.METRICS_SAMPLE_RATE else None
+    # Toujours posé : le contexte d'un thread WSGI sert d'une requête à l'autre.
+    _current.set(sample)
+    return sample
+
+
+def record_query(execute, sql, params, many, context):
+    """execute_wrapper : durée et texte des requêtes SQL de la requête échantillonnée."""
+    sample = _current.get()
+    if sample is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        sample.queries.append((time.perf_counter() - started, sql))
+
+
+def record_render(seconds):
+    sample = _current.get()
+    if sample is not None:
+        sample.render_seconds.append(seconds)
+
+
+def finish(request, sample, seconds, size):
+    labels = endpoint_labels(request)
+    registry.observe('http_request_seconds', seconds, **labels)
+    if sample is not None:
+        _current.set(None)
+        registry.observe('db_queries', len(sample.queries), **labels)
+        registry.observe('db_seconds', sum(duration for duration, _ in sample.queries), **labels)
+        registry.observe('render_seconds', sum(sample.render_seconds), **labels)
+
+    if settings.SLOW_REQUEST_MS and seconds * 1000 >= settings.SLOW_REQUEST_MS:
+        log_slow_request(request, labels, sample, seconds, size)
+
+
+def log_slow_request(request, labels, sample, seconds, size):
+    message = f"Requête lente: {labels['endpoint']} ({labels['action']}) {seconds * 1000:.0f} ms, {size} octets"
+    if sample is None:
+        logger.warning(f"{message} {request.get_full_path()} (hors échantillon : SQL non relevé)")
+        return
+
+    # Regroupées par texte SQL (paramètres à part) : un N+1 ressort en une ligne.
+    statements = defaultdict(lambda: [0, 0.0])
+    for duration, sql in sample.queries:
+        statement = statements[sql]
+        statement[0] += 1
+        statement[1] += duration
+    worst = sorted(statements.items(), key=lambda item: item[1][1], reverse=True)[:settings.SLOW_REQUEST_SQL]
+    lines = [
+        f"{message}, {len(sample.queries)} requête(s) SQL "
+        f"({sum(duration for duration, _ in sample.queries) * 1000:.0f} ms) {request.get_full_path()}"
+    ]
+    lines += [f"  {count}× {total * 1000:.1f} ms  {sql[:SQL_LOG_CHARS]}" for sql, (count, total) in worst]
+    logger.warning('\n'.join(lines))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def prometheus(prefix='boost_'):
+    """Séries du registre au format texte de Prometheus : résumé (_count, _sum) et jauge _max."""
+    by_name = defaultdict(list)
+    for name, labels, series in registry.snapshot():
+        by_name[name].append((labels, series))
+
+    lines = []
+    for name, rows in by_name.items():
+        metric = f'{prefix}{name}'
+        lines.append(f'# TYPE {metric} summary')
+        for labels, series in rows:
+            text = ','.join(f'{key}="{_escape(value)}"' for key, value in sorted(labels.items()))
+            lines.append(f'{metric}_count{{{text}}} {series["count"]}')
+            lines.append(f'{metric}_sum{{{text}}} {series["sum"]}')
+        lines.append(f'# TYPE {metric}_max gauge')
+        for labels, series in rows:
+            text = ','.join(f'{key}="{_escape(value)}"' for key, value in sorted(labels.items()))
+            lines.append(f'{metric}_max{{{text}}} {series["max"]}')
+    return '\n'.join(lines) + '\n'
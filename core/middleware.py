@@ -0,0 +1,237 @@
+import logging
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_string
+
+from . import metrics, querybudget
+from .metrics import registry, endpoint_name
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+
+def _gzip(data, max_random_bytes=None):
+    # max_random_bytes : nom de fichier aléatoire dans l'en-tête gzip, qui
+    # rend la longueur de la réponse imprévisible (cf. GZipMiddleware).
+    return compress_string(data, max_random_bytes=max_random_bytes)
+
+
+def _brotli(data):
+    return brotli.compress(data, quality=4)
+
+
+def _zstd(data):
+    return zstandard.ZstdCompressor(level=3).compress(data)
+
+
+# Ordre de préférence du serveur, à qualité égale côté client.
+COMPRESSORS = {'gzip': _gzip}
+if zstandard is not None:
+    COMPRESSORS['zstd'] = _zstd
+if brotli is not None:
+    COMPRESSORS['br'] = _brotli
+PREFERRED_ENCODINGS = ('br', 'zstd', 'gzip')
+
+# Contenus déjà compressés : les recompresser coûte du CPU sans rien gagner.
+INCOMPRESSIBLE_TYPES = (
+    'image/', 'video/', 'audio/', 'font/woff',
+    'application/zip', 'application/gzip', 'application/x-gzip',
+    'application/zstd', 'application/x-brotli', 'application/octet-stream',
+)
+
+
+def parse_accept_encoding(header):
+    """'gzip, br;q=0.8, *;q=0' -> {'gzip': 1.0, 'br': 0.8, '*': 0.0}"""
+    accepted = {}
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def negotiate_encoding(header, encodings=PREFERRED_ENCODINGS):
+    accepted = parse_accept_encoding(header)
+    default = accepted.get('*', 0.0)
+    best, best_quality = None, 0.0
+    for coding in encodings:
+        if coding not in COMPRESSORS:
+            continue
+        quality = accepted.get(coding, default)
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+class InstrumentationMiddleware:
+    """
+    Durée de chaque requête, et pour les requêtes échantillonnées le nombre et
+    la durée des requêtes SQL et le temps du renderer, par endpoint et action
+    (cf. core/metrics.py) ; journalise les requêtes au-delà de SLOW_REQUEST_MS
+    avec leur SQL. Synchrone ou asynchrone selon la chaîne (WSGI / ASGI).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        sample = metrics.start()
+        response = self.get_response(request)
+        self.finish(request, response, sample, started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        sample = metrics.start()
+        response = await self.get_response(request)
+        self.finish(request, response, sample, started)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.metrics_action = metrics.view_action(request, view_func)
+
+    @staticmethod
+    def finish(request, response, sample, started):
+        size = 0 if response.streaming else len(response.content)
+        metrics.finish(request, sample, time.perf_counter() - started, size)
+
+
+class QueryBudgetMiddleware:
+    """
+    En DEBUG uniquement : relève le SQL de chaque requête, journalise les
+    formes répétées (N+1) et les dépassements de budget de l'endpoint
+    (cf. core/querybudget.py), et renvoie le compte dans X-Query-Count.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.DEBUG:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with querybudget.capture() as log:
+            response = self.get_response(request)
+        self.report(request, response, log)
+        return response
+
+    async def __acall__(self, request):
+        with querybudget.capture() as log:
+            response = await self.get_response(request)
+        self.report(request, response, log)
+        return response
+
+    @staticmethod
+    def report(request, response, log):
+        labels = metrics.endpoint_labels(request)
+        endpoint = (labels['endpoint'], labels['action'])
+        problems = querybudget.check(log, querybudget.BUDGETS.get(endpoint), label=' '.join(endpoint))
+        if problems:
+            logger.warning('\n'.join([*problems, f'{request.get_full_path()} :', log.report()]))
+        response['X-Query-Count'] = str(len(log))
+
+
+class PayloadMetricsMiddleware(MiddlewareMixin):
+    """
+    Mesure la taille des réponses (avant compression) par endpoint et signale
+    celles qui dépassent leur budget (PAYLOAD_BUDGETS, sinon PAYLOAD_BUDGET_BYTES).
+    """
+    def process_response(self, request, response):
+        if response.streaming:
+            return response
+
+        endpoint = endpoint_name(request)
+        size = len(response.content)
+        registry.observe('response_bytes', size, **metrics.endpoint_labels(request))
+
+        budget = settings.PAYLOAD_BUDGETS.get(endpoint, settings.PAYLOAD_BUDGET_BYTES)
+        if budget and size > budget:
+            logger.warning(f"Réponse hors budget: {endpoint} {size} octets (budget {budget}) {request.get_full_path()}")
+        return response
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compression des réponses avec négociation (br / zstd si disponibles, gzip),
+    au-delà de COMPRESSION_MIN_SIZE octets. Placé après WhiteNoiseMiddleware :
+    les fichiers statiques (déjà précompressés par WhiteNoise) ne passent pas ici,
+    et les médias déjà compressés sont ignorés via leur Content-Type.
+
+    BREACH : une réponse authentifiée (en-tête Authorization ou cookie) peut
+    contenir à la fois un secret et des données reflétées de la requête
+    (recherche, pagination...) ; sa taille compressée permettrait alors de
+    deviner le secret. Ces réponses restent compressées, mais uniquement en gzip
+    avec le bourrage aléatoire de GZipMiddleware (max_random_bytes). Les réponses
+    anonymes ne portent aucun secret et gardent br / zstd.
+    """
+    max_random_bytes = 100
+
+    def process_response(self, request, response):
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+        if response.get('Content-Type', '').lower().startswith(INCOMPRESSIBLE_TYPES):
+            return response
+
+        accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        if 'HTTP_AUTHORIZATION' in request.META or request.COOKIES:
+            coding = negotiate_encoding(accept_encoding, ('gzip',))
+            if coding is None:
+                return response
+            compressed = _gzip(response.content, max_random_bytes=self.max_random_bytes)
+        else:
+            coding = negotiate_encoding(accept_encoding)
+            if coding is None:
+                return response
+            compressed = COMPRESSORS[coding](response.content)
+        if len(compressed) >= len(response.content):
+            return response
+
+        registry.observe('response_bytes_compressed', len(compressed), encoding=coding, **metrics.endpoint_labels(request))
+
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+        response.headers['Content-Encoding'] = coding
+
+        # Même règle que GZipMiddleware : le corps change, l'ETag devient faible.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        return response
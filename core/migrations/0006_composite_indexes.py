@@ -0,0 +1,29 @@
+# Generated by Django 5.2.11 on 2026-10-19 02:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_alter_user_username'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='boost',
+            index=models.Index(condition=models.Q(('status', 'ACTIVE')), fields=['start_date', 'end_date'], name='boost_active_window_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', '-created_at'], name='comment_post_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='friendship',
+            index=models.Index(fields=['requester', 'status'], name='friendship_requester_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='friendship',
+            index=models.Index(fields=['addressee', 'status'], name='friendship_addressee_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.11 on 2026-10-19 03:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='boost',
+            name='status',
+            field=models.CharField(choices=[('SCHEDULED', 'Scheduled'), ('ACTIVE', 'Active'), ('PAUSED', 'Paused'), ('COMPLETED', 'Completed')], default='ACTIVE', max_length=20),
+        ),
+    ]
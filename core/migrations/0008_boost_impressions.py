@@ -0,0 +1,40 @@
+# Generated by Django 5.2.11 on 2026-10-19 03:04
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_boost_scheduled_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='boost',
+            name='impressions',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='boost',
+            name='spent',
+            field=models.DecimalField(decimal_places=4, default=0, max_digits=12),
+        ),
+        migrations.CreateModel(
+            name='BoostImpression',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cost', models.DecimalField(decimal_places=4, max_digits=10)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('boost', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='impression_log', to='core.boost')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.post')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['boost', 'created_at'], name='core_boosti_boost_i_2951ef_idx')],
+            },
+        ),
+    ]
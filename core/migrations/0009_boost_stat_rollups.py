@@ -0,0 +1,69 @@
+# Generated by Django 5.2.11 on 2026-10-19 03:06
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_boost_impressions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('position', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='like',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='share',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.CreateModel(
+            name='BoostStatDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('impressions', models.PositiveIntegerField(default=0)),
+                ('spend', models.DecimalField(decimal_places=4, default=0, max_digits=12)),
+                ('likes', models.PositiveIntegerField(default=0)),
+                ('comments', models.PositiveIntegerField(default=0)),
+                ('shares', models.PositiveIntegerField(default=0)),
+                ('day', models.DateField()),
+                ('boost', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='core.boost')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='core_boosts_day_fc427d_idx')],
+                'unique_together': {('boost', 'day')},
+            },
+        ),
+        migrations.CreateModel(
+            name='BoostStatHourly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('impressions', models.PositiveIntegerField(default=0)),
+                ('spend', models.DecimalField(decimal_places=4, default=0, max_digits=12)),
+                ('likes', models.PositiveIntegerField(default=0)),
+                ('comments', models.PositiveIntegerField(default=0)),
+                ('shares', models.PositiveIntegerField(default=0)),
+                ('bucket', models.DateTimeField()),
+                ('boost', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hourly_stats', to='core.boost')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['bucket'], name='core_boosts_bucket_94c202_idx')],
+                'unique_together': {('boost', 'bucket')},
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.11 on 2026-10-19 03:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_idempotency_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AudienceCube',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('computed_at', models.DateTimeField(auto_now_add=True)),
+                ('total_users', models.PositiveIntegerField()),
+                ('data', models.JSONField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 5.2.11 on 2026-10-19 03:11
+
+from collections import Counter
+from django.db import migrations, models
+
+MAX_BITS = 63
+
+
+def _normalize(values):
+    return sorted({item.strip().lower() for item in values or [] if isinstance(item, str) and item.strip()})
+
+
+def convert_interests(apps, schema_editor):
+    """
+    Crée la taxonomie à partir des listes JSON existantes puis remplit les masques.
+    Les 63 bits vont d'abord aux intérêts ciblés par des boosts, puis aux plus
+    fréquents chez les utilisateurs.
+    """
+    Interest = apps.get_model('core', 'Interest')
+    User = apps.get_model('core', 'User')
+    Boost = apps.get_model('core', 'Boost')
+
+    targeted = Counter()
+    for values in Boost.objects.values_list('audience_interests', flat=True).iterator():
+        targeted.update(_normalize(values))
+    popular = Counter()
+    for values in User.objects.values_list('interests', flat=True).iterator(chunk_size=5000):
+        popular.update(_normalize(values))
+
+    names = sorted(set(targeted) | set(popular), key=lambda name: (-targeted[name], -popular[name], name))
+    Interest.objects.bulk_create([
+        Interest(name=name, bit=index if index < MAX_BITS else None)
+        for index, name in enumerate(names)
+    ])
+    bits = {name: index for index, name in enumerate(names) if index < MAX_BITS}
+
+    def mask(values):
+        result = 0
+        for name in _normalize(values):
+            if name in bits:
+                result |= 1 << bits[name]
+        return result
+
+    for model, source, target in ((User, 'interests', 'interests_mask'), (Boost, 'audience_interests', 'audience_interests_mask')):
+        pending = []
+        for pk, values in model.objects.values_list('pk', source).iterator(chunk_size=5000):
+            value = mask(values)
+            if value:
+                pending.append(model(pk=pk, **{target: value}))
+            if len(pending) >= 5000:
+                model.objects.bulk_update(pending, [target])
+                pending = []
+        model.objects.bulk_update(pending, [target])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_audience_cube'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Interest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('bit', models.PositiveSmallIntegerField(blank=True, null=True, unique=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='boost',
+            name='audience_interests_mask',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='interests_mask',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(convert_interests, migrations.RunPython.noop),
+    ]
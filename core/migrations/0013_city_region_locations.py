@@ -0,0 +1,119 @@
+# Generated by Django 5.2.11 on 2026-10-19 03:13
+
+import re
+import unicodedata
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Villes du Cameroun (cf. populate_db.CITIES) et leur région administrative.
+CITY_REGIONS = {
+    'Yaoundé': 'Centre', 'Eseka': 'Centre', 'Mbalmayo': 'Centre', 'Nkoteng': 'Centre', 'Bafia': 'Centre',
+    'Douala': 'Littoral', 'Nkongsamba': 'Littoral', 'Loum': 'Littoral', 'Edéa': 'Littoral',
+    'Bamenda': 'Nord-Ouest', 'Wum': 'Nord-Ouest', 'Kumbo': 'Nord-Ouest', 'Bafut': 'Nord-Ouest',
+    'Bafoussam': 'Ouest', 'Foumban': 'Ouest', 'Dschang': 'Ouest', 'Bafang': 'Ouest', 'Mbouda': 'Ouest',
+    'Bangangté': 'Ouest', 'Foumbot': 'Ouest',
+    'Garoua': 'Nord', 'Guider': 'Nord',
+    'Maroua': 'Extrême-Nord', 'Kousséri': 'Extrême-Nord', 'Yagoua': 'Extrême-Nord', 'Mokolo': 'Extrême-Nord',
+    'Mora': 'Extrême-Nord', 'Kaele': 'Extrême-Nord',
+    'Ngaoundéré': 'Adamaoua', 'Meiganga': 'Adamaoua', 'Tibati': 'Adamaoua',
+    'Buea': 'Sud-Ouest', 'Kumba': 'Sud-Ouest', 'Limbe': 'Sud-Ouest', 'Tiko': 'Sud-Ouest', 'Mamfe': 'Sud-Ouest',
+    'Bertoua': 'Est', 'Batouri': 'Est',
+    'Kribi': 'Sud', 'Ebolowa': 'Sud',
+}
+
+
+def _key(text):
+    # Copie figée de core.locations.location_key
+    if not text:
+        return None
+    folded = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+    key = re.sub(r'[^a-z0-9]+', '-', folded.lower()).strip('-')
+    return key or None
+
+
+def seed_locations(apps, schema_editor):
+    Region = apps.get_model('core', 'Region')
+    City = apps.get_model('core', 'City')
+    User = apps.get_model('core', 'User')
+    Boost = apps.get_model('core', 'Boost')
+
+    regions = {}
+    for name in sorted(set(CITY_REGIONS.values())):
+        regions[name] = Region.objects.create(key=_key(name), name=name)
+    City.objects.bulk_create([
+        City(key=_key(name), name=name, region=regions[region]) for name, region in CITY_REGIONS.items()
+    ])
+
+    cities = {_key(name): _key(region) for name, region in CITY_REGIONS.items()}
+    region_keys = {_key(name) for name in regions}
+
+    def resolve(text):
+        key = _key(text)
+        if key is None:
+            return None, None
+        if key in cities:
+            return key, cities[key]
+        if key in region_keys:
+            return None, key
+        return key, None
+
+    # Une mise à jour par valeur distincte, pas par ligne.
+    for model, source, city_field, region_field in (
+        (User, 'city', 'city_key', 'region_key'),
+        (Boost, 'audience_location', 'audience_city_key', 'audience_region_key'),
+    ):
+        for value in model.objects.order_by().values_list(source, flat=True).distinct():
+            city_key, region_key = resolve(value)
+            if city_key or region_key:
+                model.objects.filter(**{source: value}).update(**{city_field: city_key, region_field: region_key})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_interest_taxonomy'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Region',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100, unique=True)),
+                ('name', models.CharField(max_length=100)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='boost',
+            name='audience_city_key',
+            field=models.CharField(blank=True, editable=False, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='boost',
+            name='audience_region_key',
+            field=models.CharField(blank=True, editable=False, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='city_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='region_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=100, null=True),
+        ),
+        migrations.CreateModel(
+            name='City',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100, unique=True)),
+                ('name', models.CharField(max_length=100)),
+                ('region', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cities', to='core.region')),
+            ],
+            options={
+                'verbose_name_plural': 'cities',
+            },
+        ),
+        migrations.RunPython(seed_locations, migrations.RunPython.noop),
+    ]
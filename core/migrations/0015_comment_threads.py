@@ -0,0 +1,38 @@
+# Generated by Django 5.2.11 on 2026-10-19 04:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery
+
+
+def fill_threads(apps, schema_editor):
+    Comment = apps.get_model('core', 'Comment')
+    Comment.objects.filter(parent_comment__isnull=True).update(thread=F('id'), depth=0)
+    # Un niveau de réponses par passage : celles dont le parent a déjà son fil.
+    parent = Comment.objects.filter(pk=OuterRef('parent_comment_id'))
+    while Comment.objects.filter(thread__isnull=True, parent_comment__thread__isnull=False).update(
+        thread=Subquery(parent.values('thread_id')),
+        depth=Subquery(parent.values('depth')) + 1,
+    ):
+        pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_media_upload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='thread',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.comment'),
+        ),
+        migrations.RunPython(fill_threads, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.11 on 2026-10-19 04:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_comment_threads'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='comment',
+            name='thread',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.comment'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(condition=models.Q(('parent_comment__isnull', True)), fields=['post', '-created_at'], name='comment_thread_root_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['thread', 'created_at'], name='comment_thread_created_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.11 on 2026-10-19 06:12
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_comments_count(apps, schema_editor):
+    Post = apps.get_model('core', 'Post')
+    Comment = apps.get_model('core', 'Comment')
+    counts = (
+        Comment.objects.filter(post=OuterRef('pk')).order_by()
+        .values('post').annotate(n=Count('pk')).values('n')
+    )
+    Post.objects.update(comments_count=Coalesce(Subquery(counts, output_field=IntegerField()), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_comment_thread_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_comments_count, migrations.RunPython.noop),
+    ]
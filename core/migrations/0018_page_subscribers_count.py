@@ -0,0 +1,35 @@
+# Generated by Django 5.2.11 on 2026-10-19 06:34
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_subscribers_count(apps, schema_editor):
+    Page = apps.get_model('core', 'Page')
+    PageSubscription = apps.get_model('core', 'PageSubscription')
+    counts = (
+        PageSubscription.objects.filter(page=OuterRef('pk')).order_by()
+        .values('page').annotate(n=Count('pk')).values('n')
+    )
+    Page.objects.update(subscribers_count=Coalesce(Subquery(counts, output_field=IntegerField()), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_post_comments_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='page',
+            name='subscribers_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_subscribers_count, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='pagesubscription',
+            index=models.Index(fields=['page', '-subscribed_at'], name='pagesub_page_recent_idx'),
+        ),
+    ]
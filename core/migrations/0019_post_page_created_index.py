@@ -0,0 +1,17 @@
+# Generated by Django 5.2.11 on 2026-10-19 06:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_page_subscribers_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['page', '-created_at'], name='post_page_created_idx'),
+        ),
+    ]
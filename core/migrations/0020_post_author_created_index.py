@@ -0,0 +1,17 @@
+# Generated by Django 5.2.11 on 2026-10-19 07:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_post_page_created_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-created_at'], name='post_author_created_idx'),
+        ),
+    ]
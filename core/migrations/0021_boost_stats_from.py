@@ -0,0 +1,32 @@
+# Generated by Django 5.2.11 on 2026-10-19 04:37
+
+from django.db import migrations, models
+
+
+def mark_aggregated(apps, schema_editor):
+    # Seul le filigrane est sûr : un boost antidaté sous l'ancien filigrane n'a
+    # jamais été agrégé pour ses premières heures. Les boosts commencés avant le
+    # filigrane sont donc marqués à sa position, et le prochain passage recalcule
+    # leurs heures [start_date, filigrane) (rollups._backfill). Ceux qui
+    # commencent après restent à NULL, comme un boost neuf.
+    RollupWatermark = apps.get_model('core', 'RollupWatermark')
+    Boost = apps.get_model('core', 'Boost')
+    position = RollupWatermark.objects.filter(name='boost_stats').values_list('position', flat=True).first()
+    if position is not None:
+        Boost.objects.filter(start_date__lt=position).update(stats_from=position)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_post_author_created_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='boost',
+            name='stats_from',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(mark_aggregated, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.11 on 2026-10-19 05:17
+
+from django.db import migrations, models
+from django.db.migrations.recorder import MigrationRecorder
+
+
+def forget_backfilled_dates(apps, schema_editor):
+    # 0009 a daté tous les likes et partages existants de l'heure de la
+    # migration, qui gonflait les agrégats horaires. Ils sont tous antérieurs à
+    # l'enregistrement de 0009 : leur date redevient inconnue (NULL), ce qui les
+    # exclut des agrégats. Les heures déjà agrégées sont recalculées au prochain
+    # passage (stats_from au filigrane, cf. 0021).
+    applied = (
+        MigrationRecorder(schema_editor.connection).migration_qs
+        .filter(app='core', name='0009_boost_stat_rollups')
+        .values_list('applied', flat=True).first()
+    )
+    if applied is None:
+        return
+    for name in ('Like', 'Share'):
+        apps.get_model('core', name).objects.filter(created_at__lte=applied).update(created_at=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_boost_stats_from'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='like',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='share',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, null=True),
+        ),
+        migrations.RunPython(forget_backfilled_dates, migrations.RunPython.noop),
+    ]
@@ -4,6 +4,7 @@ from django.contrib.auth.models import AbstractUser
 from django.contrib.auth.validators import UnicodeUsernameValidator
 from django.utils import timezone
 from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
 
 # --- Enum Choices ---
 class TargetType(models.TextChoices):
@@ -11,6 +12,7 @@ class TargetType(models.TextChoices):
     POST = 'POST', 'Post'
 
 class BoostStatus(models.TextChoices):
+    SCHEDULED = 'SCHEDULED', 'Scheduled'
     ACTIVE = 'ACTIVE', 'Active'
     PAUSED = 'PAUSED', 'Paused'
     COMPLETED = 'COMPLETED', 'Completed'
@@ -21,9 +23,60 @@ class FriendStatus(models.TextChoices):
     DECLINED = 'DECLINED', 'Declined'
     BLOCKED = 'BLOCKED', 'Blocked'
 
+class UploadStatus(models.TextChoices):
+    PENDING = 'PENDING', 'Pending'
+    PUSHING = 'PUSHING', 'Pushing'
+    DONE = 'DONE', 'Done'
+    FAILED = 'FAILED', 'Failed'
+
 # --- Models ---
 
-class User(AbstractUser):
+class Interest(models.Model):
+    """Centre d'intérêt normalisé ; `bit` est sa position dans les masques (NULL au-delà de 63)."""
+    name = models.CharField(max_length=100, unique=True)
+    bit = models.PositiveSmallIntegerField(unique=True, null=True, blank=True)
+
+    def __str__(self):
+        return self.name
+
+class Region(models.Model):
+    key = models.CharField(max_length=100, unique=True)
+    name = models.CharField(max_length=100)
+
+    def __str__(self):
+        return self.name
+
+class City(models.Model):
+    """Ville rattachée à sa région ; `key` est la clé canonique (cf. core/locations.py)."""
+    key = models.CharField(max_length=100, unique=True)
+    name = models.CharField(max_length=100)
+    region = models.ForeignKey(Region, on_delete=models.CASCADE, related_name='cities')
+
+    class Meta:
+        verbose_name_plural = 'cities'
+
+    def __str__(self):
+        return self.name
+
+class DerivedFieldsMixin:
+    """
+    Champs recalculés en pre_save à partir d'un champ source (cf. core/signals.py) :
+    un save(update_fields=[source]) écrit aussi les champs qui en dérivent.
+    """
+    derived_fields = {}
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            for source, fields in self.derived_fields.items():
+                if source in update_fields:
+                    update_fields.update(fields)
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+
+
+class User(DerivedFieldsMixin, AbstractUser):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     username_validator = UnicodeUsernameValidator()
 
@@ -40,12 +93,18 @@ class User(AbstractUser):
     profile_picture_url = models.URLField(blank=True, null=True)
     cover_photo_url = models.URLField(blank=True, null=True)
     city = models.CharField(max_length=100, blank=True, null=True)
+    # Clés canoniques dérivées de `city` à la sauvegarde (cf. core/locations.py)
+    city_key = models.CharField(max_length=100, blank=True, null=True, db_index=True, editable=False)
+    region_key = models.CharField(max_length=100, blank=True, null=True, db_index=True, editable=False)
     gender = models.CharField(max_length=10, blank=True, null=True)
     birth_date = models.DateField(blank=True, null=True)
     interests = models.JSONField(default=list, blank=True)
+    # Bits des intérêts dans la taxonomie (cf. core/interests.py), tenu à jour à la sauvegarde
+    interests_mask = models.BigIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
+    derived_fields = {'interests': ('interests_mask',), 'city': ('city_key', 'region_key')}
 
     # Pour éviter les conflits avec le système auth par défaut de Django
     groups = models.ManyToManyField('auth.Group', related_name='custom_user_set', blank=True)
@@ -67,6 +126,8 @@ class Page(models.Model):
     category = models.CharField(max_length=100)
     created_at = models.DateTimeField(auto_now_add=True)
     subscribers = models.ManyToManyField(User, through='PageSubscription', related_name='subscribed_pages')
+    # Nombre d'abonnés, tenu à jour à l'écriture (cf. core/signals.py et core/counters.py).
+    subscribers_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.name
@@ -77,7 +138,12 @@ class PageSubscription(models.Model):
     subscribed_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
+        # L'index unique (user, page) sert aussi les recherches par utilisateur (Feed).
         unique_together = ('user', 'page')
+        indexes = [
+            # Abonnés d'une page, du plus récent au plus ancien (PageViewSet.subscribers).
+            models.Index(fields=['page', '-subscribed_at'], name='pagesub_page_recent_idx'),
+        ]
 
 class Post(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -86,6 +152,8 @@ class Post(models.Model):
     content = models.TextField()
     # On stocke les médias en JSON: [{"type": "IMAGE", "url": "..."}]
     media = models.JSONField(default=list, blank=True) 
+    # Nombre de commentaires, tenu à jour à l'écriture (cf. core/signals.py et core/counters.py).
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def save(self, *args, **kwargs):
@@ -98,6 +166,10 @@ class Post(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['created_at']), # Pour accélérer le Feed
+            # Posts d'une page, du plus récent au plus ancien (PageViewSet.posts).
+            models.Index(fields=['page', '-created_at'], name='post_page_created_idx'),
+            # Posts écrits par un utilisateur (fil du profil, cf. core/timelines.py).
+            models.Index(fields=['author', '-created_at'], name='post_author_created_idx'),
         ]
 
     @property
@@ -106,9 +178,33 @@ class Post(models.Model):
 
     @property
     def total_comments(self):
-        return self.comments.count()    
+        return self.comments_count
+
+class MediaUpload(models.Model):
+    """
+    Fichier reçu par /api/upload/ : déposé en staging local (URL provisoire),
+    puis envoyé au stockage distant en arrière-plan (cf. core/uploads.py).
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='uploads')
+    # Même nom relatif en staging et sur le stockage distant : uploads/<user>/<uuid>.<ext>
+    name = models.CharField(max_length=255, unique=True)
+    media_type = models.CharField(max_length=10, default='IMAGE')
+    status = models.CharField(max_length=20, choices=UploadStatus.choices, default=UploadStatus.PENDING)
+    url = models.URLField(max_length=500, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    # Copie locale encore présente (supprimée MEDIA_STAGING_TTL secondes après l'envoi).
+    staged = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'updated_at'], name='mediaupload_status_idx'),
+        ]
 
-class Boost(models.Model):
+class Boost(DerivedFieldsMixin, models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     
@@ -122,10 +218,34 @@ class Boost(models.Model):
     status = models.CharField(max_length=20, choices=BoostStatus.choices, default=BoostStatus.ACTIVE)
     ranking_weight = models.IntegerField(default=0)
     audience_location = models.CharField(max_length=100, blank=True, null=True)
+    audience_city_key = models.CharField(max_length=100, blank=True, null=True, editable=False)
+    audience_region_key = models.CharField(max_length=100, blank=True, null=True, editable=False)
     audience_age_min = models.IntegerField(blank=True, null=True)
     audience_age_max = models.IntegerField(blank=True, null=True)
     audience_gender = models.CharField(max_length=10, blank=True, null=True)
     audience_interests = models.JSONField(default=list, blank=True)
+    audience_interests_mask = models.BigIntegerField(default=0, editable=False)
+    # Compteurs alimentés par le registre d'impressions (cf. core/impressions.py)
+    impressions = models.PositiveIntegerField(default=0)
+    spent = models.DecimalField(max_digits=12, decimal_places=4, default=0)
+    # Première heure agrégée pour ce boost (cf. core/rollups.py) : au-delà de
+    # start_date, les heures précédentes restent à rattraper.
+    stats_from = models.DateTimeField(null=True, blank=True, editable=False)
+
+    derived_fields = {
+        'audience_interests': ('audience_interests_mask',),
+        'audience_location': ('audience_city_key', 'audience_region_key'),
+    }
+
+    class Meta:
+        indexes = [
+            # Index partiel : le Feed ne lit que les boosts actifs dans leur fenêtre de diffusion.
+            models.Index(
+                fields=['start_date', 'end_date'],
+                condition=models.Q(status='ACTIVE'),
+                name='boost_active_window_idx',
+            ),
+        ]
 
     def save(self, *args, **kwargs):
         self.calculate_weight()
@@ -143,6 +263,39 @@ class Boost(models.Model):
         weight += int(self.budget / 10)
         self.ranking_weight = weight
 
+class BoostImpression(models.Model):
+    """Registre des posts boostés servis dans le Feed (une ligne par affichage)."""
+    boost = models.ForeignKey(Boost, on_delete=models.CASCADE, related_name='impression_log')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    cost = models.DecimalField(max_digits=10, decimal_places=4)
+    # Horodaté au moment de l'affichage, pas de l'écriture (différée par le tampon).
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['boost', 'created_at']),
+        ]
+
+class AudienceCube(models.Model):
+    """Instantané du cube d'audience (cf. core/audience.py), recalculé périodiquement."""
+    computed_at = models.DateTimeField(auto_now_add=True)
+    total_users = models.PositiveIntegerField()
+    data = models.JSONField()
+
+class IdempotencyKey(models.Model):
+    """Réponse mémorisée d'une requête rejouable (en-tête Idempotency-Key)."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    key = models.CharField(max_length=255)
+    # Opération et ressource visées : une clé ne peut pas servir pour une autre requête.
+    scope = models.CharField(max_length=100)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('user', 'key')
+
 class Friendship(models.Model):
     requester = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sent_requests')
     addressee = models.ForeignKey(User, on_delete=models.CASCADE, related_name='received_requests')
@@ -151,11 +304,18 @@ class Friendship(models.Model):
 
     class Meta:
         unique_together = ('requester', 'addressee')
+        indexes = [
+            # (requester=user OR addressee=user) AND status=... : un index par branche du OR.
+            models.Index(fields=['requester', 'status'], name='friendship_requester_idx'),
+            models.Index(fields=['addressee', 'status'], name='friendship_addressee_idx'),
+        ]
 
 # Interactions
 class Like(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='likes')
+    # NULL : like antérieur à la migration 0009, date inconnue (hors agrégats).
+    created_at = models.DateTimeField(auto_now_add=True, null=True)
 
     class Meta:
         unique_together = ('user', 'post')
@@ -166,9 +326,59 @@ class Comment(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comments')
     content = models.TextField()
     parent_comment = models.ForeignKey('self', null=True, blank=True, on_delete=models.CASCADE)
+    # Fil de discussion : commentaire racine (lui-même au premier niveau) et
+    # profondeur, renseignés à l'écriture (cf. core/signals.py).
+    thread = models.ForeignKey('self', on_delete=models.CASCADE, related_name='+', editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # CommentViewSet : filtre sur le post, tri par date décroissante.
+            models.Index(fields=['post', '-created_at'], name='comment_post_created_idx'),
+            # Fils d'un post : commentaires de premier niveau uniquement.
+            models.Index(fields=['post', '-created_at'], name='comment_thread_root_idx',
+                         condition=models.Q(parent_comment__isnull=True)),
+            # Réponses d'un ou plusieurs fils, dans l'ordre chronologique.
+            models.Index(fields=['thread', 'created_at'], name='comment_thread_created_idx'),
+        ]
+
 class Share(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
-    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='shares')
\ No newline at end of file
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='shares')
+    # NULL : partage antérieur à la migration 0009, date inconnue (hors agrégats).
+    created_at = models.DateTimeField(auto_now_add=True, null=True)
+
+# Statistiques des boosts, pré-agrégées (cf. core/rollups.py)
+class BoostStatBase(models.Model):
+    impressions = models.PositiveIntegerField(default=0)
+    spend = models.DecimalField(max_digits=12, decimal_places=4, default=0)
+    likes = models.PositiveIntegerField(default=0)
+    comments = models.PositiveIntegerField(default=0)
+    shares = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+class BoostStatHourly(BoostStatBase):
+    boost = models.ForeignKey(Boost, on_delete=models.CASCADE, related_name='hourly_stats')
+    bucket = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('boost', 'bucket')
+        # L'agrégateur remplace une plage d'heures, tous boosts confondus.
+        indexes = [models.Index(fields=['bucket'])]
+
+class BoostStatDaily(BoostStatBase):
+    boost = models.ForeignKey(Boost, on_delete=models.CASCADE, related_name='daily_stats')
+    day = models.DateField()
+
+    class Meta:
+        unique_together = ('boost', 'day')
+        indexes = [models.Index(fields=['day'])]
+
+class RollupWatermark(models.Model):
+    """Fin de la dernière heure entièrement agrégée, par agrégat."""
+    name = models.CharField(max_length=50, unique=True)
+    position = models.DateTimeField()
@@ -0,0 +1,55 @@
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+
+class CommentPagination(CursorPagination):
+    """
+    Commentaires d'un post, du plus récent au plus ancien (index (post, created_at)).
+    Le total vient du compteur Post.comments_count, pas d'un COUNT(*).
+    """
+    ordering = ('-created_at', '-id')
+
+    def get_paginated_response(self, data, count=None):
+        return Response({
+            'count': count,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+
+class PostPagination(CursorPagination):
+    """Posts d'une page, du plus récent au plus ancien (index (page, created_at))."""
+    ordering = ('-created_at', '-id')
+
+
+class SubscriberPagination(CursorPagination):
+    """Abonnés d'une page, du plus récent au plus ancien (index (page, subscribed_at))."""
+    ordering = ('-subscribed_at', '-id')
+    page_size = 50
+
+
+class ThreadPagination(CursorPagination):
+    """Commentaires de premier niveau d'un post, du plus récent au plus ancien."""
+    ordering = ('-created_at', '-id')
+
+
+class ReplyPagination(CursorPagination):
+    """Réponses d'un fil, dans l'ordre chronologique."""
+    ordering = ('created_at', 'id')
+
+    def next_link_after(self, base_url, page, following):
+        """
+        Lien vers la suite d'un fil dont `page` (premières réponses) est déjà
+        servie et dont `following` est la réponse suivante : même curseur que
+        celui que paginate_queryset() aurait produit pour cette page.
+        """
+        if not page:
+            return base_url
+        self.base_url = base_url
+        self.page = page
+        self.page_size = len(page)
+        self.cursor = None
+        self.has_next, self.has_previous = True, False
+        self.next_position = self._get_position_from_instance(following, self.ordering)
+        return self.get_next_link()
@@ -0,0 +1,161 @@
+import contextvars
+import re
+from collections import Counter
+from contextlib import ContextDecorator
+from django.conf import settings
+
+# Budgets de requêtes SQL. Chaque ordre est réduit à son empreinte (littéraux,
+# paramètres et listes IN remplacés) : un N+1 — la même requête rejouée pour
+# chaque ligne d'une page — apparaît comme une empreinte répétée, quel que soit
+# le nombre de lignes. query_budget() (gestionnaire de contexte ou décorateur)
+# fait échouer un test au-delà du budget d'un endpoint (BUDGETS) ou d'une
+# répétition ; QueryBudgetMiddleware (core/middleware.py) signale les mêmes
+# dépassements dans le journal, en DEBUG uniquement.
+#
+# Le relevé passe par un execute_wrapper posé sur chaque connexion
+# (core/signals.py) : hors d'un relevé actif, il ne coûte qu'un ContextVar.get().
+
+# Nombre maximal de requêtes par (endpoint, action) pour une page pleine,
+# authentification JWT comprise (lecture de l'utilisateur) : il ne dépend pas
+# du nombre de lignes renvoyées. Le plus coûteux des deux chemins de
+# sérialisation (FAST_SERIALIZATION), cache froid compris (auteurs suivis du
+# fil pour ses validateurs) ; un endpoint absent n'a pas de budget.
+BUDGETS = {
+    ('feed-list', 'list'): 9,
+    ('post-list', 'list'): 5,
+    ('post-detail', 'retrieve'): 5,
+    ('page-list', 'list'): 3,
+    ('page-detail', 'retrieve'): 2,
+    ('page-posts', 'posts'): 6,
+    ('page-subscribers', 'subscribers'): 3,
+    ('comment-list', 'list'): 4,
+    ('comment-threads', 'threads'): 3,
+    ('friendship-list', 'list'): 3,
+    ('user-list', 'list'): 3,
+    ('user-detail', 'retrieve'): 2,
+    ('user-posts', 'posts'): 7,
+    ('user-friends', 'friends'): 4,
+    ('global-search', 'get'): 3,
+    # Versions ASGI (core/async_views.py). Le fil lit les pages suivies à part
+    # (lectures en parallèle) au lieu d'une sous-requête : une de plus qu'en WSGI.
+    ('async-feed', 'get'): 10,
+    ('async-search', 'get'): 3,
+    ('async-upload', 'post'): 3,
+}
+
+# Ordres de contrôle des transactions : répétés par construction (un par atomic()).
+IGNORED = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT', 'BEGIN', 'COMMIT')
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'(?<![\w."])-?\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s|%\(\w+\)s|\?')
+_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_ROWS = re.compile(r'(?:\(\.\.\.\)\s*,\s*)+\(\.\.\.\)')
+_SPACES = re.compile(r'\s+')
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def fingerprint(sql):
+    """Forme d'un ordre SQL, indépendante de ses valeurs : "... WHERE id IN (...) LIMIT ?"."""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _LIST.sub('(...)', sql)
+    sql = _ROWS.sub('(...)', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+class QueryLog:
+    """Ordres SQL exécutés pendant un relevé (toutes connexions et threads de run_io)."""
+    def __init__(self):
+        # list.append est sûr entre les threads de run_io.
+        self.statements = []
+
+    def __len__(self):
+        return len(self.statements)
+
+    def shapes(self):
+        """Counter {empreinte: nombre d'exécutions}, hors contrôle des transactions."""
+        return Counter(
+            fingerprint(sql) for sql in self.statements if not sql.lstrip().upper().startswith(IGNORED)
+        )
+
+    def repeated(self, limit):
+        """[(empreinte, nombre)] des formes exécutées plus de `limit` fois, les plus répétées d'abord."""
+        return [(shape, count) for shape, count in self.shapes().most_common() if count > limit]
+
+    def report(self):
+        return '\n'.join(f'  {count}× {shape}' for shape, count in self.shapes().most_common())
+
+
+_active = contextvars.ContextVar('query_logs', default=())
+
+
+def record_query(execute, sql, params, many, context):
+    """execute_wrapper : ajoute l'ordre aux relevés actifs (imbriqués compris)."""
+    for log in _active.get():
+        log.statements.append(sql)
+    return execute(sql, params, many, context)
+
+
+class capture:
+    """Relève les ordres SQL du bloc : `with capture() as log: ...`"""
+    def __enter__(self):
+        self.log = QueryLog()
+        self._token = _active.set((*_active.get(), self.log))
+        return self.log
+
+    def __exit__(self, *exc_info):
+        _active.reset(self._token)
+
+
+def check(log, max_queries=None, max_repeats=None, label='bloc'):
+    """Messages des dépassements du relevé (liste vide si le budget est tenu)."""
+    if max_repeats is None:
+        max_repeats = settings.QUERY_REPEAT_LIMIT
+    problems = []
+    if max_queries is not None and len(log) > max_queries:
+        problems.append(f'{label}: {len(log)} requêtes SQL pour un budget de {max_queries}')
+    for shape, count in log.repeated(max_repeats):
+        problems.append(f'{label}: requête répétée {count}× (N+1 ?) : {shape}')
+    return problems
+
+
+class query_budget(ContextDecorator):
+    """
+    Échoue (QueryBudgetExceeded) si le bloc ou la fonction décorée dépasse
+    `max_queries` requêtes ou répète une même forme plus de `max_repeats` fois
+    (QUERY_REPEAT_LIMIT par défaut). `endpoint=('feed-list', 'list')` prend le
+    budget déclaré dans BUDGETS.
+
+        with query_budget(endpoint=('post-list', 'list')):
+            client.get('/api/posts/')
+
+        @query_budget(5)
+        def test_...(self): ...
+    """
+    def __init__(self, max_queries=None, max_repeats=None, endpoint=None):
+        if endpoint is not None and max_queries is None:
+            max_queries = BUDGETS[endpoint]
+        self.max_queries = max_queries
+        self.max_repeats = max_repeats
+        self.label = ' '.join(endpoint) if endpoint else 'bloc'
+        self._captures = []
+
+    def __enter__(self):
+        # Pile : un même décorateur peut servir à des appels imbriqués ou récursifs.
+        self._captures.append(capture())
+        return self._captures[-1].__enter__()
+
+    def __exit__(self, exc_type, exc, traceback):
+        current = self._captures.pop()
+        current.__exit__(exc_type, exc, traceback)
+        if exc_type is not None:
+            return False
+        problems = check(current.log, self.max_queries, self.max_repeats, self.label)
+        if problems:
+            raise QueryBudgetExceeded('\n'.join(problems) + '\n' + current.log.report())
+        return False
@@ -0,0 +1,55 @@
+import time
+from django.conf import settings
+from rest_framework.utils import encoders
+from rest_framework.renderers import JSONRenderer
+
+from . import metrics
+
+try:
+    import orjson
+except ImportError:  # orjson est optionnel : on retombe sur le renderer JSON de DRF
+    orjson = None
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    Renderer JSON basé sur orjson, avec une sortie identique octet pour octet
+    à celle de `rest_framework.renderers.JSONRenderer` (JSON compact, UTF-8,
+    \\u2028/\\u2029 échappés), activé par settings.FAST_SERIALIZATION. Sans
+    ce réglage, sans orjson ou si une indentation est demandée, on délègue au
+    renderer de DRF ; le temps de rendu est mesuré dans tous les cas (cf.
+    core/metrics.py).
+    """
+    # Les dates sont laissées à l'encodeur de DRF pour garder le suffixe 'Z'.
+    _encoder = encoders.JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        started = time.perf_counter()
+        try:
+            return self.encode(data, accepted_media_type, renderer_context)
+        finally:
+            metrics.record_render(time.perf_counter() - started)
+
+    def encode(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        renderer_context = renderer_context or {}
+        if (
+            orjson is None or not getattr(settings, 'FAST_SERIALIZATION', False)
+            or self.get_indent(accepted_media_type, renderer_context) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self._encoder.default,
+                option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME,
+            )
+        except TypeError:
+            # Types non gérés par orjson (entiers > 64 bits, etc.) : comportement de DRF.
+            return super().render(data, accepted_media_type, renderer_context)
+
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
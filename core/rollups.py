@@ -0,0 +1,171 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate, TruncHour
+from django.utils import timezone
+
+from .models import (
+    Boost, BoostImpression, BoostStatHourly, BoostStatDaily, RollupWatermark,
+    Like, Comment, Share, TargetType,
+)
+
+# Agrégation incrémentale des statistiques de boosts, par heure puis par jour.
+# Chaque passage recalcule entièrement les heures closes depuis le dernier
+# filigrane (RollupWatermark) : rejouer un passage donne le même résultat.
+#
+# Un boost créé avec une date de début antérieure au filigrane est rattrapé à
+# part : Boost.stats_from note la première heure agrégée pour lui, et ses heures
+# [start_date, stats_from) sont recalculées pour lui seul (_backfill).
+
+WATERMARK = 'boost_stats'
+STAT_FIELDS = ('impressions', 'spend', 'likes', 'comments', 'shares')
+INTERACTIONS = ((Like, 'likes'), (Comment, 'comments'), (Share, 'shares'))
+
+
+def floor_hour(value):
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def _empty():
+    return {'impressions': 0, 'spend': Decimal('0'), 'likes': 0, 'comments': 0, 'shares': 0}
+
+
+def aggregate(now=None):
+    """
+    Agrège les heures closes (avant now - ROLLUP_LAG) non encore traitées, au
+    plus ROLLUP_MAX_HOURS par passage, puis rattrape les boosts antidatés.
+    Retourne le nombre d'heures traitées par le filigrane (hors rattrapage).
+    """
+    now = now or timezone.now()
+    end = floor_hour(now - timedelta(seconds=settings.ROLLUP_LAG))
+
+    watermark = RollupWatermark.objects.filter(name=WATERMARK).first()
+    if watermark is not None:
+        start = watermark.position
+    else:
+        first = Boost.objects.order_by('start_date').values_list('start_date', flat=True).first()
+        if first is None:
+            return 0
+        start = floor_hour(first)
+
+    end = min(end, start + timedelta(hours=settings.ROLLUP_MAX_HOURS))
+    if start >= end:
+        _backfill(start)
+        return 0
+
+    with transaction.atomic():
+        _replace(start, end)
+        _mark_covered(start, end)
+        RollupWatermark.objects.update_or_create(name=WATERMARK, defaults={'position': end})
+    _backfill(end)
+    return int((end - start).total_seconds() // 3600)
+
+
+def _replace(start, end, boost_ids=None):
+    """Remplace les lignes horaires de [start, end) (de tous les boosts, ou de boost_ids) et les jours touchés."""
+    hourly = _hourly_counts(start, end, boost_ids)
+    stale = BoostStatHourly.objects.filter(bucket__gte=start, bucket__lt=end)
+    if boost_ids is not None:
+        stale = stale.filter(boost_id__in=boost_ids)
+    stale.delete()
+    BoostStatHourly.objects.bulk_create(
+        [BoostStatHourly(boost_id=boost_id, bucket=bucket, **stats) for (boost_id, bucket), stats in hourly.items()],
+        batch_size=1000,
+    )
+    _rebuild_daily(start, end)
+
+
+def _mark_covered(start, end):
+    """Première heure agrégée des boosts vus pour la première fois par ce passage."""
+    boosts = list(Boost.objects.filter(stats_from__isnull=True, start_date__lt=end).only('id', 'start_date'))
+    for boost in boosts:
+        boost.stats_from = max(floor_hour(boost.start_date), start)
+    Boost.objects.bulk_update(boosts, ['stats_from'], batch_size=1000)
+
+
+def _backfill(position):
+    """Heures antérieures à stats_from des boosts antidatés, par tranches de ROLLUP_MAX_HOURS."""
+    # Créés depuis le dernier passage avec un début sous le filigrane : rien d'agrégé pour eux.
+    Boost.objects.filter(stats_from__isnull=True, start_date__lt=position).update(stats_from=position)
+    pending = Boost.objects.filter(stats_from__gt=F('start_date')).values_list('id', 'start_date', 'stats_from')
+    for boost_id, start_date, stats_from in pending:
+        while stats_from > start_date:
+            lower = max(floor_hour(start_date), stats_from - timedelta(hours=settings.ROLLUP_MAX_HOURS))
+            with transaction.atomic():
+                _replace(lower, stats_from, [boost_id])
+                Boost.objects.filter(pk=boost_id).update(stats_from=lower)
+            stats_from = lower
+
+
+def _hourly_counts(start, end, boost_ids=None):
+    boosts = Boost.objects.filter(start_date__lt=end, end_date__gte=start)
+    if boost_ids is not None:
+        boosts = boosts.filter(pk__in=boost_ids)
+    boosts = list(boosts.values('id', 'target_type', 'target_id', 'start_date', 'end_date'))
+    counts = defaultdict(_empty)
+    if not boosts:
+        return counts
+
+    rows = (
+        BoostImpression.objects
+        .filter(boost_id__in=[boost['id'] for boost in boosts], created_at__gte=start, created_at__lt=end)
+        .annotate(bucket=TruncHour('created_at'))
+        .values('boost_id', 'bucket')
+        .annotate(n=Count('id'), cost=Sum('cost'))
+    )
+    for row in rows:
+        stats = counts[(row['boost_id'], row['bucket'])]
+        stats['impressions'] = row['n']
+        stats['spend'] = row['cost'] or Decimal('0')
+
+    # Interactions sur les cibles boostées : le post lui-même, ou les posts de la page.
+    by_post, by_page = defaultdict(list), defaultdict(list)
+    for boost in boosts:
+        (by_post if boost['target_type'] == TargetType.POST else by_page)[boost['target_id']].append(boost)
+
+    for model, field in INTERACTIONS:
+        window = model.objects.filter(created_at__gte=start, created_at__lt=end).annotate(bucket=TruncHour('created_at'))
+        for targets, column in ((by_post, 'post_id'), (by_page, 'post__page_id')):
+            if not targets:
+                continue
+            rows = (
+                window.filter(**{f'{column}__in': list(targets)})
+                .values(column, 'bucket')
+                .annotate(n=Count('pk'))
+            )
+            for row in rows:
+                for boost in targets[row[column]]:
+                    # Seules les interactions pendant la diffusion sont attribuées au boost.
+                    if floor_hour(boost['start_date']) <= row['bucket'] <= boost['end_date']:
+                        counts[(boost['id'], row['bucket'])][field] += row['n']
+    return counts
+
+
+def _rebuild_daily(start, end):
+    """Recalcule les jours touchés par [start, end) à partir des lignes horaires."""
+    first_day = timezone.localtime(start).date()
+    last_day = timezone.localtime(end - timedelta(microseconds=1)).date()
+    # Bornes en datetime pour que le filtre porte sur la colonne indexée `bucket`.
+    range_start = timezone.make_aware(datetime.combine(first_day, time.min))
+    range_end = timezone.make_aware(datetime.combine(last_day + timedelta(days=1), time.min))
+
+    rows = (
+        BoostStatHourly.objects
+        .filter(bucket__gte=range_start, bucket__lt=range_end)
+        .annotate(day=TruncDate('bucket'))
+        .values('boost_id', 'day')
+        .annotate(**{f'total_{field}': Sum(field) for field in STAT_FIELDS})
+    )
+    daily = [
+        BoostStatDaily(boost_id=row['boost_id'], day=row['day'], **{field: row[f'total_{field}'] for field in STAT_FIELDS})
+        for row in rows
+    ]
+    BoostStatDaily.objects.filter(day__gte=first_day, day__lte=last_day).delete()
+    BoostStatDaily.objects.bulk_create(daily, batch_size=1000)
+
+
+def last_aggregated():
+    return RollupWatermark.objects.filter(name=WATERMARK).values_list('position', flat=True).first()
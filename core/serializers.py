@@ -2,10 +2,13 @@
 import logging
 from rest_framework import serializers
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from django.conf import settings
 from django.contrib.auth import authenticate, get_user_model
 from django.contrib.auth.models import update_last_login
 from rest_framework_simplejwt.settings import api_settings
-from .models import Post, Page, Comment, Boost, Friendship
+from django.db.models import Count
+from . import interactions, locations
+from .models import Post, Page, PageSubscription, Comment, Boost, Friendship, Like, BoostStatHourly, BoostStatDaily
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
@@ -113,6 +116,14 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'date_joined']
 
 
+class UserSummarySerializer(serializers.ModelSerializer):
+    """Auteur imbriqué dans les listes volumineuses (commentaires) : identité et avatar."""
+    class Meta:
+        model = User
+        fields = ['id', 'username', 'first_name', 'last_name', 'profile_picture_url']
+        read_only_fields = fields
+
+
 class UserCreateSerializer(serializers.ModelSerializer):
     """Sérialiseur pour créer un nouvel utilisateur"""
     password = serializers.CharField(write_only=True, min_length=8)
@@ -150,8 +161,8 @@ class UserCreateSerializer(serializers.ModelSerializer):
 
 class PostSerializer(serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
-    likes_count = serializers.IntegerField(source='likes.count', read_only=True)
-    comments_count = serializers.IntegerField(source='comments.count', read_only=True)
+    likes_count = serializers.SerializerMethodField()
+    comments_count = serializers.IntegerField(read_only=True)
     is_liked = serializers.SerializerMethodField()
     relevance_score = serializers.FloatField(read_only=True, required=False)
 
@@ -182,14 +193,60 @@ class PostSerializer(serializers.ModelSerializer):
             })
 
         return attrs
+    @staticmethod
+    def attach_engagement(posts, user):
+        """
+        Likes d'une page de posts en deux requêtes (au lieu de deux par post) :
+        `num_likes` et `viewer_liked`, lus ensuite par le sérialiseur. Le compte
+        n'est pas relu si le queryset l'annote déjà (cf. FeedViewSet). Les likes
+        en attente du lecteur (`pending_like`) en une lecture du cache.
+        """
+        post_ids = [post.pk for post in posts]
+        uncounted = [post.pk for post in posts if getattr(post, 'num_likes', None) is None]
+        counts = {}
+        if uncounted:
+            counts = dict(
+                Like.objects.filter(post_id__in=uncounted).values('post_id').annotate(n=Count('pk'))
+                .values_list('post_id', 'n')
+            )
+        liked, pending = set(), {}
+        if user.is_authenticated and post_ids:
+            liked = set(Like.objects.filter(user=user, post_id__in=post_ids).values_list('post_id', flat=True))
+            pending = interactions.pending_likes(user.id, post_ids)
+        for post in posts:
+            if post.pk in counts or getattr(post, 'num_likes', None) is None:
+                post.num_likes = counts.get(post.pk, 0)
+            post.viewer_liked = post.pk in liked
+            post.pending_like = pending.get(post.pk)
+
+    def get_likes_count(self, obj):
+        # Annotation du Feed ou attach_engagement(), sinon un COUNT par post.
+        count = getattr(obj, 'num_likes', None)
+        return obj.likes.count() if count is None else count
+
     def get_is_liked(self, obj):
+        if getattr(obj, 'viewer_liked', None) is not None:
+            return obj.viewer_liked
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return obj.likes.filter(user=request.user).exists()
         return False
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        request = self.context.get('request')
+        if request and request.user.is_authenticated:
+            # Like ou unlike du lecteur pas encore écrit en base (cf. core/interactions.py),
+            # déjà lu pour toute la page par attach_engagement().
+            if hasattr(instance, 'pending_like'):
+                pending = instance.pending_like
+            else:
+                pending = interactions.pending_likes(request.user.id, [instance.pk]).get(instance.pk)
+            data['is_liked'], data['likes_count'] = interactions.overlay(data['is_liked'], data['likes_count'], pending)
+        return data
+
 class PageSerializer(serializers.ModelSerializer):
-    subscribers_count = serializers.IntegerField(source='subscribers.count', read_only=True)
+    subscribers_count = serializers.IntegerField(read_only=True)
     profile_picture_url = serializers.URLField(required=False, allow_null=True, allow_blank=True)
     cover_photo_url = serializers.URLField(required=False, allow_null=True, allow_blank=True)
 
@@ -202,19 +259,55 @@ class PageSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['owner', 'created_at']
 
+class PageSubscriberSerializer(serializers.ModelSerializer):
+    user = UserSummarySerializer(read_only=True)
+
+    class Meta:
+        model = PageSubscription
+        fields = ['user', 'subscribed_at']
+
 class CommentSerializer(serializers.ModelSerializer):
-    user = UserSerializer(read_only=True)
-    
+    user = UserSummarySerializer(read_only=True)
+
     class Meta:
         model = Comment
         fields = ['id', 'user', 'post', 'content', 'parent_comment', 'created_at']
         read_only_fields = ['id', 'user', 'created_at']
 
+    def validate(self, attrs):
+        # Fil et profondeur sont fixés à la création (cf. core/signals.py) : déplacer
+        # un commentaire laisserait ses réponses dans l'ancien fil, voire créerait un cycle.
+        if self.instance is not None:
+            for field in ('post', 'parent_comment'):
+                if field in attrs and attrs[field] != getattr(self.instance, field):
+                    raise serializers.ValidationError({field: "Un commentaire ne peut pas être déplacé."})
+        parent = attrs.get('parent_comment')
+        post = attrs.get('post') or getattr(self.instance, 'post', None)
+        if parent is not None and post is not None and parent.post_id != post.pk:
+            raise serializers.ValidationError({
+                'parent_comment': "La réponse doit porter sur le même post que le commentaire parent."
+            })
+        return attrs
+
+class CommentThreadSerializer(CommentSerializer):
+    """Commentaire de premier niveau avec ses premières réponses (cf. CommentViewSet.threads)."""
+    replies_count = serializers.IntegerField(read_only=True)
+    replies = serializers.SerializerMethodField()
+    replies_next = serializers.CharField(read_only=True, allow_null=True)
+
+    class Meta(CommentSerializer.Meta):
+        fields = CommentSerializer.Meta.fields + ['replies_count', 'replies', 'replies_next']
+
+    def get_replies(self, obj):
+        return CommentSerializer(obj.first_replies, many=True, context=self.context).data
+
+MULTIPLE_LOCATIONS_ERROR = "Une seule ville ou région par boost (ex. 'Douala' ou 'Littoral')."
+
 class BoostSerializer(serializers.ModelSerializer):
     class Meta:
         model = Boost
         fields = '__all__'
-        read_only_fields = ['user', 'ranking_weight', 'status']
+        read_only_fields = ['user', 'ranking_weight', 'status', 'impressions', 'spent']
     
     def validate(self, data):
         audience_gender = data.get('audience_gender')
@@ -236,6 +329,10 @@ class BoostSerializer(serializers.ModelSerializer):
         if audience_age_min is not None and audience_age_max is not None and audience_age_min > audience_age_max:
             raise serializers.ValidationError('audience_age_min doit être <= audience_age_max')
 
+        audience_location = data.get('audience_location')
+        if audience_location and len(locations.split_targets(audience_location)) > 1:
+            raise serializers.ValidationError({'audience_location': MULTIPLE_LOCATIONS_ERROR})
+
         audience_interests = data.get('audience_interests', None)
         if audience_interests is not None:
             if not isinstance(audience_interests, list):
@@ -259,6 +356,65 @@ class BoostSerializer(serializers.ModelSerializer):
         return data
 
 
+class ReachEstimateSerializer(serializers.Serializer):
+    """Critères de ciblage d'un boost (mêmes noms que Boost.audience_*)."""
+    audience_location = serializers.CharField(required=False, allow_blank=True)
+    audience_gender = serializers.CharField(required=False)
+    audience_age_min = serializers.IntegerField(required=False, min_value=0)
+    audience_age_max = serializers.IntegerField(required=False, min_value=0)
+    # Liste séparée par des virgules dans l'URL : ?audience_interests=musique,sport
+    audience_interests = serializers.CharField(required=False, allow_blank=True)
+
+    def validate_audience_gender(self, value):
+        value = value.strip().upper()
+        if value not in {'ALL', 'MALE', 'FEMALE'}:
+            raise serializers.ValidationError("audience_gender doit être dans ['ALL', 'MALE', 'FEMALE']")
+        return value
+
+    def validate_audience_location(self, value):
+        if len(locations.split_targets(value)) > 1:
+            raise serializers.ValidationError(MULTIPLE_LOCATIONS_ERROR)
+        return value
+
+    def validate_audience_interests(self, value):
+        return [item.strip() for item in value.split(',') if item.strip()]
+
+    def validate(self, data):
+        age_min, age_max = data.get('audience_age_min'), data.get('audience_age_max')
+        if age_min is not None and age_max is not None and age_min > age_max:
+            raise serializers.ValidationError('audience_age_min doit être <= audience_age_max')
+        return data
+
+
+class InteractionActionSerializer(serializers.Serializer):
+    """Une action d'un lot /api/interactions/batch/."""
+    action = serializers.ChoiceField(choices=sorted(interactions.BATCH_ACTIONS))
+    target = serializers.UUIDField()
+
+
+class InteractionBatchSerializer(serializers.Serializer):
+    # Éléments validés un par un (InteractionActionSerializer) : un élément invalide n'annule pas le lot.
+    actions = serializers.ListField(child=serializers.DictField(), allow_empty=False)
+
+    def validate_actions(self, value):
+        limit = settings.INTERACTION_BATCH_MAX
+        if len(value) > limit:
+            raise serializers.ValidationError(f"Au plus {limit} actions par lot.")
+        return value
+
+
+class BoostStatHourlySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = BoostStatHourly
+        fields = ['bucket', 'impressions', 'spend', 'likes', 'comments', 'shares']
+
+
+class BoostStatDailySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = BoostStatDaily
+        fields = ['day', 'impressions', 'spend', 'likes', 'comments', 'shares']
+
+
 class FriendshipSerializer(serializers.ModelSerializer):
     requester = UserSerializer(read_only=True)
     addressee = UserSerializer(read_only=True)
@@ -271,4 +427,164 @@ class FriendshipSerializer(serializers.ModelSerializer):
     class Meta:
         model = Friendship
         fields = ['id', 'requester', 'addressee', 'addressee_id', 'status', 'created_at']
-        read_only_fields = ['requester', 'created_at']
\ No newline at end of file
+        read_only_fields = ['requester', 'created_at']
+
+# --- Chemin de sérialisation rapide (lecture seule) ---
+# Construit la même sortie que les ModelSerializer ci-dessus, mais à partir de
+# lignes `.values()` et de convertisseurs précompilés par champ. Activé par
+# settings.FAST_SERIALIZATION sur les listes de FeedViewSet, CommentViewSet et
+# UserViewSet. Toute modification des champs des sérialiseurs DRF doit être
+# répercutée ici (la commande `bench_serializers` vérifie l'égalité des sorties).
+
+def _to_str(value):
+    return None if value is None else str(value)
+
+
+# Les champs DRF non liés servent de convertisseurs : même format, sans le coût
+# d'instanciation et de parcours d'un ModelSerializer par ligne.
+_to_datetime = serializers.DateTimeField().to_representation
+_to_date = serializers.DateField().to_representation
+
+
+def _to_float(value):
+    return None if value is None else float(value)
+
+
+def _identity(value):
+    return value
+
+
+class FastSerializer:
+    """
+    Sérialiseur en lecture seule basé sur `.values()`.
+    `fields` est une liste de tuples (clé de sortie, colonne, convertisseur).
+    """
+    fields = ()
+
+    def __init__(self, context=None):
+        self.context = context or {}
+
+    @property
+    def columns(self):
+        return [column for _, column, _ in self.fields]
+
+    def values(self, queryset):
+        return queryset.values(*self.columns)
+
+    def to_representation(self, row):
+        return {key: convert(row[column]) for key, column, convert in self.fields}
+
+    def serialize(self, rows):
+        return [self.to_representation(row) for row in rows]
+
+
+class FastUserSerializer(FastSerializer):
+    fields = (
+        ('id', 'id', _to_str),
+        ('email', 'email', _to_str),
+        ('username', 'username', _to_str),
+        ('first_name', 'first_name', _to_str),
+        ('last_name', 'last_name', _to_str),
+        ('profile_picture_url', 'profile_picture_url', _to_str),
+        ('cover_photo_url', 'cover_photo_url', _to_str),
+        ('city', 'city', _to_str),
+        ('gender', 'gender', _to_str),
+        ('birth_date', 'birth_date', _to_date),
+        ('interests', 'interests', _identity),
+        ('date_joined', 'date_joined', _to_datetime),
+    )
+
+    def users_by_id(self, user_ids):
+        """Une seule requête pour tous les utilisateurs imbriqués d'une page."""
+        rows = User.objects.filter(id__in=set(user_ids)).values(*self.columns)
+        return {row['id']: self.to_representation(row) for row in rows}
+
+
+class FastUserSummarySerializer(FastUserSerializer):
+    fields = (
+        ('id', 'id', _to_str),
+        ('username', 'username', _to_str),
+        ('first_name', 'first_name', _to_str),
+        ('last_name', 'last_name', _to_str),
+        ('profile_picture_url', 'profile_picture_url', _to_str),
+    )
+
+
+class FastPostSerializer(FastSerializer):
+    fields = (
+        ('id', 'id', _to_str),
+        ('author', 'author_id', _identity),
+        ('page', 'page_id', _to_str),
+        ('content', 'content', _to_str),
+        ('media', 'media', _identity),
+        ('created_at', 'created_at', _to_datetime),
+    )
+    # Annotations réutilisées si le queryset les fournit déjà (cf. FeedViewSet).
+    annotations = ('num_likes', 'relevance_score')
+
+    def values(self, queryset):
+        columns = self.columns + ['comments_count']
+        columns += [name for name in self.annotations if name in queryset.query.annotations]
+        return queryset.values(*columns)
+
+    def serialize(self, rows):
+        rows = list(rows)
+        if not rows:
+            return []
+        post_ids = [row['id'] for row in rows]
+        authors = FastUserSerializer(self.context).users_by_id(row['author_id'] for row in rows)
+
+        likes = None
+        if 'num_likes' not in rows[0]:
+            likes = self._count_by_post(Like, post_ids)
+
+        liked, pending = set(), {}
+        request = self.context.get('request')
+        if request and request.user.is_authenticated:
+            liked = set(
+                Like.objects.filter(user=request.user, post_id__in=post_ids).values_list('post_id', flat=True)
+            )
+            pending = interactions.pending_likes(request.user.id, post_ids)
+
+        data = []
+        for row in rows:
+            item = self.to_representation(row)
+            item['author'] = authors.get(row['author_id'])
+            is_liked, likes_count = interactions.overlay(
+                row['id'] in liked,
+                row['num_likes'] if likes is None else likes.get(row['id'], 0),
+                pending.get(row['id']),
+            )
+            item['likes_count'] = likes_count
+            item['comments_count'] = row['comments_count']
+            item['is_liked'] = is_liked
+            if 'relevance_score' in row:
+                item['relevance_score'] = _to_float(row['relevance_score'])
+            data.append(item)
+        return data
+
+    @staticmethod
+    def _count_by_post(model, post_ids):
+        rows = model.objects.filter(post_id__in=post_ids).values('post_id').annotate(n=Count('pk'))
+        return {row['post_id']: row['n'] for row in rows}
+
+
+class FastCommentSerializer(FastSerializer):
+    fields = (
+        ('id', 'id', _to_str),
+        ('user', 'user_id', _identity),
+        ('post', 'post_id', _to_str),
+        ('content', 'content', _to_str),
+        ('parent_comment', 'parent_comment_id', _to_str),
+        ('created_at', 'created_at', _to_datetime),
+    )
+
+    def serialize(self, rows):
+        rows = list(rows)
+        users = FastUserSummarySerializer(self.context).users_by_id(row['user_id'] for row in rows)
+        data = []
+        for row in rows:
+            item = self.to_representation(row)
+            item['user'] = users.get(row['user_id'])
+            data.append(item)
+        return data
@@ -0,0 +1,165 @@
+from django.core.cache import cache
+from django.db.backends.signals import connection_created
+from django.db.models import F
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from . import interests, locations, metrics, querybudget, uploads, versions
+from .models import User, Page, PageSubscription, Post, Boost, Friendship, Like, Comment, City, Region
+
+
+# --- Invalidation des validateurs HTTP (cf. core/versions.py) ---
+
+@receiver([post_save, post_delete], sender=User)
+def bump_user_version(sender, instance, **kwargs):
+    # update_last_login() sauvegarde l'utilisateur à chaque connexion :
+    # cela ne change rien à ce qui est exposé par l'API.
+    update_fields = kwargs.get('update_fields')
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    versions.bump(f'user:{instance.pk}', 'users')
+
+
+@receiver([post_save, post_delete], sender=Page)
+def bump_page_version(sender, instance, **kwargs):
+    versions.bump(f'page:{instance.pk}', f'profile:{instance.owner_id}')
+
+
+@receiver([post_save, post_delete], sender=PageSubscription)
+def bump_subscription_version(sender, instance, **kwargs):
+    versions.bump(f'page:{instance.page_id}', f'feed:{instance.user_id}')
+
+
+@receiver([post_save, post_delete], sender=Post)
+def bump_post_version(sender, instance, **kwargs):
+    versions.bump(f'post:{instance.pk}', f'profile:{instance.author_id}', *versions.page_posts_scopes(instance.page_id))
+
+
+@receiver([post_save, post_delete], sender=Like)
+@receiver([post_save, post_delete], sender=Comment)
+def bump_interaction_version(sender, instance, **kwargs):
+    # Page du post relue par sa clé primaire (le post peut déjà être supprimé : cascade).
+    page_id = Post.objects.filter(pk=instance.post_id).values_list('page_id', flat=True).first()
+    versions.bump(f'post:{instance.post_id}', f'activity:{instance.user_id}', *versions.page_posts_scopes(page_id))
+
+
+@receiver([post_save, post_delete], sender=Boost)
+def bump_boost_version(sender, instance, **kwargs):
+    versions.bump('boosts')
+
+
+@receiver([post_save, post_delete], sender=Friendship)
+def bump_friendship_version(sender, instance, **kwargs):
+    versions.bump(f'feed:{instance.requester_id}', f'feed:{instance.addressee_id}')
+
+
+# --- Masques d'intérêts (cf. core/interests.py) ---
+# Sur une sauvegarde partielle, DerivedFieldsMixin (core/models.py) ajoute les
+# champs dérivés à update_fields : ils sont écrits avec leur source.
+
+@receiver(pre_save, sender=User)
+def sync_user_interests_mask(sender, instance, **kwargs):
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and 'interests' not in update_fields:
+        return
+    instance.interests_mask = interests.mask_for(instance.interests)
+
+
+@receiver(pre_save, sender=Boost)
+def sync_boost_interests_mask(sender, instance, **kwargs):
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and 'audience_interests' not in update_fields:
+        return
+    instance.audience_interests_mask = interests.mask_for(instance.audience_interests)
+
+
+# --- Clés de localisation (cf. core/locations.py) ---
+# Écrites avec leur source sur une sauvegarde partielle (DerivedFieldsMixin).
+
+@receiver([post_save, post_delete], sender=City)
+@receiver([post_save, post_delete], sender=Region)
+def reset_location_hierarchy(sender, instance, **kwargs):
+    cache.delete(locations.CACHE_KEY)
+
+
+@receiver(pre_save, sender=User)
+def sync_user_location_keys(sender, instance, **kwargs):
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and 'city' not in update_fields:
+        return
+    instance.city_key, instance.region_key = locations.resolve(instance.city)
+
+
+@receiver(pre_save, sender=Boost)
+def sync_boost_location_keys(sender, instance, **kwargs):
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and 'audience_location' not in update_fields:
+        return
+    instance.audience_city_key, instance.audience_region_key = locations.resolve(instance.audience_location)
+
+
+# --- Fils de commentaires ---
+
+@receiver(pre_save, sender=Comment)
+def sync_comment_thread(sender, instance, **kwargs):
+    # Fixés à la création : un commentaire ne change pas de parent (CommentSerializer
+    # et CommentAdmin le refusent), ses réponses restent donc dans son fil.
+    if not instance._state.adding:
+        return
+    if instance.parent_comment_id is None:
+        instance.thread_id, instance.depth = instance.pk, 0
+    else:
+        instance.thread_id, instance.depth = (
+            Comment.objects.filter(pk=instance.parent_comment_id).values_list('thread_id', F('depth') + 1).get()
+        )
+
+
+# --- Compteurs dénormalisés (cf. core/counters.py) ---
+
+@receiver(post_save, sender=Comment)
+def count_comment_created(sender, instance, created, **kwargs):
+    if created:
+        Post.objects.filter(pk=instance.post_id).update(comments_count=F('comments_count') + 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_comment_deleted(sender, instance, **kwargs):
+    Post.objects.filter(pk=instance.post_id, comments_count__gt=0).update(comments_count=F('comments_count') - 1)
+
+
+@receiver(post_save, sender=PageSubscription)
+def count_subscription_created(sender, instance, created, **kwargs):
+    if created:
+        Page.objects.filter(pk=instance.page_id).update(subscribers_count=F('subscribers_count') + 1)
+
+
+@receiver(post_delete, sender=PageSubscription)
+def count_subscription_deleted(sender, instance, **kwargs):
+    Page.objects.filter(pk=instance.page_id, subscribers_count__gt=0).update(
+        subscribers_count=F('subscribers_count') - 1
+    )
+
+
+# --- URL provisoires des uploads (cf. core/uploads.py) ---
+
+@receiver(pre_save, sender=Post)
+def resolve_post_media(sender, instance, **kwargs):
+    instance.media = uploads.resolve_media(instance.media)
+
+
+@receiver(pre_save, sender=User)
+@receiver(pre_save, sender=Page)
+def resolve_picture_urls(sender, instance, **kwargs):
+    for field in uploads.PICTURE_FIELDS:
+        setattr(instance, field, uploads.resolve_url(getattr(instance, field)))
+
+
+# --- Instrumentation des requêtes (cf. core/metrics.py, core/querybudget.py) ---
+
+@receiver(connection_created)
+def install_query_metrics(sender, connection, **kwargs):
+    # Même mécanisme que connection.execute_wrapper(), mais pour toute la vie
+    # de la connexion (rouverte à chaque cycle CONN_MAX_AGE : une seule fois).
+    for wrapper in (metrics.record_query, querybudget.record_query):
+        if wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.append(wrapper)
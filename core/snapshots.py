@@ -0,0 +1,163 @@
+import time
+from array import array
+from datetime import date
+from types import SimpleNamespace
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from . import audience, boosts, locations
+from .models import Post, TargetType
+
+# Instantanés du fil « global ». Sans amis ni abonnements, le score d'un post
+# ne dépend du lecteur que par le bonus d'audience des boosts : le classement
+# est le même pour tous les lecteurs d'un segment ville × genre × tranche
+# d'âge (cellules du cube d'audience, cf. core/audience.py ; à défaut, ville
+# × genre, ville, puis tous les lecteurs). Un passage en
+# arrière-plan (python manage.py build_feed_snapshots) le calcule toutes les
+# FEED_SNAPSHOT_INTERVAL secondes ; FeedViewSet y lit la page d'un lecteur
+# sans (ou avec peu d') affinités et n'y ajoute que ses posts personnels.
+#
+# Stockage (clés fixes, réécrites à chaque passage) :
+#   'feed-snapshot:posts'      -> (passage, nombre total de posts,
+#                                  [(id, auteur, page, created_at, score de base)])
+#   'feed-snapshot:<segment>'  -> (passage, array('I') : indices dans la table, dans l'ordre)
+# La table est commune à tous les segments ; un segment ne coûte que 4 octets
+# par post. Le numéro de passage évite d'associer un ordre à la table d'un
+# autre passage pendant la réécriture.
+#
+# Le fil recalcule le bonus exact des boosts pour le lecteur (intérêts, âge
+# exact) sur les posts de l'instantané ; un post boosté hors de l'instantané
+# de son segment n'est pas repêché. L'écart ne porte que sur les dernières
+# pages de l'instantané, et disparaît au passage suivant pour les nouveaux posts.
+
+CACHE_KEY = 'feed-snapshot'
+GENERIC = audience.cell_key(audience.WILDCARD, audience.WILDCARD, audience.WILDCARD)
+COLUMNS = ('id', 'author_id', 'page_id', 'created_at', 'relevance_score')
+
+
+def segment_keys(user, today):
+    """Segments du lecteur, du plus fin au générique : ville × genre × âge, ville × genre, ville, tous."""
+    city = getattr(user, 'city_key', None) or audience.UNKNOWN
+    gender = audience.normalize_gender(getattr(user, 'gender', None))
+    band = audience.age_band(getattr(user, 'birth_date', None), today)
+    return [
+        audience.cell_key(city, gender, band),
+        audience.cell_key(city, gender, audience.WILDCARD),
+        audience.cell_key(city, audience.WILDCARD, audience.WILDCARD),
+        GENERIC,
+    ]
+
+
+def segment_viewer(segment, today):
+    """Lecteur type d'un segment : milieu de la tranche d'âge, sans centre d'intérêt."""
+    city, gender, band = segment.split('|')
+    city = None if city in (audience.UNKNOWN, audience.WILDCARD) else city
+    birth_date = None
+    if band not in (audience.UNKNOWN, audience.WILDCARD):
+        # Né un 1er janvier : l'âge est exactement celui visé, quelle que soit la date.
+        birth_date = date(today.year - int(band) - audience.AGE_BAND // 2, 1, 1)
+    return SimpleNamespace(
+        city_key=city,
+        region_key=locations.hierarchy()['cities'].get(city) if city else None,
+        gender=None if gender in (audience.UNKNOWN, audience.WILDCARD) else gender,
+        birth_date=birth_date,
+        interests_mask=0,
+        interests=[],
+    )
+
+
+def segments():
+    """
+    Cellules du cube d'audience d'au moins FEED_SNAPSHOT_MIN_USERS utilisateurs
+    parmi celles de segment_keys(), plus le segment générique.
+    """
+    cube = audience.current_cube()
+    keys = {GENERIC}
+    if cube is not None:
+        for key, count in cube.data['cells'].items():
+            city, gender, band = key.split('|')
+            if city == audience.WILDCARD or (gender == audience.WILDCARD and band != audience.WILDCARD):
+                continue
+            if count >= settings.FEED_SNAPSHOT_MIN_USERS:
+                keys.add(key)
+    return sorted(keys)
+
+
+def candidates(feed, now, active_boosts):
+    """
+    Posts pouvant entrer dans le classement d'un segment, avec leur score de
+    base (sans affinité ni boost) : les FEED_SNAPSHOT_SIZE premiers, les posts
+    boostés et les FEED_SNAPSHOT_SIZE premiers de chaque page boostée.
+    """
+    size = settings.FEED_SNAPSHOT_SIZE
+    base = feed.build_queryset(segment_viewer(GENERIC, now.date()), now, set(), [], [])
+    rows = {row[0]: row for row in base.values_list(*COLUMNS)[:size]}
+
+    post_ids = {boost.target_id for boost in active_boosts if boost.target_type == TargetType.POST}
+    page_ids = {boost.target_id for boost in active_boosts if boost.target_type == TargetType.PAGE}
+    if post_ids:
+        rows.update((row[0], row) for row in base.filter(pk__in=post_ids).values_list(*COLUMNS))
+    if page_ids:
+        ranked = base.filter(page_id__in=page_ids).annotate(
+            rank=Window(
+                RowNumber(), partition_by=[F('page_id')],
+                order_by=[F('relevance_score').desc(), F('created_at').desc()],
+            )
+        )
+        rows.update((row[0], row) for row in ranked.filter(rank__lte=size).values_list(*COLUMNS))
+    return [(*row[:4], int(row[4])) for row in rows.values()]
+
+
+def build(now=None):
+    """Calcule et publie les instantanés. Retourne (segments, posts retenus)."""
+    # core.views importe ce module : le classement du fil n'est chargé qu'ici.
+    from .views import FeedViewSet
+
+    now = now or timezone.now()
+    feed = FeedViewSet()
+    active_boosts = boosts.active_boosts(now)
+    posts = candidates(feed, now, active_boosts)
+
+    size = settings.FEED_SNAPSHOT_SIZE
+    orders = {}
+    for segment in segments():
+        post_bonus, page_bonus = feed.boost_bonuses(segment_viewer(segment, now.date()), now, active_boosts)
+
+        def score(index):
+            post_id, _, page_id, created_at, base = posts[index]
+            bonus = post_bonus[post_id] if post_id in post_bonus else page_bonus.get(page_id, 0)
+            return base + bonus, created_at
+
+        orders[segment] = sorted(range(len(posts)), key=score, reverse=True)[:size]
+
+    # Seuls les posts classés dans au moins un segment sont stockés.
+    kept = sorted({index for order in orders.values() for index in order})
+    position = {index: i for i, index in enumerate(kept)}
+
+    build_id = int(time.time() * 1000)
+    ttl = settings.FEED_SNAPSHOT_TTL
+    values = {f'{CACHE_KEY}:posts': (build_id, Post.objects.count(), [posts[index] for index in kept])}
+    for segment, order in orders.items():
+        values[f'{CACHE_KEY}:{segment}'] = (build_id, array('I', (position[index] for index in order)))
+    cache.set_many(values, ttl)
+    return len(orders), len(kept)
+
+
+def ranking(user, now):
+    """
+    Instantané du segment calculé le plus fin du lecteur : (nombre total de
+    posts, [(id, auteur, page, created_at, score de base)] dans l'ordre du
+    segment), ou None. Une lecture du cache.
+    """
+    keys = [f'{CACHE_KEY}:posts', *(f'{CACHE_KEY}:{segment}' for segment in segment_keys(user, now.date()))]
+    found = cache.get_many(keys)
+    if keys[0] not in found:
+        return None
+    build_id, total, posts = found[keys[0]]
+    for key in keys[1:]:
+        if key in found and found[key][0] == build_id:
+            return total, [posts[index] for index in found[key][1]]
+    return None
@@ -0,0 +1,29 @@
+import os
+import random
+import time
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+
+
+class LocalStubStorage(FileSystemStorage):
+    """
+    Remplaçant local du stockage distant (Cloudinary), pour faire tourner le
+    pipeline d'upload hors ligne : MEDIA_REMOTE_BACKEND=core.storage.LocalStubStorage.
+    Les fichiers vont sous MEDIA_ROOT/remote ; MEDIA_STUB_LATENCY et
+    MEDIA_STUB_FAILURE_RATE simulent un envoi lent ou des erreurs réseau.
+    """
+    def __init__(self, location=None, base_url=None, latency=None, failure_rate=None, **kwargs):
+        super().__init__(
+            location=location or os.path.join(settings.MEDIA_ROOT, 'remote'),
+            base_url=base_url or settings.MEDIA_URL + 'remote/',
+            **kwargs,
+        )
+        self.latency = settings.MEDIA_STUB_LATENCY if latency is None else latency
+        self.failure_rate = settings.MEDIA_STUB_FAILURE_RATE if failure_rate is None else failure_rate
+
+    def _save(self, name, content):
+        if self.latency:
+            time.sleep(self.latency)
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise OSError("Échec simulé du stockage distant")
+        return super()._save(name, content)
@@ -1,3 +1,1218 @@
-from django.test import TestCase
+import gzip
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from io import StringIO
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from types import SimpleNamespace
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import Q
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import audience, impressions, interactions, locations, metrics, middleware, querybudget, rollups, snapshots, timelines, uploads, versions
+from .models import (
+    User, Post, Page, PageSubscription, Like, Share, Boost, BoostStatus, TargetType, IdempotencyKey, MediaUpload,
+    UploadStatus, Friendship, FriendStatus, Comment, BoostImpression, BoostStatHourly, City, Region,
+)
+from .renderers import ORJSONRenderer
+from .serializers import (
+    CommentSerializer, FastCommentSerializer, FastPostSerializer, FastUserSerializer, PostSerializer, UserSerializer,
+)
+
+
+class ReaderTestCase(TestCase):
+    """Cache vidé, un lecteur (self.user), un de ses posts (self.post) et un client authentifié à son nom."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='lecteur@example.com', username='lecteur', password='x')
+        self.post = Post.objects.create(author=self.user, content='Post')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', "Concurrence réelle : nécessite PostgreSQL")
+class BoostTransitionStressTest(TransactionTestCase):
+    """Requêtes parallèles sur les transitions de BoostViewSet (chaque thread a sa connexion)."""
+    workers = 16
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='owner@example.com', username='owner', password='x')
+        post = Post.objects.create(author=self.user, content='Post boosté')
+        now = timezone.now()
+        self.boost = Boost.objects.create(
+            user=self.user, target_id=post.id, target_type=TargetType.POST, budget=100,
+            start_date=now - timedelta(hours=1), end_date=now + timedelta(days=7),
+            status=BoostStatus.PAUSED,
+        )
+
+    def fire(self, action, data=None, headers=None):
+        barrier = threading.Barrier(self.workers)
+
+        def call(_):
+            client = APIClient()
+            client.force_authenticate(self.user)
+            try:
+                barrier.wait()
+                return client.post(f'/api/boosts/{self.boost.id}/{action}/', data or {}, format='json', headers=headers)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(self.workers) as pool:
+            return list(pool.map(call, range(self.workers)))
+
+    def test_parallel_pay_with_same_key_pays_once(self):
+        payment = {'payment_token': 'tok', 'amount': '100'}
+        responses = self.fire('pay', payment, headers={'Idempotency-Key': 'double-clic'})
+
+        self.assertEqual({r.status_code for r in responses}, {200})
+        self.assertEqual(len({r.content for r in responses}), 1)
+        self.assertEqual(sum(r.get('Idempotent-Replayed') == 'true' for r in responses), self.workers - 1)
+        self.assertEqual(IdempotencyKey.objects.count(), 1)
+        self.boost.refresh_from_db()
+        self.assertEqual(self.boost.status, BoostStatus.ACTIVE)
+
+    def test_parallel_pay_without_key_applies_once(self):
+        responses = self.fire('pay', {'payment_token': 'tok', 'amount': '100'})
+
+        codes = sorted(r.status_code for r in responses)
+        self.assertEqual(codes, [200] + [409] * (self.workers - 1))
+
+    def test_parallel_pause_and_resume(self):
+        Boost.objects.filter(pk=self.boost.pk).update(status=BoostStatus.ACTIVE)
+
+        paused = self.fire('pause')
+        self.assertEqual(sum(r.status_code == 200 for r in paused), 1)
+        resumed = self.fire('resume')
+        self.assertEqual(sum(r.status_code == 200 for r in resumed), 1)
+
+        self.boost.refresh_from_db()
+        self.assertEqual(self.boost.status, BoostStatus.ACTIVE)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', "Concurrence réelle : nécessite PostgreSQL")
+class BatchSubscriptionRaceTest(TransactionTestCase):
+    """Lots d'abonnement simultanés : Page.subscribers_count reste égal au nombre d'abonnements."""
+    workers = 16
+
+    def test_parallel_batches_count_each_subscription_once(self):
+        owner = User.objects.create_user(email='owner@example.com', username='owner', password=None)
+        page = Page.objects.create(owner=owner, name='Agence', description='Page', category='Info')
+        users = [User.objects.create_user(email=f'u{i}@example.com', username=f'u{i}', password=None) for i in range(4)]
+        barrier = threading.Barrier(self.workers)
+
+        def call(worker):
+            # Chaque utilisateur envoie le même lot depuis plusieurs workers, tous partis du même état.
+            client = APIClient()
+            client.force_authenticate(users[worker % len(users)])
+            actions = [{'action': 'subscribe', 'target': str(page.pk)}]
+            try:
+                barrier.wait()
+                return client.post('/api/interactions/batch/', {'actions': actions}, format='json').status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(self.workers) as pool:
+            self.assertEqual(set(pool.map(call, range(self.workers))), {200})
+        page.refresh_from_db()
+        self.assertEqual(PageSubscription.objects.filter(page=page).count(), len(users))
+        self.assertEqual(page.subscribers_count, len(users))
+
+
+class MediaUploadPipelineTest(TestCase):
+    """Pipeline d'upload hors ligne : staging local puis LocalStubStorage comme stockage distant."""
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        self.storages = {
+            **settings.STORAGES,
+            'media_staging': {
+                'BACKEND': 'django.core.files.storage.FileSystemStorage',
+                'OPTIONS': {'location': os.path.join(root, 'staging'), 'base_url': '/media/staging/'},
+            },
+            'media_remote': {
+                'BACKEND': 'core.storage.LocalStubStorage',
+                'OPTIONS': {'location': os.path.join(root, 'remote'), 'base_url': '/media/remote/'},
+            },
+        }
+        override = self.settings(STORAGES=self.storages, MEDIA_PUSH_MAX_ATTEMPTS=2)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.user = User.objects.create_user(email='auteur@example.com', username='auteur', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self):
+        # L'envoi est programmé après le commit : il est déclenché à la main ci-dessous.
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post('/api/upload/', {'file': SimpleUploadedFile('photo.png', b'\x89PNG', content_type='image/png')})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(callbacks), 1)
+        return response.json()
+
+    def test_post_switches_to_final_url_once_pushed(self):
+        data = self.upload()
+        self.assertEqual(data['status'], UploadStatus.PENDING)
+        self.assertTrue(data['url'].startswith('http://testserver/media/staging/uploads/'))
+
+        media = [{'type': data['type'], 'url': data['url']}]
+        post = self.client.post('/api/posts/', {'content': 'Photo', 'media': media}, format='json').json()
+
+        self.assertIsNone(uploads.push(data['id']))
+        upload = MediaUpload.objects.get(pk=data['id'])
+        self.assertEqual(upload.status, UploadStatus.DONE)
+        self.assertTrue(upload.url.startswith('/media/remote/uploads/'))
+        self.assertEqual(Post.objects.get(pk=post['id']).media, [{'type': 'IMAGE', 'url': upload.url}])
+        self.assertEqual(self.client.get(f"/api/upload/{data['id']}/").json()['url'], upload.url)
+
+        # Un post créé ensuite avec l'URL provisoire reçoit directement l'URL finale.
+        late = self.client.post('/api/posts/', {'content': 'Encore', 'media': media}, format='json').json()
+        self.assertEqual(late['media'][0]['url'], upload.url)
+
+    def test_failed_push_is_retried_then_abandoned(self):
+        self.storages['media_remote']['OPTIONS']['failure_rate'] = 1
+        with self.settings(STORAGES=self.storages):
+            data = self.upload()
+            self.assertEqual(uploads.push(data['id']), settings.MEDIA_PUSH_RETRY_DELAY)
+            self.assertEqual(MediaUpload.objects.get(pk=data['id']).status, UploadStatus.PENDING)
+            self.assertIsNone(uploads.push(data['id']))
+
+        upload = MediaUpload.objects.get(pk=data['id'])
+        self.assertEqual((upload.status, upload.attempts), (UploadStatus.FAILED, 2))
+        self.assertTrue(uploads.staging().exists(upload.name))
+
+    def test_only_images_and_videos_are_staged(self):
+        for name, content_type in (('page.html', 'text/html'), ('logo.svg', 'image/svg+xml'), ('photo.png', 'text/html')):
+            response = self.client.post('/api/upload/', {'file': SimpleUploadedFile(name, b'<script></script>', content_type=content_type)})
+            self.assertEqual(response.status_code, 400)
+        self.assertFalse(MediaUpload.objects.exists())
+
+    def test_staged_file_is_served_as_attachment(self):
+        data = self.upload()
+        response = self.client.get(data['url'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'\x89PNG')
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(response['X-Content-Type-Options'], 'nosniff')
+        self.assertTrue(response['Content-Disposition'].startswith('attachment'))
+
+
+
+# Fenêtre longue : rien n'est écrit avant l'appel explicite à flush().
+@override_settings(INTERACTION_FLUSH_INTERVAL=3600)
+class InteractionBufferTest(ReaderTestCase):
+    """Likes, unlikes et partages différés : fusion par (utilisateur, post), lecture de ses propres taps."""
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(interactions.buffer.flush)
+
+    def test_taps_are_coalesced_and_visible_before_flush(self):
+        for action, method in (('like', 'post'), ('unlike', 'delete'), ('like', 'post'), ('share', 'post'), ('share', 'post')):
+            response = getattr(self.client, method)(f'/api/posts/{self.post.pk}/{action}/')
+            self.assertEqual(response.status_code, 200)
+        self.assertFalse(Like.objects.exists())
+
+        data = self.client.get(f'/api/posts/{self.post.pk}/').json()
+        self.assertEqual((data['is_liked'], data['likes_count']), (True, 1))
+
+        self.assertEqual(interactions.buffer.flush(), 2)
+        self.assertEqual(Like.objects.filter(user=self.user, post=self.post).count(), 1)
+        self.assertEqual(Share.objects.filter(user=self.user, post=self.post).count(), 1)
+        data = self.client.get(f'/api/posts/{self.post.pk}/').json()
+        self.assertEqual((data['is_liked'], data['likes_count']), (True, 1))
+
+    def test_flush_bumps_post_versions_on_commit(self):
+        self.client.post(f'/api/posts/{self.post.pk}/like/')
+        before, _ = versions.get_versions(f'post:{self.post.pk}')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(interactions.buffer.flush(), 1)
+        self.assertNotEqual(versions.get_versions(f'post:{self.post.pk}')[0], before)
+
+    def test_pending_likes_are_read_once_per_page(self):
+        for i in range(5):
+            post = Post.objects.create(author=self.user, content=f'Post {i}')
+            self.client.post(f'/api/posts/{post.pk}/like/')
+        with mock.patch.object(interactions, 'pending_likes', wraps=interactions.pending_likes) as pending:
+            results = self.client.get('/api/posts/').json()['results']
+        self.assertEqual(pending.call_count, 1)
+        self.assertEqual(sum(post['is_liked'] for post in results), 5)
+
+    def test_unknown_or_deleted_post(self):
+        self.assertEqual(self.client.post('/api/posts/00000000-0000-0000-0000-000000000000/like/').status_code, 404)
+        self.client.post(f'/api/posts/{self.post.pk}/like/')
+        self.post.delete()
+        interactions.buffer.flush()
+        self.assertFalse(Like.objects.exists())
+
+    def test_batch_applies_last_state_per_target(self):
+        page = Page.objects.create(owner=self.user, name='Agence')
+        missing = '00000000-0000-0000-0000-000000000000'
+        actions = [
+            {'action': 'like', 'target': str(self.post.pk)},
+            {'action': 'subscribe', 'target': str(page.pk)},
+            {'action': 'unlike', 'target': str(self.post.pk)},
+            {'action': 'like', 'target': missing},
+            {'action': 'poke', 'target': str(page.pk)},
+        ]
+        response = self.client.post('/api/interactions/batch/', {'actions': actions}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [item['status'] for item in response.json()['results']],
+            ['liked', 'subscribed', 'unliked', 'not_found', 'invalid'],
+        )
+        self.assertFalse(Like.objects.exists())
+        self.assertTrue(PageSubscription.objects.filter(user=self.user, page=page).exists())
+
+
+@override_settings(FEED_SNAPSHOT_SIZE=40, FEED_SNAPSHOT_MIN_USERS=1)
+class FeedSnapshotTest(TestCase):
+    """Fil servi depuis un instantané de segment : même page que le classement complet."""
+
+    def setUp(self):
+        cache.clear()
+        author = User.objects.create_user(email='auteur@example.com', username='auteur', password='x')
+        self.viewer = User.objects.create_user(
+            email='lecteur@example.com', username='lecteur', password='x', city='Douala', gender='FEMALE',
+        )
+        now = timezone.now()
+        posts = [Post.objects.create(author=author, content=f'Post {i}', media=['x.jpg'] if i % 3 else []) for i in range(25)]
+        for i, post in enumerate(posts):
+            Post.objects.filter(pk=post.pk).update(comments_count=i % 7, created_at=now - timedelta(hours=7 * i))
+        self.boosted = posts[-1]
+        Boost.objects.create(
+            user=author, target_id=self.boosted.id, target_type=TargetType.POST, budget=100,
+            start_date=now - timedelta(hours=1), end_date=now + timedelta(days=7), status=BoostStatus.ACTIVE,
+            audience_location='Douala',
+        )
+        self.friend = User.objects.create_user(email='ami@example.com', username='ami', password='x')
+        self.friend_post = Post.objects.create(author=self.friend, content="Post d'un ami")
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+        # Impressions du post boosté servi : écrites avant la fin du test.
+        self.addCleanup(impressions.buffer.flush)
+
+    def feed(self, page=1):
+        response = self.client.get(f'/api/feed/?page={page}')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def compare_with_full_ranking(self):
+        served = [self.feed(page) for page in (1, 2)]
+        with self.settings(FEED_SNAPSHOT_SIZE=0):
+            ranked = [self.feed(page) for page in (1, 2)]
+        self.assertEqual(served, ranked)
+        return served[0]['results']
+
+    def test_cold_start_viewer_gets_the_full_ranking(self):
+        self.assertEqual(snapshots.build(), (len(snapshots.segments()), 26))
+        self.assertIsNotNone(snapshots.ranking(self.viewer, timezone.now()))
+        results = self.compare_with_full_ranking()
+        # Bonus du boost ciblé sur la ville du lecteur, absent du score de base.
+        self.assertEqual(results[0]['id'], str(self.boosted.id))
+
+    def test_personal_posts_are_merged(self):
+        Friendship.objects.create(requester=self.viewer, addressee=self.friend, status=FriendStatus.ACCEPTED)
+        snapshots.build()
+        results = self.compare_with_full_ranking()
+        self.assertIn(str(self.friend_post.id), [post['id'] for post in results])
+
+    def test_without_snapshot_the_feed_is_ranked(self):
+        self.assertIsNone(snapshots.ranking(self.viewer, timezone.now()))
+        self.assertEqual(self.feed()['count'], 26)
+
+
+@override_settings(METRICS_SAMPLE_RATE=1)
+class InstrumentationTest(ReaderTestCase):
+    """Durée, SQL et rendu par endpoint et action, exposés sur /api/_metrics et dans le journal des requêtes lentes."""
+
+    def setUp(self):
+        super().setUp()
+        metrics.registry.reset()
+        self.addCleanup(metrics.registry.reset)
+
+    def series(self, name, **labels):
+        for series_name, series_labels, values in metrics.registry.snapshot():
+            if series_name == name and series_labels == labels:
+                return values
+        return None
+
+    def test_request_is_measured_and_exported(self):
+        with self.settings(SLOW_REQUEST_MS=1), self.assertLogs('core.metrics', 'WARNING') as logs:
+            self.assertEqual(self.client.get(f'/api/posts/{self.post.pk}/').status_code, 200)
+        self.assertIn('SELECT', logs.output[0])
+
+        labels = {'endpoint': 'post-detail', 'action': 'retrieve'}
+        self.assertEqual(self.series('http_request_seconds', **labels)['count'], 1)
+        self.assertGreater(self.series('db_queries', **labels)['sum'], 0)
+        self.assertIsNotNone(self.series('render_seconds', **labels))
+
+        response = self.client.get('/api/_metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('boost_db_queries_count{action="retrieve",endpoint="post-detail"} 1', response.content.decode())
+        self.assertEqual(self.client.get('/api/_metrics', REMOTE_ADDR='203.0.113.7').status_code, 404)
+
+    def test_unsampled_request_is_only_timed(self):
+        with self.settings(METRICS_SAMPLE_RATE=0):
+            self.client.get(f'/api/posts/{self.post.pk}/')
+        labels = {'endpoint': 'post-detail', 'action': 'retrieve'}
+        self.assertEqual(self.series('http_request_seconds', **labels)['count'], 1)
+        self.assertIsNone(self.series('db_queries', **labels))
+
+
+class CompressionTest(SimpleTestCase):
+    """Négociation d'Accept-Encoding et CompressionMiddleware (seuil, Vary, ETag, BREACH)."""
+    body = b'{"content": "' + b'boost ' * 400 + b'"}'
+
+    def setUp(self):
+        # br factice : la négociation ne dépend pas des modules installés.
+        patcher = mock.patch.dict(middleware.COMPRESSORS, {'br': lambda data: b'br:' + data[:16]})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def compress(self, accept_encoding='gzip, br', body=None, headers=None, **extra):
+        request = RequestFactory().get('/api/posts/', HTTP_ACCEPT_ENCODING=accept_encoding, **extra)
+        headers = {'Content-Type': 'application/json', **(headers or {})}
+        response = HttpResponse(self.body if body is None else body, headers=headers)
+        return middleware.CompressionMiddleware(lambda request: response)(request)
+
+    def test_negotiate_encoding(self):
+        negotiate = middleware.negotiate_encoding
+        self.assertEqual(negotiate('gzip, br'), 'br')
+        self.assertEqual(negotiate('gzip;q=1.0, br;q=0.5'), 'gzip')
+        self.assertEqual(negotiate('br;q=0, gzip'), 'gzip')
+        self.assertEqual(negotiate('gzip;q=abc, br;q=0'), None)
+        self.assertEqual(negotiate('identity;q=0'), None)
+        self.assertEqual(negotiate('identity'), None)
+        self.assertEqual(negotiate(''), None)
+        self.assertEqual(negotiate('*'), 'br')
+        self.assertEqual(negotiate('*;q=0.5, br;q=0'), 'gzip')
+        self.assertEqual(negotiate('gzip, *;q=0'), 'gzip')
+        self.assertEqual(negotiate('GZIP ; q=0.8'), 'gzip')
+        # Un codage inconnu du serveur n'est jamais choisi.
+        self.assertEqual(negotiate('compress, deflate'), None)
+
+    def test_compresses_above_threshold(self):
+        response = self.compress(headers={'ETag': '"v1"'})
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        # Corps modifié : l'ETag devient faible, un ETag déjà faible est conservé.
+        self.assertEqual(response['ETag'], 'W/"v1"')
+        self.assertEqual(self.compress(headers={'ETag': 'W/"v1"'})['ETag'], 'W/"v1"')
+
+    def test_left_untouched(self):
+        small = self.compress(body=b'x' * (settings.COMPRESSION_MIN_SIZE - 1), headers={'ETag': '"v1"'})
+        encoded = self.compress(headers={'Content-Encoding': 'gzip'})
+        image = self.compress(headers={'Content-Type': 'image/png'})
+        refused = self.compress(accept_encoding='identity')
+        for response in (small, encoded, image, refused):
+            self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertFalse(small.has_header('Content-Encoding'))
+        self.assertEqual(small['ETag'], '"v1"')
+        self.assertEqual((encoded['Content-Encoding'], encoded.content), ('gzip', self.body))
+        self.assertFalse(image.has_header('Content-Encoding'))
+        self.assertEqual(refused.content, self.body)
+
+    def test_credentialed_responses_are_padded_gzip(self):
+        for extra in ({'HTTP_AUTHORIZATION': 'Bearer token'}, {'HTTP_COOKIE': 'sessionid=abc'}):
+            with self.subTest(extra=list(extra)):
+                responses = [self.compress(**extra) for _ in range(20)]
+                self.assertEqual({response['Content-Encoding'] for response in responses}, {'gzip'})
+                self.assertEqual(gzip.decompress(responses[0].content), self.body)
+                # Bourrage aléatoire : la longueur ne dépend plus seulement du contenu.
+                self.assertGreater(len({len(response.content) for response in responses}), 1)
+
+        self.assertFalse(self.compress(accept_encoding='br', HTTP_AUTHORIZATION='Bearer token').has_header('Content-Encoding'))
+
+
+class QueryBudgetTest(TestCase):
+    """Budgets SQL des endpoints de lecture (core/querybudget.py) sur des pages pleines."""
+
+    def setUp(self):
+        cache.clear()
+        self.viewer = User.objects.create_user(email='lecteur@example.com', username='lecteur', password='x')
+        others = [
+            User.objects.create_user(email=f'u{i}@example.com', username=f'u{i}', password=None) for i in range(12)
+        ]
+        for other in others[:6]:
+            Friendship.objects.create(requester=self.viewer, addressee=other, status=FriendStatus.ACCEPTED)
+        for other in others[6:]:
+            Friendship.objects.create(requester=other, addressee=self.viewer, status=FriendStatus.PENDING)
+
+        self.page = Page.objects.create(owner=self.viewer, name='Transports', description='Page', category='Info')
+        for other in others:
+            Page.objects.create(owner=other, name=f'Page {other.username}', description='Page', category='Info')
+            PageSubscription.objects.create(user=other, page=self.page)
+
+        posts = [
+            Post.objects.create(author=others[i % 12], content=f'Post {i}', page=self.page if i % 2 else None)
+            for i in range(24)
+        ]
+        posts += [Post.objects.create(author=self.viewer, content=f'Mon post {i}') for i in range(12)]
+        self.post = posts[1]
+        for post in posts[:12]:
+            for other in others[:4]:
+                Like.objects.create(user=other, post=post)
+        Like.objects.create(user=self.viewer, post=self.post)
+        for i, other in enumerate(others):
+            comment = Comment.objects.create(user=other, post=self.post, content=f'Commentaire {i}')
+            Comment.objects.create(user=self.viewer, post=self.post, content='Réponse', parent_comment=comment)
+
+        # Authentification réelle : la lecture de l'utilisateur fait partie du budget.
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.viewer)}')
+        self.addCleanup(impressions.buffer.flush)
+
+    def test_endpoints_stay_within_budget(self):
+        urls = {
+            ('feed-list', 'list'): '/api/feed/',
+            ('post-list', 'list'): '/api/posts/',
+            ('post-detail', 'retrieve'): f'/api/posts/{self.post.pk}/',
+            ('page-list', 'list'): '/api/pages/',
+            ('page-detail', 'retrieve'): f'/api/pages/{self.page.pk}/',
+            ('page-posts', 'posts'): f'/api/pages/{self.page.pk}/posts/',
+            ('page-subscribers', 'subscribers'): f'/api/pages/{self.page.pk}/subscribers/',
+            ('comment-list', 'list'): f'/api/comments/?post={self.post.pk}',
+            ('comment-threads', 'threads'): f'/api/comments/threads/?post={self.post.pk}',
+            ('friendship-list', 'list'): '/api/friendships/',
+            ('user-list', 'list'): '/api/users/',
+            ('user-detail', 'retrieve'): f'/api/users/{self.viewer.pk}/',
+            ('user-posts', 'posts'): f'/api/users/{self.viewer.pk}/posts/',
+            ('user-friends', 'friends'): f'/api/users/{self.viewer.pk}/friends/',
+            ('global-search', 'get'): '/api/search/?q=u',
+        }
+        # Les versions ASGI sont couvertes par AsyncViewsTest.
+        self.assertEqual(set(urls), {endpoint for endpoint in querybudget.BUDGETS if not endpoint[0].startswith('async-')})
+        for fast in (False, True):
+            for endpoint, url in urls.items():
+                cache.clear()
+                with self.subTest(endpoint=endpoint, fast=fast), self.settings(FAST_SERIALIZATION=fast):
+                    with querybudget.query_budget(endpoint=endpoint):
+                        response = self.client.get(url)
+                    self.assertEqual(response.status_code, 200)
+                    labels = metrics.endpoint_labels(response.wsgi_request)
+                    self.assertEqual((labels['endpoint'], labels['action']), endpoint)
+
+    def test_repeated_query_shape_fails(self):
+        posts = list(Post.objects.order_by('created_at')[:5])
+        with self.assertRaises(querybudget.QueryBudgetExceeded) as raised:
+            with querybudget.query_budget():
+                [post.author.username for post in posts]
+        self.assertIn('répétée 5×', str(raised.exception))
+
+        @querybudget.query_budget(1)
+        def authors():
+            return [post.author.username for post in Post.objects.select_related('author')[:5]]
+
+        self.assertEqual(len(authors()), 5)
+
+    def test_fingerprint_ignores_values(self):
+        self.assertEqual(
+            querybudget.fingerprint('SELECT * FROM "t1" WHERE "t1"."id" IN (%s, %s, %s) AND name = \'a\'\'b\' LIMIT 21'),
+            querybudget.fingerprint('SELECT *  FROM "t1"\nWHERE "t1"."id" IN (%s) AND name = \'c\' LIMIT 10'),
+        )
+        self.assertEqual(
+            querybudget.fingerprint('INSERT INTO "t" ("a", "b") VALUES (%s, %s), (%s, %s)'),
+            'INSERT INTO "t" ("a", "b") VALUES (...)',
+        )
+
+
+class VersionBumpTest(TestCase):
+    """Les validateurs HTTP (core/versions.py) ne changent qu'au COMMIT de l'écriture."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_bump_waits_for_commit(self):
+        before, _ = versions.get_versions('boosts')
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                versions.bump('boosts')
+                self.assertEqual(versions.get_versions('boosts')[0], before)
+        self.assertNotEqual(versions.get_versions('boosts')[0], before)
+
+    def test_rollback_keeps_version(self):
+        before, _ = versions.get_versions('boosts')
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(ValueError), transaction.atomic():
+                versions.bump('boosts')
+                raise ValueError
+        self.assertEqual(callbacks, [])
+        self.assertEqual(versions.get_versions('boosts')[0], before)
+
+
+@override_settings(FAST_SERIALIZATION=True, INTERACTION_FLUSH_INTERVAL=3600)
+class FastSerializerParityTest(ReaderTestCase):
+    """Chemin rapide (.values() + orjson) et chemin DRF : même JSON, octet pour octet."""
+
+    def setUp(self):
+        super().setUp()
+        self.author = User.objects.create_user(
+            email='auteur@example.com', username='auteur', password=None, first_name='Awa', city='Douala',
+            gender='FEMALE', birth_date=date(1990, 5, 17), interests=['Football'],
+            profile_picture_url='https://cdn.example.com/a.png',
+        )
+        page = Page.objects.create(owner=self.author, name='Agence', description='Page', category='Info')
+        on_page = Post.objects.create(
+            author=self.author, page=page, content='Avec médias',
+            media=[{'type': 'IMAGE', 'url': 'https://cdn.example.com/p.png'}],
+        )
+        pending = Post.objects.create(author=self.author, content='Like en attente')
+        Like.objects.create(user=self.author, post=on_page)
+        Like.objects.create(user=self.user, post=on_page)
+        root = Comment.objects.create(user=self.author, post=on_page, content='Racine')
+        Comment.objects.create(user=self.user, post=on_page, content='Réponse', parent_comment=root)
+        # Like du lecteur encore en tampon : visible des deux côtés.
+        interactions.buffer.like(self.user.pk, pending.pk)
+        self.addCleanup(interactions.buffer.flush)
+        self.context = {'request': SimpleNamespace(user=self.user)}
+
+    def assertSameJSON(self, queryset, serializer_class, fast_serializer_class, engagement=False):
+        rows = list(queryset)
+        if engagement:
+            serializer_class.attach_engagement(rows, self.user)
+        expected = JSONRenderer().render(serializer_class(rows, many=True, context=self.context).data)
+        fast_serializer = fast_serializer_class(context=self.context)
+        actual = ORJSONRenderer().render(fast_serializer.serialize(fast_serializer.values(queryset)))
+        self.assertEqual(actual, expected)
+
+    def test_posts(self):
+        queryset = Post.objects.select_related('author').order_by('-created_at', '-id')
+        for engagement in (False, True):
+            with self.subTest(engagement=engagement):
+                self.assertSameJSON(queryset, PostSerializer, FastPostSerializer, engagement)
+
+    def test_comments(self):
+        queryset = Comment.objects.select_related('user').order_by('created_at', 'id')
+        self.assertSameJSON(queryset, CommentSerializer, FastCommentSerializer)
+
+    def test_users(self):
+        self.assertSameJSON(User.objects.order_by('-created_at', '-id'), UserSerializer, FastUserSerializer)
+
+
+class ConditionalGetTest(ReaderTestCase):
+    """GET conditionnel (ConditionalGetMixin) : 304 tant que les portées de la réponse n'ont pas changé."""
+
+    def setUp(self):
+        super().setUp()
+        self.friend = User.objects.create_user(email='ami@example.com', username='ami', password=None)
+        self.stranger = User.objects.create_user(email='autre@example.com', username='autre', password=None)
+        Friendship.objects.create(requester=self.user, addressee=self.friend, status=FriendStatus.ACCEPTED)
+        self.stranger_post = Post.objects.create(author=self.stranger, content='Ailleurs')
+        self.addCleanup(interactions.buffer.flush)
+
+    def get(self, url, etag=None, **headers):
+        if etag is not None:
+            headers['HTTP_IF_NONE_MATCH'] = etag
+        return self.client.get(url, **headers)
+
+    def test_post_detail(self):
+        url = f'/api/posts/{self.post.pk}/'
+        response = self.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        self.assertEqual(self.get(url, etag).status_code, 304)
+        self.assertEqual(self.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+        self.assertEqual(self.get(url, '"perime"').status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(user=self.friend, post=self.post, content='Commentaire')
+        response = self.get(url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_feed_depends_on_the_viewer_only(self):
+        etag = self.get('/api/feed/')['ETag']
+        # Activité sans rapport avec le lecteur : le fil reste validé.
+        with self.captureOnCommitCallbacks(execute=True):
+            Like.objects.create(user=self.stranger, post=self.stranger_post)
+            Post.objects.create(author=self.stranger, content='Encore ailleurs')
+        self.assertEqual(self.get('/api/feed/', etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(author=self.friend, content="Post d'un ami")
+        response = self.get('/api/feed/', etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        # Like du lecteur, encore en tampon : son is_liked change.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/posts/{self.stranger_post.pk}/like/')
+        self.assertEqual(self.get('/api/feed/', etag).status_code, 200)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', "EXPLAIN (FORMAT JSON) : nécessite PostgreSQL")
+class ExplainQueriesTest(TestCase):
+    """Harnais explain_queries : aucun endpoint listé ne filtre une table par parcours séquentiel."""
+
+    def test_no_sequential_scan(self):
+        user = User.objects.create_user(email='lecteur@example.com', username='lecteur', password='x')
+        friend = User.objects.create_user(email='ami@example.com', username='ami', password='x')
+        Friendship.objects.create(requester=user, addressee=friend, status=FriendStatus.ACCEPTED)
+        page = Page.objects.create(owner=friend, name='Transports', description='Page', category='Info')
+        PageSubscription.objects.create(user=user, page=page)
+        post = Post.objects.create(author=friend, page=page, content='Post')
+        Comment.objects.create(user=user, post=post, content='Commentaire')
+
+        with connection.cursor() as cursor:
+            # Sur quelques lignes, le planificateur préfère toujours le Seq Scan :
+            # interdit, il ne le garde que là où aucun index ne sert le filtre.
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('ANALYZE')
+        out = StringIO()
+        call_command('explain_queries', email=user.email, min_rows=0, stdout=out)
+        self.assertIn('Aucun parcours séquentiel inattendu', out.getvalue())
+
+
+@override_settings(BOOST_CPM='1000')
+class ImpressionFlushTest(TestCase):
+    """Les dépenses n'invalident l'index des boosts actifs que si un budget est épuisé."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='annonceur@example.com', username='annonceur', password='x')
+        self.post = Post.objects.create(author=self.user, content='Post boosté')
+        now = timezone.now()
+        self.boost = Boost.objects.create(
+            user=self.user, target_id=self.post.id, target_type=TargetType.POST, budget=3,
+            start_date=now - timedelta(hours=1), end_date=now + timedelta(days=1), status=BoostStatus.ACTIVE,
+        )
+
+    def flush(self, count):
+        for _ in range(count):
+            impressions.buffer.record(self.boost.pk, self.post.pk, self.user.pk)
+        before, _ = versions.get_versions('boosts')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(impressions.buffer.flush(), count)
+        self.boost.refresh_from_db()
+        return versions.get_versions('boosts')[0] != before
+
+    def test_spend_keeps_index_until_budget_is_exhausted(self):
+        self.assertFalse(self.flush(2))
+        self.assertEqual(self.boost.status, BoostStatus.ACTIVE)
+
+        self.assertTrue(self.flush(1))
+        self.assertEqual(self.boost.status, BoostStatus.COMPLETED)
+        self.assertEqual(self.boost.impressions, 3)
+
+
+class RollupBackfillTest(TestCase):
+    """Un boost antidaté sous le filigrane des statistiques est agrégé depuis son début."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='annonceur@example.com', username='annonceur', password='x')
+        self.post = Post.objects.create(author=self.user, content='Post boosté')
+        self.now = timezone.now()
+
+    def boost(self, hours_ago):
+        return Boost.objects.create(
+            user=self.user, target_id=self.post.id, target_type=TargetType.POST, budget=100,
+            start_date=self.now - timedelta(hours=hours_ago), end_date=self.now + timedelta(days=1),
+        )
+
+    def test_backdated_boost_is_aggregated(self):
+        self.boost(10)
+        self.assertGreater(rollups.aggregate(self.now), 0)
+
+        late = self.boost(8)
+        shown_at = self.now - timedelta(hours=7)
+        BoostImpression.objects.create(boost=late, post=self.post, user=self.user, cost=1, created_at=shown_at)
+        Like.objects.create(user=self.user, post=self.post)
+        Like.objects.filter(post=self.post).update(created_at=shown_at)
+
+        self.assertEqual(rollups.aggregate(self.now), 0)
+        stats = BoostStatHourly.objects.get(boost=late, bucket=rollups.floor_hour(shown_at))
+        self.assertEqual((stats.impressions, stats.likes), (1, 1))
+        late.refresh_from_db()
+        self.assertLessEqual(late.stats_from, late.start_date)
+
+        # Rejouer ne change rien.
+        rollups.aggregate(self.now)
+        self.assertEqual(BoostStatHourly.objects.filter(boost=late).count(), 1)
+
+
+class RollupMigrationTest(TransactionTestCase):
+    """0021 / 0022 : boosts existants repris depuis le filigrane, likes et partages historiques hors agrégats."""
+
+    def migrate(self, *targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        targets = targets or executor.loader.graph.leaf_nodes()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def test_existing_rows(self):
+        apps = self.migrate(('core', '0008_boost_impressions'))
+        self.addCleanup(self.migrate)
+        OldUser = apps.get_model('core', 'User')
+        OldPost = apps.get_model('core', 'Post')
+        user = OldUser.objects.create(email='annonceur@example.com', username='annonceur', password='x')
+        post = OldPost.objects.create(author=user, content='Post boosté')
+        apps.get_model('core', 'Like').objects.create(user=user, post=post)
+        apps.get_model('core', 'Share').objects.create(user=user, post=post)
+
+        # 0009 date ces interactions de l'heure de la migration ; un passage les a comptées.
+        apps = self.migrate(('core', '0020_post_author_created_index'))
+        now = timezone.now()
+        watermark = rollups.floor_hour(now) + timedelta(hours=1)
+        apps.get_model('core', 'RollupWatermark').objects.create(name=rollups.WATERMARK, position=watermark)
+        OldBoost = apps.get_model('core', 'Boost')
+        fields = {'user_id': user.pk, 'target_id': post.pk, 'target_type': TargetType.POST, 'budget': 100}
+        old = OldBoost.objects.create(start_date=now - timedelta(hours=10), end_date=now + timedelta(days=1), **fields)
+        upcoming = OldBoost.objects.create(start_date=watermark + timedelta(hours=1), end_date=now + timedelta(days=2), **fields)
+        apps.get_model('core', 'BoostStatHourly').objects.create(boost=old, bucket=rollups.floor_hour(now), likes=1, shares=1)
+
+        self.migrate()
+        self.assertEqual(Boost.objects.get(pk=old.pk).stats_from, watermark)
+        self.assertIsNone(Boost.objects.get(pk=upcoming.pk).stats_from)
+        self.assertFalse(Like.objects.filter(created_at__isnull=False).exists())
+        self.assertFalse(Share.objects.filter(created_at__isnull=False).exists())
+
+        # Le passage suivant recalcule les heures de l'ancien boost, sans les interactions historiques.
+        rollups.aggregate(now)
+        self.assertFalse(BoostStatHourly.objects.filter(boost_id=old.pk).filter(Q(likes__gt=0) | Q(shares__gt=0)).exists())
+        self.assertEqual(Boost.objects.get(pk=old.pk).stats_from, rollups.floor_hour(old.start_date))
+
+        # Les nouveaux likes gardent leur date.
+        like = Like.objects.create(user_id=user.pk, post=Post.objects.create(author_id=user.pk, content='Nouveau'))
+        self.assertIsNotNone(like.created_at)
+
+
+class ReachEstimateTest(TestCase):
+    """Estimation de portée lue dans le cube d'audience (core/audience.py, /api/boosts/reach_estimate/)."""
+
+    def setUp(self):
+        cache.clear()
+        littoral, _ = Region.objects.get_or_create(key='littoral', defaults={'name': 'Littoral'})
+        centre, _ = Region.objects.get_or_create(key='centre', defaults={'name': 'Centre'})
+        for key, name, region in (('douala', 'Douala', littoral), ('edea', 'Edéa', littoral), ('yaounde', 'Yaoundé', centre)):
+            City.objects.get_or_create(key=key, defaults={'name': name, 'region': region})
+        cache.delete(locations.CACHE_KEY)
+
+        year = timezone.localdate().year
+        people = [
+            ('Douala', 'F', 27, ['musique']),
+            ('Douala', 'F', 32, ['sport']),
+            ('douala ', 'M', 27, ['Musique', 'sport']),
+            ('Douala', 'M', None, []),
+            ('Edéa', 'FEMME', 22, []),
+            ('Yaoundé', 'F', 27, ['musique']),
+            ('Yaounde', 'H', 40, []),
+        ]
+        self.users = [
+            User.objects.create_user(
+                email=f'u{i}@example.com', username=f'u{i}', password='x', city=city, gender=gender,
+                birth_date=date(year - age, 1, 1) if age is not None else None, interests=interests,
+            )
+            for i, (city, gender, age, interests) in enumerate(people)
+        ]
+        User.objects.create_user(email='inactif@example.com', username='inactif', password='x', city='Douala', is_active=False)
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[0])
+
+    def test_estimate(self):
+        data = audience.refresh().data
+        cases = [
+            ({}, 7),
+            ({'location': 'Douala'}, 4),
+            ({'location': ' yaoundé '}, 2),
+            ({'location': 'Littoral'}, 5),
+            ({'location': 'Atlantis'}, 0),
+            ({'gender': 'FEMALE'}, 4),
+            ({'gender': 'ALL'}, 7),
+            ({'age_min': 25, 'age_max': 29}, 3),
+            # Tranche couverte en partie : 3 ans sur 5 de la tranche 25-29.
+            ({'age_min': 27, 'age_max': 29}, 2),
+            # Âge inconnu : hors de toute borne.
+            ({'age_min': 30}, 2),
+            ({'age_max': 24}, 1),
+            ({'location': 'Littoral', 'gender': 'FEMALE', 'age_min': 25, 'age_max': 29}, 1),
+            ({'location': 'Douala', 'interests': ['musique']}, 2),
+            ({'location': 'Douala', 'interests': ['Musique', ' sport ']}, 3),
+            ({'interests': ['musique']}, 3),
+            ({'interests': ['cuisine']}, 0),
+        ]
+        for criteria, expected in cases:
+            with self.subTest(**criteria):
+                self.assertEqual(audience.estimate(data, **criteria), expected)
+
+    def test_empty_cube(self):
+        User.objects.update(is_active=False)
+        data = audience.refresh().data
+        self.assertEqual(data['cells'], {})
+        self.assertEqual(audience.estimate(data), 0)
+        self.assertEqual(audience.estimate(data, location='Littoral', gender='FEMALE', age_min=20, interests=['musique']), 0)
+
+    def test_reach_estimate_view(self):
+        url = '/api/boosts/reach_estimate/'
+        self.assertEqual(self.client.get(url).status_code, 503)
+
+        audience.refresh()
+        response = self.client.get(url, {
+            'audience_location': 'Littoral', 'audience_gender': 'female', 'audience_age_min': 25, 'audience_age_max': 29,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['estimated_reach'], response.data['total_users']), (1, 7))
+        response = self.client.get(url, {'audience_location': 'Douala', 'audience_interests': 'musique, sport'})
+        self.assertEqual(response.data['estimated_reach'], 3)
+
+        # Le cube n'est relu qu'au prochain recalcul.
+        User.objects.create_user(email='nouveau@example.com', username='nouveau', password='x', city='Douala')
+        self.assertEqual(self.client.get(url, {'audience_location': 'Douala'}).data['estimated_reach'], 4)
+        audience.refresh()
+        self.assertEqual(self.client.get(url, {'audience_location': 'Douala'}).data['estimated_reach'], 5)
+
+        self.assertEqual(self.client.get(url, {'audience_age_min': 30, 'audience_age_max': 20}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'audience_gender': 'X'}).status_code, 400)
+        self.assertEqual(APIClient().get(url).status_code, 401)
+
+
+class DerivedFieldsTest(ReaderTestCase):
+    """Une sauvegarde partielle du champ source écrit aussi les champs qui en dérivent (core/signals.py)."""
+
+    def test_interests_mask_saved_with_interests(self):
+        self.user.interests = ['Football', 'Musique']
+        self.user.save(update_fields=['interests'])
+        self.user.refresh_from_db()
+        self.assertEqual(bin(self.user.interests_mask).count('1'), 2)
+
+        now = timezone.now()
+        boost = Boost.objects.create(
+            user=self.user, target_id=self.user.id, target_type=TargetType.PAGE, budget=10,
+            start_date=now, end_date=now + timedelta(days=1),
+        )
+        boost.audience_interests = ['musique']
+        boost.save(update_fields=['audience_interests'])
+        boost.refresh_from_db()
+        self.assertEqual(boost.audience_interests_mask & self.user.interests_mask, boost.audience_interests_mask)
+        self.assertNotEqual(boost.audience_interests_mask, 0)
+
+    def test_location_keys_saved_with_city(self):
+        # Référentiel chargé par la migration 0013 (complété si besoin).
+        region, _ = Region.objects.get_or_create(key='littoral', defaults={'name': 'Littoral'})
+        City.objects.get_or_create(key='douala', defaults={'name': 'Douala', 'region': region})
+        self.user.city = ' Douala '
+        self.user.save(update_fields=['city'])
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.city_key, self.user.region_key), ('douala', 'littoral'))
+
+        now = timezone.now()
+        boost = Boost.objects.create(
+            user=self.user, target_id=self.user.id, target_type=TargetType.PAGE, budget=10,
+            start_date=now, end_date=now + timedelta(days=1),
+        )
+        boost.audience_location = 'Littoral'
+        boost.save(update_fields=['audience_location'])
+        boost.refresh_from_db()
+        self.assertEqual((boost.audience_city_key, boost.audience_region_key), (None, 'littoral'))
+
+    def test_multiple_locations_rejected(self):
+        self.assertEqual(locations.split_targets('Douala, Yaoundé'), ['Douala', 'Yaoundé'])
+        self.assertEqual(locations.split_targets('Extrême-Nord'), ['Extrême-Nord'])
+
+        now = timezone.now()
+        payload = {
+            'target_id': str(self.post.id), 'target_type': 'POST', 'budget': 10,
+            'start_date': now.isoformat(), 'end_date': (now + timedelta(days=1)).isoformat(),
+        }
+        for location in ('Douala, Yaoundé', 'Littoral / Centre', 'Douala et Kribi'):
+            with self.subTest(location=location):
+                response = self.client.post('/api/boosts/', {**payload, 'audience_location': location}, format='json')
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('audience_location', response.data)
+                response = self.client.get('/api/boosts/reach_estimate/', {'audience_location': location})
+                self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/boosts/', {**payload, 'audience_location': 'Sud-Ouest'}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        # Boosts enregistrés avant la validation : signalés au recalcul des clés.
+        Boost.objects.filter(pk=response.data['id']).update(audience_location='Douala, Yaoundé')
+        with self.assertLogs('core.locations', 'WARNING') as logs:
+            locations.rebuild_keys()
+        self.assertIn("'Douala, Yaoundé'", logs.output[0])
+
+
+class CommentThreadTest(ReaderTestCase):
+    """Fils de commentaires : premières réponses, suite par curseur, fil figé à la création."""
+
+    def setUp(self):
+        super().setUp()
+        self.root = Comment.objects.create(user=self.user, post=self.post, content='Racine')
+        self.replies = []
+        parent = self.root
+        for i in range(5):
+            # Réponses en chaîne : le fil couvre tous les niveaux.
+            parent = Comment.objects.create(user=self.user, post=self.post, content=f'Réponse {i}', parent_comment=parent)
+            self.replies.append(parent)
+        Comment.objects.create(user=self.user, post=self.post, content='Autre fil')
+
+    def test_thread_replies_follow_cursor(self):
+        response = self.client.get(f'/api/comments/threads/?post={self.post.pk}&replies=2')
+        self.assertEqual(response.status_code, 200)
+        thread = next(item for item in response.json()['results'] if item['id'] == str(self.root.pk))
+        self.assertEqual(thread['replies_count'], 5)
+        self.assertEqual(len(thread['replies']), 2)
+
+        seen = [reply['id'] for reply in thread['replies']]
+        link = thread['replies_next']
+        while link:
+            page = self.client.get(link).json()
+            seen += [reply['id'] for reply in page['results']]
+            link = page['next']
+        expected = Comment.objects.filter(thread=self.root, depth__gt=0).order_by('created_at', 'id')
+        self.assertEqual(seen, [str(pk) for pk in expected.values_list('pk', flat=True)])
+        self.assertEqual([reply.depth for reply in expected], [1, 2, 3, 4, 5])
+
+    def test_comment_cannot_be_moved(self):
+        url = f'/api/comments/{self.replies[0].pk}/'
+        response = self.client.patch(url, {'parent_comment': str(self.replies[-1].pk)}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.patch(url, {'content': 'Modifiée'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.replies[0].refresh_from_db()
+        self.assertEqual((self.replies[0].thread_id, self.replies[0].depth), (self.root.pk, 1))
+
+
+class CommentThreadMigrationTest(TransactionTestCase):
+    """0015 : fils et profondeurs des commentaires existants, un niveau par passage."""
+
+    def migrate(self, *targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        targets = targets or executor.loader.graph.leaf_nodes()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def test_fill_threads(self):
+        apps = self.migrate(('core', '0014_media_upload'))
+        self.addCleanup(self.migrate)
+        OldUser = apps.get_model('core', 'User')
+        OldPost = apps.get_model('core', 'Post')
+        OldComment = apps.get_model('core', 'Comment')
+        user = OldUser.objects.create(email='lecteur@example.com', username='lecteur', password='x')
+        post = OldPost.objects.create(author=user, content='Post')
+        root = OldComment.objects.create(user=user, post=post, content='Racine')
+        chain = [root]
+        for i in range(3):
+            chain.append(OldComment.objects.create(user=user, post=post, content=f'Réponse {i}', parent_comment=chain[-1]))
+
+        apps = self.migrate(('core', '0015_comment_threads'))
+        Comment = apps.get_model('core', 'Comment')
+        rows = dict(Comment.objects.values_list('pk', 'depth'))
+        self.assertEqual([rows[c.pk] for c in chain], [0, 1, 2, 3])
+        self.assertEqual(set(Comment.objects.values_list('thread_id', flat=True)), {root.pk})
+
+
+class CounterTest(ReaderTestCase):
+    """Compteurs dénormalisés tenus à l'écriture (core/signals.py, core/counters.py)."""
+
+    def test_comments_count(self):
+        created = [
+            self.client.post('/api/comments/', {'post': str(self.post.pk), 'content': f'Commentaire {i}'}, format='json')
+            for i in range(3)
+        ]
+        self.assertEqual([response.status_code for response in created], [201] * 3)
+        self.client.post(
+            '/api/comments/', {'post': str(self.post.pk), 'content': 'Réponse', 'parent_comment': created[0].json()['id']},
+            format='json',
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 4)
+
+        self.assertEqual(self.client.delete(f"/api/comments/{created[1].json()['id']}/").status_code, 204)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 3)
+        response = self.client.get(f'/api/comments/?post={self.post.pk}')
+        self.assertEqual(response.json()['count'], 3)
+        self.assertEqual(len(response.json()['results']), 3)
+
+        # Suppression en cascade : la réponse est décomptée avec son parent.
+        self.client.delete(f"/api/comments/{created[0].json()['id']}/")
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+
+    def test_batch_subscribe_counts_new_subscriptions_only(self):
+        pages = [Page.objects.create(owner=self.user, name=f'Page {i}', description='Page', category='Info') for i in range(2)]
+        self.client.post(f'/api/pages/{pages[0].pk}/subscribe/')
+        actions = [{'action': 'subscribe', 'target': str(page.pk)} for page in (*pages, *pages)]
+        for _ in range(2):
+            self.client.post('/api/interactions/batch/', {'actions': actions}, format='json')
+        self.assertEqual([Page.objects.get(pk=page.pk).subscribers_count for page in pages], [1, 1])
+
+        actions = [{'action': 'unsubscribe', 'target': str(page.pk)} for page in pages]
+        self.client.post('/api/interactions/batch/', {'actions': actions}, format='json')
+        self.assertEqual([Page.objects.get(pk=page.pk).subscribers_count for page in pages], [0, 0])
+
+    def test_subscribers_count_and_list(self):
+        page = Page.objects.create(owner=self.user, name='Agence', description='Page', category='Info')
+        for _ in range(2):
+            self.client.post(f'/api/pages/{page.pk}/subscribe/')
+        others = [User.objects.create_user(email=f'u{i}@example.com', username=f'u{i}', password=None) for i in range(55)]
+        for other in others:
+            PageSubscription.objects.create(user=other, page=page)
+        page.refresh_from_db()
+        self.assertEqual(page.subscribers_count, 56)
+
+        for _ in range(2):
+            self.client.delete(f'/api/pages/{page.pk}/unsubscribe/')
+        others[0].delete()
+        page.refresh_from_db()
+        self.assertEqual(page.subscribers_count, 54)
+
+        seen, link = [], f'/api/pages/{page.pk}/subscribers/'
+        while link:
+            data = self.client.get(link).json()
+            self.assertEqual(data['count'], 54)
+            seen += [item['user']['id'] for item in data['results']]
+            link = data['next']
+        self.assertEqual(sorted(seen), sorted(str(other.pk) for other in others[1:]))
+
+
+class PostCursorTest(ReaderTestCase):
+    """Listes de posts par curseur : ni trou ni doublon d'une page à l'autre, dates égales comprises."""
+
+    def setUp(self):
+        super().setUp()
+        self.page = Page.objects.create(owner=self.user, name='Agence', description='Page', category='Info')
+        self.author = User.objects.create_user(email='auteur@example.com', username='auteur', password=None)
+        now = timezone.now()
+        for i in range(24):
+            post = Post.objects.create(author=self.author, content=f'Post {i}', page=self.page)
+            # Trois posts par date : les égalités tombent aussi en limite de page.
+            Post.objects.filter(pk=post.pk).update(created_at=now - timedelta(minutes=i // 3))
+
+    def walk(self, link, during=None):
+        seen = []
+        while link:
+            response = self.client.get(link)
+            self.assertEqual(response.status_code, 200)
+            seen += [post['id'] for post in response.json()['results']]
+            link = response.json()['next']
+            if during is not None:
+                during()
+                during = None
+        return seen
+
+    def test_page_posts(self):
+        for fast in (False, True):
+            with self.subTest(fast=fast), self.settings(FAST_SERIALIZATION=fast):
+                expected = [
+                    str(pk) for pk in
+                    Post.objects.filter(page=self.page).order_by('-created_at', '-id').values_list('pk', flat=True)
+                ]
+                # Un post publié pendant le parcours n'apparaît qu'en tête : la suite ne bouge pas.
+                seen = self.walk(
+                    f'/api/pages/{self.page.pk}/posts/',
+                    lambda: Post.objects.create(author=self.author, content='Nouveau', page=self.page),
+                )
+                self.assertEqual(seen, expected)
+
+    def test_profile_timeline_merges_both_branches(self):
+        # Posts écrits par le lecteur, aux mêmes dates que ceux de sa page, et un post sur sa page.
+        for post in Post.objects.filter(page=self.page)[::2]:
+            mine = Post.objects.create(author=self.user, content='Mon post', page=self.page if post.content == 'Post 0' else None)
+            Post.objects.filter(pk=mine.pk).update(created_at=post.created_at)
+        expected = [
+            str(pk) for pk in Post.objects.filter(Q(author=self.user) | Q(page__owner=self.user))
+            .order_by('-created_at', '-id').values_list('pk', flat=True)
+        ]
+        self.assertEqual(len(expected), 37)
+
+        after, merged = None, []
+        while True:
+            posts, last = timelines.fetch(self.user.pk, [self.page.pk], after, limit=4)
+            merged += [str(post.pk) for post in posts]
+            if last is None:
+                break
+            after = (last.created_at, last.pk)
+        self.assertEqual(merged, expected)
+
+        for url in (f'/api/users/{self.user.pk}/posts/', '/api/posts/mine/'):
+            with self.subTest(url=url):
+                self.assertEqual(self.walk(url), expected)
+                self.assertEqual(self.client.get(url, {'cursor': 'invalide'}).status_code, 404)
+
+
+class AsyncViewsTest(TransactionTestCase):
+    """Endpoints ASGI (core/async_views.py) : mêmes réponses que leurs équivalents DRF, dans leur budget SQL."""
+
+    def setUp(self):
+        cache.clear()
+        self.viewer = User.objects.create_user(email='lecteur@example.com', username='lecteur', password='x')
+        friends = [User.objects.create_user(email=f'u{i}@example.com', username=f'u{i}', password=None) for i in range(4)]
+        page = Page.objects.create(owner=friends[0], name='Transports', description='Page', category='Info')
+        PageSubscription.objects.create(user=self.viewer, page=page)
+        for friend in friends:
+            Friendship.objects.create(requester=self.viewer, addressee=friend, status=FriendStatus.ACCEPTED)
+        posts = [
+            Post.objects.create(author=friends[i % 4], content=f'Post {i}', page=page if i % 3 == 0 else None)
+            for i in range(15)
+        ]
+        for post in posts[:8]:
+            Like.objects.create(user=friends[1], post=post)
+        Like.objects.create(user=self.viewer, post=posts[0])
+
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.viewer)}')
+        self.addCleanup(impressions.buffer.flush)
+
+    def test_feed_matches_sync_feed(self):
+        for fast in (False, True):
+            cache.clear()
+            with self.subTest(fast=fast), self.settings(FAST_SERIALIZATION=fast):
+                with querybudget.query_budget(endpoint=('async-feed', 'get')):
+                    response = self.client.get('/api/async/feed/')
+                self.assertEqual(response.status_code, 200)
+                expected = self.client.get('/api/feed/').json()
+                data = response.json()
+                self.assertEqual(data['count'], expected['count'])
+                self.assertEqual(
+                    [(post['id'], post['is_liked'], post['likes_count']) for post in data['results']],
+                    [(post['id'], post['is_liked'], post['likes_count']) for post in expected['results']],
+                )
+
+    def test_search(self):
+        with querybudget.query_budget(endpoint=('async-search', 'get')):
+            response = self.client.get('/api/async/search/', {'q': 'u'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), self.client.get('/api/search/', {'q': 'u'}).json())
+
+    def test_upload(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        staging = {
+            'BACKEND': 'django.core.files.storage.FileSystemStorage',
+            'OPTIONS': {'location': root, 'base_url': '/media/staging/'},
+        }
+        with self.settings(STORAGES={**settings.STORAGES, 'media_staging': staging}), \
+                mock.patch.object(uploads.pool, 'submit'):
+            with querybudget.query_budget(endpoint=('async-upload', 'post')):
+                response = self.client.post(
+                    '/api/async/upload/', {'file': SimpleUploadedFile('photo.png', b'\x89PNG', content_type='image/png')},
+                )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['status'], UploadStatus.PENDING)
+            response = self.client.post(
+                '/api/async/upload/', {'file': SimpleUploadedFile('page.html', b'<script>', content_type='text/html')},
+            )
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(MediaUpload.objects.count(), 1)
+        self.assertEqual(APIClient().post('/api/async/upload/').status_code, 401)
 
-# Create your tests here.
@@ -0,0 +1,107 @@
+import base64
+import heapq
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from . import versions
+from .models import Post, Page
+
+# Fil d'un profil : posts écrits par l'utilisateur et posts publiés sur ses
+# pages. Au lieu d'un OR à travers la jointure page__owner (aucun index
+# utilisable), deux sous-requêtes servies chacune par son index, (author,
+# created_at) et (page, created_at), paginées par clé (created_at, id) puis
+# fusionnées par date : chacune lit au plus `limit + 1` lignes.
+#
+# Cache optionnel (PROFILE_TIMELINE_CACHE_TTL) de la première page : ids des
+# posts et curseur suivant, sous une clé dérivée des versions 'profile:<id>'
+# et 'page-posts:<page>' (cf. core/versions.py), donc invalidée par écriture.
+
+ORDERING = ('-created_at', '-id')
+
+
+def encode_cursor(post):
+    raw = f'{post.created_at.isoformat()}|{post.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(token):
+    """(created_at, id) de la position ; ValueError si le curseur est invalide."""
+    try:
+        created_at, post_id = base64.urlsafe_b64decode(token.encode()).decode().split('|')
+    except (ValueError, UnicodeError):
+        raise ValueError(token)
+    created_at = parse_datetime(created_at)
+    if created_at is None:
+        raise ValueError(token)
+    return created_at, uuid.UUID(post_id)
+
+
+def owned_page_ids(user_id):
+    ttl = settings.PROFILE_TIMELINE_CACHE_TTL
+    if not ttl:
+        return list(Page.objects.filter(owner_id=user_id).values_list('id', flat=True))
+
+    scope = f'profile:{user_id}'
+    current, _ = versions.get_versions(scope)
+    key = f'timeline-pages:{user_id}:{current[scope]}'
+    page_ids = cache.get(key)
+    if page_ids is None:
+        page_ids = list(Page.objects.filter(owner_id=user_id).values_list('id', flat=True))
+        cache.set(key, page_ids, ttl)
+    return page_ids
+
+
+def branches(user_id, page_ids):
+    """Les deux sous-requêtes indexées ; un post de l'utilisateur sur sa page n'est lu qu'une fois."""
+    authored = Post.objects.filter(author_id=user_id)
+    if not page_ids:
+        return [authored]
+    return [authored, Post.objects.filter(page_id__in=page_ids).exclude(author_id=user_id)]
+
+
+def fetch(user_id, page_ids, after=None, limit=10):
+    """(posts, position suivante ou None) après la position `after` (created_at, id)."""
+    keyset = Q()
+    if after is not None:
+        created_at, post_id = after
+        keyset = Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=post_id)
+
+    sources = [
+        list(queryset.filter(keyset).select_related('author').order_by(*ORDERING)[:limit + 1])
+        for queryset in branches(user_id, page_ids)
+    ]
+    merged = list(heapq.merge(*sources, key=lambda post: (post.created_at, post.pk), reverse=True))
+    posts = merged[:limit]
+    return posts, posts[-1] if len(merged) > limit else None
+
+
+def timeline(user_id, cursor=None, limit=10):
+    """
+    Une page du fil du profil : (posts, curseur suivant ou None).
+    ValueError si le curseur est invalide.
+    """
+    after = decode_cursor(cursor) if cursor else None
+    page_ids = owned_page_ids(user_id)
+    ttl = settings.PROFILE_TIMELINE_CACHE_TTL
+    if after is not None or not ttl:
+        posts, last = fetch(user_id, page_ids, after, limit)
+        return posts, encode_cursor(last) if last else None
+
+    scopes = [f'profile:{user_id}', *(f'page-posts:{page_id}' for page_id in page_ids)]
+    current, _ = versions.get_versions(*scopes)
+    key = f"timeline:{user_id}:{limit}:{versions.make_etag(*(current[scope] for scope in scopes))}"
+    head = cache.get(key)
+    if head is not None:
+        post_ids, next_cursor = head
+        by_id = Post.objects.select_related('author').in_bulk(post_ids)
+        posts = [by_id[post_id] for post_id in post_ids if post_id in by_id]
+        if len(posts) == len(post_ids):
+            return posts, next_cursor
+
+    posts, last = fetch(user_id, page_ids, None, limit)
+    next_cursor = encode_cursor(last) if last else None
+    cache.set(key, ([post.pk for post in posts], next_cursor), ttl)
+    return posts, next_cursor
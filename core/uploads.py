@@ -0,0 +1,235 @@
+import logging
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.core.files.storage import storages
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import MediaUpload, UploadStatus, Post, User, Page
+
+logger = logging.getLogger(__name__)
+
+# Pipeline des uploads : le fichier est écrit dans le staging local
+# (STORAGES['media_staging'], sous MEDIA_ROOT) et son URL provisoire est
+# renvoyée tout de suite ; un pool de threads l'envoie ensuite au stockage
+# distant (STORAGES['media_remote'], Cloudinary en production), avec de
+# nouveaux essais espacés. Une fois l'envoi terminé, les posts et images de
+# profil qui citent l'URL provisoire passent à l'URL finale.
+
+IMAGE_EXTENSIONS = ('jpg', 'jpeg', 'png', 'gif', 'webp')
+# Seuls types acceptés, par extension : le staging est servi depuis l'origine
+# de l'API, un HTML ou un SVG y exécuterait ses scripts (XSS stocké).
+MEDIA_TYPES = {
+    'jpg': 'image/jpeg', 'jpeg': 'image/jpeg', 'png': 'image/png', 'gif': 'image/gif', 'webp': 'image/webp',
+    'mp4': 'video/mp4', 'mov': 'video/quicktime', 'webm': 'video/webm',
+}
+PICTURE_FIELDS = ('profile_picture_url', 'cover_photo_url')
+
+
+class UnsupportedMedia(ValueError):
+    pass
+
+
+def staging():
+    return storages['media_staging']
+
+
+def remote():
+    return storages['media_remote']
+
+
+def stage(user, file_obj):
+    """
+    Dépose le fichier en staging et programme son envoi (après le commit).
+    UnsupportedMedia si l'extension ou le type annoncé n'est pas une image ou une vidéo acceptée.
+    """
+    ext = file_obj.name.rsplit('.', 1)[-1].lower() if '.' in file_obj.name else ''
+    if ext not in MEDIA_TYPES or getattr(file_obj, 'content_type', None) != MEDIA_TYPES[ext]:
+        raise UnsupportedMedia('Type de fichier non accepté (images et vidéos uniquement)')
+    name = staging().save(f"uploads/{user.id}/{uuid.uuid4()}.{ext}", file_obj)
+    upload = MediaUpload.objects.create(
+        user=user, name=name, media_type='IMAGE' if ext in IMAGE_EXTENSIONS else 'VIDEO',
+    )
+    transaction.on_commit(lambda: pool.submit(upload.pk))
+    return upload
+
+
+def describe(upload, request=None):
+    """Représentation API : URL finale si l'envoi est terminé, URL provisoire sinon."""
+    url = upload.url
+    if not url:
+        url = staging().url(upload.name)
+        if request is not None:
+            url = request.build_absolute_uri(url)
+    return {'id': str(upload.pk), 'url': url, 'type': upload.media_type, 'status': upload.status}
+
+
+def staged_name(url):
+    """'https://…/media/staging/uploads/u/x.png' -> 'uploads/u/x.png' ; None pour une autre URL."""
+    if not isinstance(url, str):
+        return None
+    base_url = staging().base_url
+    index = url.find(base_url)
+    if index < 0:
+        return None
+    return url[index + len(base_url):]
+
+
+def final_urls(names):
+    """{nom: URL finale} des uploads déjà envoyés parmi `names`."""
+    names = set(names) - {None}
+    if not names:
+        return {}
+    return dict(
+        MediaUpload.objects.filter(name__in=names, status=UploadStatus.DONE).values_list('name', 'url')
+    )
+
+
+def resolve_media(media, finals=None):
+    """Liste `media` d'un post, URL provisoires déjà envoyées remplacées par leur URL finale."""
+    if not isinstance(media, list):
+        return media
+    names = [staged_name(item.get('url')) for item in media if isinstance(item, dict)]
+    if not any(names):
+        return media
+    finals = final_urls(names) if finals is None else finals
+    resolved = []
+    for item in media:
+        name = staged_name(item.get('url')) if isinstance(item, dict) else None
+        resolved.append({**item, 'url': finals[name]} if name in finals else item)
+    return resolved
+
+
+def resolve_url(url, finals=None):
+    name = staged_name(url)
+    if name is None:
+        return url
+    finals = final_urls([name]) if finals is None else finals
+    return finals.get(name, url)
+
+
+def push(upload_id):
+    """
+    Un essai d'envoi vers le stockage distant. Retourne le délai (secondes)
+    avant un nouvel essai, ou None : envoyé, abandonné, ou pris en charge ailleurs.
+    """
+    # Un seul envoi à la fois par upload (pool, nouvel essai et reprise de l'ordonnanceur).
+    claimed = MediaUpload.objects.filter(pk=upload_id, status=UploadStatus.PENDING).update(
+        status=UploadStatus.PUSHING, attempts=F('attempts') + 1, updated_at=timezone.now(),
+    )
+    if not claimed:
+        return None
+    upload = MediaUpload.objects.get(pk=upload_id)
+
+    try:
+        with staging().open(upload.name) as handle:
+            name = remote().save(upload.name, handle)
+        url = remote().url(name)
+    except Exception as exc:
+        retry = upload.attempts < settings.MEDIA_PUSH_MAX_ATTEMPTS
+        logger.warning(f"Échec de l'envoi de {upload.name} (essai {upload.attempts}): {exc}")
+        MediaUpload.objects.filter(pk=upload_id).update(
+            status=UploadStatus.PENDING if retry else UploadStatus.FAILED,
+            last_error=str(exc), updated_at=timezone.now(),
+        )
+        return settings.MEDIA_PUSH_RETRY_DELAY * 2 ** (upload.attempts - 1) if retry else None
+
+    with transaction.atomic():
+        MediaUpload.objects.filter(pk=upload_id).update(
+            status=UploadStatus.DONE, url=url, last_error='', updated_at=timezone.now(),
+        )
+        relink(upload.user_id, upload.created_at, {upload.name: url})
+    return None
+
+
+def relink(user_id, since, finals):
+    """Remplace les URL provisoires par les URL finales chez l'auteur des uploads."""
+    # Un post qui cite un upload est forcément du même auteur et postérieur à l'upload.
+    for post in Post.objects.filter(author_id=user_id, created_at__gte=since).only('id', 'media'):
+        media = resolve_media(post.media, finals)
+        if media != post.media:
+            post.media = media
+            post.save(update_fields=['media'])
+
+    for instance in [*User.objects.filter(pk=user_id), *Page.objects.filter(owner_id=user_id)]:
+        changed = []
+        for field in PICTURE_FIELDS:
+            url = resolve_url(getattr(instance, field), finals)
+            if url != getattr(instance, field):
+                setattr(instance, field, url)
+                changed.append(field)
+        if changed:
+            instance.save(update_fields=changed)
+
+
+def sweep(now=None):
+    """
+    Passage périodique (ordonnanceur) : relance les envois interrompus (file en
+    mémoire perdue avec un worker) et supprime les copies locales des uploads
+    envoyés depuis plus de MEDIA_STAGING_TTL secondes.
+    Retourne (uploads relancés, copies supprimées).
+    """
+    now = now or timezone.now()
+    stale = now - timedelta(seconds=settings.MEDIA_PUSH_STALE_AFTER)
+
+    MediaUpload.objects.filter(status=UploadStatus.PUSHING, updated_at__lt=stale).update(status=UploadStatus.PENDING)
+    retried = list(
+        MediaUpload.objects.filter(status=UploadStatus.PENDING, updated_at__lt=stale).values_list('pk', flat=True)
+    )
+    for upload_id in retried:
+        push(upload_id)
+
+    expired = MediaUpload.objects.filter(
+        status=UploadStatus.DONE, staged=True,
+        updated_at__lt=now - timedelta(seconds=settings.MEDIA_STAGING_TTL),
+    )
+    purged = 0
+    for upload_id, name in expired.values_list('pk', 'name'):
+        staging().delete(name)
+        purged += MediaUpload.objects.filter(pk=upload_id).update(staged=False)
+    return len(retried), purged
+
+
+class PushPool:
+    """
+    Pool de MEDIA_PUSH_WORKERS threads, créé à la demande dans chaque processus
+    (après un fork, les threads du parent n'existent plus).
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    def submit(self, upload_id, delay=0):
+        if delay:
+            timer = threading.Timer(delay, self.submit, args=(upload_id,))
+            timer.daemon = True
+            timer.start()
+            return
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._executor = ThreadPoolExecutor(settings.MEDIA_PUSH_WORKERS, thread_name_prefix='media-push')
+            executor = self._executor
+        executor.submit(self._run, upload_id)
+
+    def _run(self, upload_id):
+        close_old_connections()
+        try:
+            delay = push(upload_id)
+        except Exception:
+            # Laissé en PUSHING : l'ordonnanceur le relancera (cf. sweep()).
+            logger.exception(f"Envoi de l'upload {upload_id} interrompu")
+            delay = None
+        finally:
+            close_old_connections()
+        if delay is not None:
+            self.submit(upload_id, delay)
+
+
+pool = PushPool()
@@ -1,6 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import *
+from . import async_views
 
 router = DefaultRouter()
 router.register(r'feed', FeedViewSet, basename='feed')
@@ -15,5 +16,11 @@ router.register(r'users', UserViewSet, basename='user')
 urlpatterns = [
     path('', include(router.urls)),
     path('search/', GlobalSearchView.as_view(), name='global-search'),
+    path('interactions/batch/', InteractionBatchView.as_view(), name='interaction-batch'),
+    path('_metrics', MetricsView.as_view(), name='metrics'),
+    # Versions ASGI (cf. core/async_views.py)
+    path('async/feed/', async_views.feed, name='async-feed'),
+    path('async/search/', async_views.search, name='async-search'),
+    path('async/upload/', async_views.upload, name='async-upload'),
 ]
 
@@ -0,0 +1,79 @@
+import hashlib
+import time
+from django.core.cache import cache
+from django.db import transaction
+
+# Compteurs de version stockés dans le cache, incrémentés à chaque écriture
+# (cf. core/signals.py). Ils servent de validateurs HTTP (ETag / Last-Modified)
+# sans avoir à exécuter le queryset ni à hacher le corps de la réponse.
+#
+# Portées utilisées :
+#   'feed:<user_id>'  relations du lecteur (amitiés, abonnements)
+#   'activity:<id>'   likes, partages et commentaires d'un utilisateur (son is_liked dans le fil)
+#   'users'           profils imbriqués dans les posts et le fil
+#   'user:<id>'       profil d'un utilisateur
+#   'post:<id>'       un post et ses compteurs
+#   'page:<id>'       une page et son nombre d'abonnés
+#   'page-posts:<id>' posts d'une page et leurs compteurs (PageViewSet.posts)
+#   'profile:<id>'    posts écrits et pages possédées par un utilisateur (cf. core/timelines.py)
+#   'boosts'          index des boosts actifs (cf. core/boosts.py)
+#
+# Dans une transaction, l'incrément attend le COMMIT : un lecteur concurrent ne
+# peut pas mettre en cache l'état d'avant sous la nouvelle version, et un
+# ROLLBACK ne change aucune version.
+
+
+def _counter_key(scope):
+    return f'version:{scope}'
+
+
+def _timestamp_key(scope):
+    return f'version-ts:{scope}'
+
+
+def bump(*scopes):
+    """Invalide les portées données (nouvelle version + date de modification) au COMMIT."""
+    transaction.on_commit(lambda: _bump(scopes))
+
+
+def _bump(scopes):
+    now = time.time()
+    for scope in scopes:
+        key = _counter_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Compteur absent (cache vidé) : on repart d'une valeur datée pour ne
+            # jamais réémettre un ETag déjà distribué avant le vidage.
+            cache.set(key, time.time_ns(), None)
+        cache.set(_timestamp_key(scope), now, None)
+
+
+def get_versions(*scopes):
+    """
+    Retourne ({portée: version}, dernière modification) en une seule lecture du cache.
+    Une portée jamais incrémentée est initialisée à la volée.
+    """
+    keys = [_counter_key(scope) for scope in scopes] + [_timestamp_key(scope) for scope in scopes]
+    values = cache.get_many(keys)
+
+    missing = [scope for scope in scopes if _counter_key(scope) not in values]
+    if missing:
+        # Initialisation, pas une écriture : immédiate, même dans une transaction.
+        _bump(missing)
+        values.update(cache.get_many(
+            [_counter_key(scope) for scope in missing] + [_timestamp_key(scope) for scope in missing]
+        ))
+
+    versions = {scope: values.get(_counter_key(scope)) for scope in scopes}
+    timestamps = [values[_timestamp_key(scope)] for scope in scopes if _timestamp_key(scope) in values]
+    return versions, max(timestamps) if timestamps else None
+
+
+def page_posts_scopes(page_id):
+    """Portée des posts d'une page, ou aucune pour un post hors page."""
+    return [f'page-posts:{page_id}'] if page_id else []
+
+
+def make_etag(*parts):
+    return '"%s"' % hashlib.md5(':'.join(str(part) for part in parts).encode()).hexdigest()
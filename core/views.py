@@ -1,5 +1,7 @@
 import logging
+import time
 from datetime import timedelta
+from decimal import Decimal, InvalidOperation
 from rest_framework.views import APIView
 from rest_framework import viewsets, status, filters, serializers
 from rest_framework.decorators import action
@@ -7,19 +9,51 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework.parsers import MultiPartParser, FormParser
-from django.db.models import Q, F, Case, When, Value, IntegerField, FloatField, ExpressionWrapper, Count
+from rest_framework.generics import get_object_or_404
+from rest_framework.exceptions import NotFound
+from rest_framework.utils.urls import replace_query_param
+from django.db.models import Q, F, Case, When, Value, IntegerField, FloatField, ExpressionWrapper, Count, Sum, Window
+from django.db.models.functions import RowNumber
+from django.urls import reverse
 from django.utils import timezone
 from django.conf import settings
-from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
+from django.core.cache import cache
+from django.core.paginator import Page as DjangoPage
+from django.http import FileResponse, Http404, HttpResponse
+from django.db import IntegrityError, transaction
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
 
 from .serializers import MyTokenObtainPairSerializer
 from .models import *
 from .serializers import *
 from .permissions import IsOwnerOrReadOnly
+from .pagination import CommentPagination, PostPagination, SubscriberPagination, ThreadPagination, ReplyPagination
+from . import audience, boosts, impressions, interactions, interests, metrics, rollups, snapshots, timelines, uploads, versions
 
 logger = logging.getLogger(__name__)
 
+
+class FastSerializationMixin:
+    """
+    Chemin de liste optionnel (settings.FAST_SERIALIZATION) : les lignes sont
+    lues via `.values()` et converties par `fast_serializer_class`, avec une
+    sortie identique à celle de `serializer_class`.
+    """
+    fast_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        if not (getattr(settings, 'FAST_SERIALIZATION', False) and self.fast_serializer_class):
+            return super().list(request, *args, **kwargs)
+
+        fast_serializer = self.fast_serializer_class(context=self.get_serializer_context())
+        rows = fast_serializer.values(self.filter_queryset(self.get_queryset()))
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(fast_serializer.serialize(page))
+        return Response(fast_serializer.serialize(rows))
+
 class MyTokenObtainPairView(TokenObtainPairView):
     serializer_class = MyTokenObtainPairSerializer
     permission_classes = [AllowAny]
@@ -54,12 +88,90 @@ class MyTokenObtainPairView(TokenObtainPairView):
             return Response({'detail': error_message}, status=status.HTTP_401_UNAUTHORIZED)
 
 
-class UserViewSet(viewsets.ReadOnlyModelViewSet):
+class ConditionalGetMixin:
+    """
+    GET conditionnel (If-None-Match / If-Modified-Since) sur `list` et `retrieve`.
+    Les validateurs viennent des compteurs de version (core/versions.py) : une
+    ressource inchangée coûte une lecture du cache et renvoie 304, avant toute
+    exécution du queryset ou du sérialiseur.
+    """
+    def get_version_scopes(self, request):
+        """Portées de version de l'action courante, ou None pour désactiver."""
+        return None
+
+    def get_etag_parts(self, request):
+        return [request.get_full_path()]
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional(super().retrieve, request, *args, **kwargs)
+
+    def _conditional(self, handler, request, *args, **kwargs):
+        scopes = self.get_version_scopes(request)
+        if scopes is None:
+            return handler(request, *args, **kwargs)
+
+        etag, last_modified = self.get_validators(request, scopes)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+        return self.set_validators(response, etag, last_modified)
+
+    def get_validators(self, request, scopes):
+        """(ETag, Last-Modified en secondes ou None) des portées courantes."""
+        current, last_modified = versions.get_versions(*scopes)
+        etag = versions.make_etag(*self.get_etag_parts(request), *(current[scope] for scope in scopes))
+        if last_modified is not None:
+            last_modified = int(last_modified)
+        return etag, last_modified
+
+    @staticmethod
+    def set_validators(response, etag, last_modified):
+        response.headers['ETag'] = etag
+        if last_modified is not None:
+            response.headers['Last-Modified'] = http_date(last_modified)
+        patch_vary_headers(response, ('Authorization',))
+        return response
+
+
+class ProfileTimelineMixin:
+    """
+    Fil d'un profil (posts écrits et posts de ses pages, cf. core/timelines.py),
+    paginé par clé : {"next": <url avec ?cursor=> ou null, "results": [...]}.
+    """
+    def timeline_response(self, request, user_id):
+        try:
+            posts, cursor = timelines.timeline(
+                user_id, request.query_params.get('cursor'), PostPagination.page_size,
+            )
+        except ValueError:
+            raise NotFound('Curseur invalide.')
+        PostSerializer.attach_engagement(posts, request.user)
+        next_link = None
+        if cursor:
+            next_link = replace_query_param(request.build_absolute_uri(), 'cursor', cursor)
+        return Response({
+            'next': next_link,
+            'results': PostSerializer(posts, many=True, context={'request': request}).data,
+        })
+
+
+class UserViewSet(ProfileTimelineMixin, ConditionalGetMixin, FastSerializationMixin, viewsets.ReadOnlyModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
+    fast_serializer_class = FastUserSerializer
     permission_classes = [IsAuthenticated]
     lookup_field = 'id'
 
+    def get_version_scopes(self, request):
+        if self.action == 'retrieve':
+            return [f"user:{self.kwargs['id']}"]
+        return None
+
     @action(detail=True, methods=['get'])
     def friends(self, request, id=None):
         user = self.get_object()
@@ -98,31 +210,218 @@ class UserViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=True, methods=['get'])
     def posts(self, request, id=None):
         user = self.get_object()
-        qs = (
-            Post.objects.filter(Q(author=user) | Q(page__owner=user))
-            .select_related('author', 'page')
-            .order_by('-created_at')
-        )
-        serializer = PostSerializer(qs, many=True, context={'request': request})
-        return Response(serializer.data)
+        return self.timeline_response(request, user.id)
 
 
-class FeedViewSet(viewsets.ReadOnlyModelViewSet):
+class FeedViewSet(ConditionalGetMixin, FastSerializationMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = PostSerializer
+    fast_serializer_class = FastPostSerializer
     permission_classes = [IsAuthenticated]
 
+    def get_version_scopes(self, request):
+        # Entrées propres au lecteur : ses relations et son activité, les posts de
+        # ses amis et des pages qu'il suit ('profile:<auteur>'), les boosts actifs.
+        # Une portée globale (tout like, tout post) changerait à chaque écriture et
+        # l'ETag ne validerait jamais. La popularité des autres posts et les profils
+        # imbriqués sont repris à chaque fenêtre FEED_VALIDATOR_WINDOW (cf. get_etag_parts).
+        if self.action == 'list':
+            user_id = request.user.id
+            return [
+                f'feed:{user_id}', f'activity:{user_id}', 'boosts',
+                *(f'profile:{author_id}' for author_id in self.followed_author_ids(request.user)),
+            ]
+        return None
+
+    def get_etag_parts(self, request):
+        # Le score dépend aussi de l'heure (fraîcheur, fenêtres des boosts) :
+        # l'ETag change au moins une fois par fenêtre FEED_VALIDATOR_WINDOW.
+        window = int(time.time() // settings.FEED_VALIDATOR_WINDOW)
+        return [request.get_full_path(), request.user.id, window]
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional(self.ranked_list, request, *args, **kwargs)
+
+    def ranked_list(self, request, *args, **kwargs):
+        response = self.snapshot_response(request)
+        if response is None:
+            # Classement complet (le GET conditionnel est déjà traité ci-dessus).
+            response = super(ConditionalGetMixin, self).list(request, *args, **kwargs)
+        return response
+
+    # Amis du lecteur, lus une fois par requête (validateurs, instantané, classement).
+    viewer_friend_ids = None
+
+    def viewer_friends(self, user):
+        if self.viewer_friend_ids is None:
+            self.viewer_friend_ids = self.friend_ids(user)
+        return self.viewer_friend_ids
+
+    def snapshot_response(self, request):
+        """
+        Page du fil servie depuis l'instantané du segment du lecteur (cf.
+        core/snapshots.py), ou None s'il faut classer tous les posts : lecteur
+        avec plus de FEED_SNAPSHOT_MAX_AFFINITY amis et abonnements, page
+        au-delà de l'instantané, ou instantané absent.
+        """
+        paginator = self.paginator
+        page_size = paginator.get_page_size(request)
+        try:
+            number = int(request.query_params.get(paginator.page_query_param, 1))
+        except ValueError:
+            return None
+        need = number * page_size
+        # La seconde moitié de l'instantané sert de marge : un post boosté proche
+        # de la coupure peut remonter avec le bonus exact du lecteur.
+        if number < 1 or need > settings.FEED_SNAPSHOT_SIZE // 2:
+            return None
+
+        user = request.user
+        now = timezone.now()
+        snapshot = snapshots.ranking(user, now)
+        if snapshot is None:
+            return None
+        total, entries = snapshot
+
+        friend_ids = self.viewer_friends(user)
+        budget = settings.FEED_SNAPSHOT_MAX_AFFINITY - len(friend_ids)
+        if budget < 0:
+            return None
+        page_ids = list(self.subscribed_page_ids(user)[:budget + 1])
+        if len(page_ids) > budget:
+            return None
+
+        # Les quelques posts personnels (amis, pages suivies) sont classés en
+        # base avec le score complet ; les autres reprennent le score de base
+        # de l'instantané, plus le bonus exact des boosts pour ce lecteur.
+        active_boosts = boosts.active_boosts(now)
+        personal = []
+        if friend_ids or page_ids:
+            personal = list(
+                self.build_queryset(user, now, friend_ids, page_ids, active_boosts)
+                .filter(Q(author__in=friend_ids) | Q(page__in=page_ids))
+                .values_list('id', 'created_at', 'relevance_score')[:need]
+            )
+        post_bonus, page_bonus = self.boost_bonuses(user, now, active_boosts)
+
+        page_ids = set(page_ids)
+        ranked = [
+            (post_id, created_at, base + (post_bonus[post_id] if post_id in post_bonus else page_bonus.get(page_id, 0)))
+            for post_id, author_id, page_id, created_at, base in entries
+            if author_id not in friend_ids and page_id not in page_ids
+        ]
+        # Instantané tronqué : au-delà, l'ordre n'est plus connu.
+        if len(entries) >= settings.FEED_SNAPSHOT_SIZE and len(ranked) < need:
+            return None
+        ranked.extend(personal)
+        ranked.sort(key=lambda item: (item[2], item[1]), reverse=True)
+
+        offset = (number - 1) * page_size
+        scores = {post_id: score for post_id, _, score in ranked[offset:offset + page_size]}
+        if not scores and number > 1:
+            return None
+        queryset = (
+            Post.objects.filter(pk__in=scores)
+            .annotate(
+                num_likes=Count('likes'),
+                relevance_score=Case(
+                    *(When(pk=post_id, then=Value(score)) for post_id, score in scores.items()),
+                    default=Value(0), output_field=FloatField(),
+                ),
+            )
+            .select_related('author', 'page').order_by('-relevance_score', '-created_at')
+        )
+
+        if getattr(settings, 'FAST_SERIALIZATION', False):
+            fast_serializer = self.fast_serializer_class(context=self.get_serializer_context())
+            rows = list(fast_serializer.values(queryset))
+            self.record_impressions(rows)
+            data = fast_serializer.serialize(rows)
+        else:
+            rows = list(queryset)
+            self.record_impressions(rows)
+            PostSerializer.attach_engagement(rows, user)
+            data = self.get_serializer(rows, many=True).data
+
+        django_paginator = paginator.django_paginator_class(rows, page_size)
+        django_paginator.count = total
+        paginator.page = DjangoPage(rows, number, django_paginator)
+        paginator.request = request
+        return paginator.get_paginated_response(data)
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is not None:
+            self.record_impressions(page)
+            if not getattr(settings, 'FAST_SERIALIZATION', False):
+                # is_liked du lecteur en une requête pour la page (num_likes est annoté).
+                PostSerializer.attach_engagement(page, self.request.user)
+        return page
+
+    def record_impressions(self, posts):
+        """Met en tampon les posts boostés de la page servie (aucune écriture ici)."""
+        if not (self.post_boosts or self.page_boosts):
+            return
+        user_id = self.request.user.id
+        for post in posts:
+            # Instances de Post (sérialiseur DRF) ou lignes .values() (chemin rapide)
+            post_id, page_id = (post['id'], post['page_id']) if isinstance(post, dict) else (post.id, post.page_id)
+            boost_id = self.post_boosts.get(post_id) or self.page_boosts.get(page_id)
+            if boost_id is not None:
+                impressions.buffer.record(boost_id, post_id, user_id)
+
+    # Lectures indépendantes dont dépend le score : enchaînées ici, exécutées
+    # en parallèle par la version async du fil (cf. core/async_views.py).
+    @staticmethod
+    def friend_ids(user):
+        friend_pairs = Friendship.objects.filter(
+            Q(requester=user) | Q(addressee=user),
+            status=FriendStatus.ACCEPTED
+        ).values_list('requester_id', 'addressee_id')
+        return {uid for sublist in friend_pairs for uid in sublist if uid != user.id}
+
+    def followed_author_ids(self, user):
+        """
+        Le lecteur, ses amis et les propriétaires des pages qu'il suit, en cache
+        sous la version 'feed:<id>' (changée par ses amitiés et abonnements).
+        """
+        scope = f'feed:{user.id}'
+        current, _ = versions.get_versions(scope)
+        key = f'feed-authors:{user.id}:{current[scope]}'
+        author_ids = cache.get(key)
+        if author_ids is None:
+            owner_ids = Page.objects.filter(pagesubscription__user=user).values_list('owner_id', flat=True)
+            author_ids = sorted({user.id, *self.viewer_friends(user), *owner_ids}, key=str)
+            cache.set(key, author_ids, settings.FEED_VALIDATOR_WINDOW)
+        return author_ids
+
+    @staticmethod
+    def subscribed_page_ids(user):
+        return PageSubscription.objects.filter(user=user).values_list('page_id', flat=True)
+
     def get_queryset(self):
         user = self.request.user
         now = timezone.now()
+        friend_ids = self.viewer_friends(user)
+        return self.build_queryset(
+            user, now, friend_ids, self.subscribed_page_ids(user), boosts.active_boosts(now),
+        )
 
-        viewer_city = (getattr(user, 'city', None) or '').strip().lower()
+    def boost_bonuses(self, user, now, active_boosts):
+        """
+        Bonus de classement des boosts actifs pour ce lecteur :
+        ({post: bonus}, {page: bonus}).
+        """
+        # Clés canoniques calculées à l'écriture (cf. core/locations.py).
+        viewer_city_key = getattr(user, 'city_key', None)
+        viewer_region_key = getattr(user, 'region_key', None)
         viewer_gender = (getattr(user, 'gender', None) or '').strip().upper()
 
-        viewer_interests_raw = getattr(user, 'interests', None) or []
-        viewer_interests = {
-            i.strip() for i in viewer_interests_raw
-            if isinstance(i, str) and i.strip()
-        }
+        # Intérêts communs = popcount(masque du boost & masque du lecteur).
+        viewer_mask = getattr(user, 'interests_mask', 0) or 0
+        taxonomy = interests.taxonomy()
+        viewer_overflow = set()
+        if interests.has_overflow(taxonomy):
+            viewer_overflow = interests.overflow(getattr(user, 'interests', None), taxonomy)
 
         viewer_age = None
         viewer_birth_date = getattr(user, 'birth_date', None)
@@ -135,8 +434,11 @@ class FeedViewSet(viewsets.ReadOnlyModelViewSet):
         def compute_audience_match_bonus(boost_obj):
             bonus = 0
 
-            boost_location = (getattr(boost_obj, 'audience_location', None) or '').strip().lower()
-            if boost_location and viewer_city and viewer_city in boost_location:
+            # Ciblage d'une ville : même ville ; ciblage d'une région : ville de cette région.
+            if boost_obj.audience_city_key:
+                if boost_obj.audience_city_key == viewer_city_key:
+                    bonus += 20
+            elif boost_obj.audience_region_key and boost_obj.audience_region_key == viewer_region_key:
                 bonus += 20
 
             boost_gender = (getattr(boost_obj, 'audience_gender', None) or '').strip().upper()
@@ -151,44 +453,37 @@ class FeedViewSet(viewsets.ReadOnlyModelViewSet):
                 if ok_min and ok_max:
                     bonus += 10
 
-            boost_interests_raw = getattr(boost_obj, 'audience_interests', None) or []
-            boost_interests = {
-                i.strip() for i in boost_interests_raw
-                if isinstance(i, str) and i.strip()
-            }
-            if boost_interests and viewer_interests:
-                common = boost_interests.intersection(viewer_interests)
-                bonus += min(20, 5 * len(common))
+            common = (boost_obj.audience_interests_mask & viewer_mask).bit_count()
+            if viewer_overflow:
+                common += len(interests.overflow(boost_obj.audience_interests, taxonomy) & viewer_overflow)
+            bonus += min(20, 5 * common)
 
             return bonus
 
-        friend_pairs = Friendship.objects.filter(
-            Q(requester=user) | Q(addressee=user),
-            status=FriendStatus.ACCEPTED
-        ).values_list('requester_id', 'addressee_id')
-        friend_ids_flat = {uid for sublist in friend_pairs for uid in sublist if uid != user.id}
-        subscribed_page_ids = PageSubscription.objects.filter(user=user).values_list('page_id', flat=True)
-
-        active_boosts = Boost.objects.filter(
-            status=BoostStatus.ACTIVE,
-            start_date__lte=now,
-            end_date__gte=now,
-        )
-
         post_boost_bonus_map = {}
         page_boost_bonus_map = {}
+        # Boost à l'origine du bonus, pour comptabiliser les impressions servies.
+        self.post_boosts = {}
+        self.page_boosts = {}
 
         for boost in active_boosts:
+            pacing = boosts.pacing_factor(boost, now)
+            if pacing <= 0:
+                continue
             audience_bonus = compute_audience_match_bonus(boost)
             if boost.target_type == TargetType.POST:
-                post_boost_bonus_map[boost.target_id] = 100 + audience_bonus
+                post_boost_bonus_map[boost.target_id] = int((100 + audience_bonus) * pacing)
+                self.post_boosts[boost.target_id] = boost.id
             elif boost.target_type == TargetType.PAGE:
-                page_boost_bonus_map[boost.target_id] = 60 + audience_bonus
+                page_boost_bonus_map[boost.target_id] = int((60 + audience_bonus) * pacing)
+                self.page_boosts[boost.target_id] = boost.id
+        return post_boost_bonus_map, page_boost_bonus_map
 
-        queryset = Post.objects.all().annotate(
-            num_likes=Count('likes', distinct=True),
-            num_comments=Count('comments', distinct=True),
-        )
+    def build_queryset(self, user, now, friend_ids_flat, subscribed_page_ids, active_boosts):
+        post_boost_bonus_map, page_boost_bonus_map = self.boost_bonuses(user, now, active_boosts)
+
+        # Commentaires : compteur tenu à jour sur Post (cf. core/counters.py), sans jointure.
+        queryset = Post.objects.all().annotate(num_likes=Count('likes'))
 
         w_affinity = Case(
             When(author__in=friend_ids_flat, then=Value(40)),
@@ -215,7 +510,7 @@ class FeedViewSet(viewsets.ReadOnlyModelViewSet):
         )
 
         w_engagement = ExpressionWrapper(
-            (F('num_likes') * 2) + (F('num_comments') * 5),
+            (F('num_likes') * 2) + (F('comments_count') * 5),
             output_field=IntegerField(),
         )
 
@@ -242,52 +537,141 @@ class FeedViewSet(viewsets.ReadOnlyModelViewSet):
         return queryset.select_related('author', 'page').order_by('-relevance_score', '-created_at')
 
 
-class PostViewSet(viewsets.ModelViewSet):
+class PostViewSet(ProfileTimelineMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Post.objects.all()
     serializer_class = PostSerializer
     permission_classes = [IsOwnerOrReadOnly, IsAuthenticated]
 
+    def get_version_scopes(self, request):
+        if self.action == 'retrieve':
+            return [f"post:{self.kwargs['pk']}", 'users']
+        return None
+
+    def get_etag_parts(self, request):
+        # is_liked dépend du lecteur
+        return [request.get_full_path(), request.user.id]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            queryset = queryset.select_related('author')
+        return queryset
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is not None:
+            PostSerializer.attach_engagement(page, self.request.user)
+        return page
+
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def mine(self, request):
-        qs = Post.objects.filter(
-            Q(author=request.user) | Q(page__owner=request.user)
-        ).select_related('author', 'page').order_by('-created_at')
-
-        serializer = self.get_serializer(qs, many=True, context={'request': request})
-        return Response(serializer.data)
+        return self.timeline_response(request, request.user.id)
 
+    def interaction_target(self, pk):
+        """
+        Post ciblé par un like/unlike/partage : (id, page) lus par la clé
+        primaire, sans charger le post.
+        """
+        try:
+            post_id = uuid.UUID(str(pk))
+        except ValueError:
+            raise Http404
+        row = Post.objects.filter(pk=post_id).values_list('pk', 'page_id').first()
+        if row is None:
+            raise Http404
+        return row
+
+    # Écritures différées et fusionnées par (utilisateur, post) (cf. core/interactions.py).
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def like(self, request, pk=None):
-        post = self.get_object()
-        Like.objects.get_or_create(user=request.user, post=post)
+        post_id, page_id = self.interaction_target(pk)
+        interactions.buffer.like(request.user.id, post_id, page_id=page_id)
         return Response({'status': 'liked'})
 
     @action(detail=True, methods=['delete'], permission_classes=[IsAuthenticated])
     def unlike(self, request, pk=None):
-        post = self.get_object()
-        Like.objects.filter(user=request.user, post=post).delete()
+        post_id, page_id = self.interaction_target(pk)
+        interactions.buffer.unlike(request.user.id, post_id, page_id=page_id)
         return Response({'status': 'unliked'})
 
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def share(self, request, pk=None):
-        post = self.get_object()
-        Share.objects.create(user=request.user, post=post)
+        post_id, page_id = self.interaction_target(pk)
+        interactions.buffer.share(request.user.id, post_id, page_id=page_id)
         return Response({'status': 'shared'})
 
 
-class PageViewSet(viewsets.ModelViewSet):
+class InteractionBatchView(APIView):
+    """
+    Rejoue un lot d'actions hors ligne (like, unlike, subscribe, unsubscribe)
+    en une requête : {"actions": [{"action": "like", "target": "<uuid>"}, ...]}.
+    Réponse : un résultat par action, dans l'ordre ; un élément invalide ou une
+    cible introuvable n'empêche pas l'application des autres.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        batch = InteractionBatchSerializer(data=request.data)
+        batch.is_valid(raise_exception=True)
+
+        results, items, positions = [], [], []
+        for item in batch.validated_data['actions']:
+            action = InteractionActionSerializer(data=item)
+            if action.is_valid():
+                positions.append(len(results))
+                items.append((action.validated_data['action'], action.validated_data['target']))
+                results.append({'action': item['action'], 'target': str(action.validated_data['target'])})
+            else:
+                results.append({
+                    'action': item.get('action'), 'target': item.get('target'),
+                    'status': 'invalid', 'errors': action.errors,
+                })
+
+        for position, outcome in zip(positions, interactions.apply_batch(request.user.id, items)):
+            results[position]['status'] = outcome
+        return Response({'results': results})
+
+
+class MetricsView(APIView):
+    """
+    Métriques du processus au format texte de Prometheus (cf. core/metrics.py),
+    réservées aux adresses de METRICS_ALLOWED_IPS : 404 pour les autres.
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+            raise Http404
+        return HttpResponse(metrics.prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class PageViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Page.objects.all()
     serializer_class = PageSerializer
     permission_classes = [IsAuthenticated, IsOwnerOrReadOnly]
     lookup_field = 'id'
 
+    def get_version_scopes(self, request):
+        if self.action == 'retrieve':
+            return [f"page:{self.kwargs['id']}"]
+        if self.action == 'posts':
+            return [f"page-posts:{self.kwargs['id']}", 'users']
+        return None
+
+    def get_etag_parts(self, request):
+        if self.action == 'posts':
+            # is_liked dépend du lecteur
+            return [request.get_full_path(), request.user.id]
+        return super().get_etag_parts(request)
+
     def get_queryset(self):
         queryset = super().get_queryset()
         if getattr(self, 'action', None) == 'list':
-            return queryset.filter(owner=self.request.user)
+            return queryset.filter(owner=self.request.user).order_by('-created_at')
         return queryset
 
     def perform_create(self, serializer):
@@ -305,12 +689,42 @@ class PageViewSet(viewsets.ModelViewSet):
         PageSubscription.objects.filter(user=request.user, page=page).delete()
         return Response({'status': 'unsubscribed'})
 
+    @action(detail=True, methods=['get'])
+    def subscribers(self, request, id=None):
+        """
+        Abonnés de la page, par curseur : le coût d'une page de résultats ne
+        dépend pas du nombre d'abonnés. Le total est Page.subscribers_count.
+        """
+        page = self.get_object()
+        queryset = PageSubscription.objects.filter(page=page).select_related('user')
+        paginator = SubscriberPagination()
+        subscriptions = paginator.paginate_queryset(queryset, request, view=self)
+        response = paginator.get_paginated_response(PageSubscriberSerializer(subscriptions, many=True).data)
+        response.data['count'] = page.subscribers_count
+        return response
+
     @action(detail=True, methods=['get'])
     def posts(self, request, id=None):
+        """
+        Posts de la page par curseur (index (page, created_at)), avec GET
+        conditionnel sur la version 'page-posts:<id>' (cf. core/versions.py).
+        """
+        return self._conditional(self.page_posts, request, id=id)
+
+    def page_posts(self, request, id=None):
         page = self.get_object()
-        posts = Post.objects.filter(page=page)
-        serializer = PostSerializer(posts, many=True, context={'request': request})
-        return Response(serializer.data)
+        queryset = Post.objects.filter(page=page).select_related('author')
+        paginator = PostPagination()
+        context = self.get_serializer_context()
+
+        if getattr(settings, 'FAST_SERIALIZATION', False):
+            fast_serializer = FastPostSerializer(context=context)
+            rows = paginator.paginate_queryset(fast_serializer.values(queryset), request, view=self)
+            return paginator.get_paginated_response(fast_serializer.serialize(rows))
+
+        posts = paginator.paginate_queryset(queryset, request, view=self)
+        PostSerializer.attach_engagement(posts, request.user)
+        return paginator.get_paginated_response(PostSerializer(posts, many=True, context=context).data)
 
 
 class BoostViewSet(viewsets.ModelViewSet):
@@ -325,6 +739,43 @@ class BoostViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['post'])
     def pay(self, request, pk=None):
+        """
+        Paiement rejouable : avec l'en-tête Idempotency-Key, une requête répétée
+        (double clic, nouvel essai réseau) renvoie la réponse de la première
+        sans rejouer le paiement. Une requête concurrente portant la même clé
+        attend la fin de la première sur l'index unique (user, key).
+        """
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return self.process_payment(request)
+
+        scope = f'boost-pay:{pk}'
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    record = IdempotencyKey.objects.create(user=request.user, key=key, scope=scope)
+            except IntegrityError:
+                record = IdempotencyKey.objects.get(user=request.user, key=key)
+                if record.scope != scope:
+                    return Response(
+                        {'error': "Cette clé d'idempotence a déjà servi pour une autre requête."},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    )
+                response = Response(record.response, status=record.status_code)
+                response['Idempotent-Replayed'] = 'true'
+                return response
+
+            response = self.process_payment(request)
+            if status.is_success(response.status_code):
+                record.response = response.data
+                record.status_code = response.status_code
+                record.save(update_fields=['response', 'status_code'])
+            else:
+                # Échec non mémorisé : le client peut corriger et réessayer avec la même clé.
+                transaction.set_rollback(True)
+        return response
+
+    def process_payment(self, request):
         boost = self.get_object()
 
         payment_token = request.data.get('payment_token')
@@ -333,71 +784,230 @@ class BoostViewSet(viewsets.ModelViewSet):
         if not payment_token:
             return Response({'error': 'Token de paiement manquant'}, status=400)
 
-        if float(amount) < float(boost.budget):
+        try:
+            amount = Decimal(str(amount))
+        except (InvalidOperation, TypeError):
+            return Response({'error': 'Montant invalide'}, status=400)
+        if amount < boost.budget:
             return Response({'error': 'Montant insuffisant pour le budget défini'}, status=400)
 
-        boost.status = BoostStatus.ACTIVE
-        boost.save()
+        target = boosts.status_after_payment(boost)
+        if target == BoostStatus.COMPLETED:
+            return Response({'error': 'La période de diffusion de ce boost est déjà terminée.'}, status=400)
+        if not boosts.transition(boost, [BoostStatus.PAUSED], target):
+            return Response(
+                {'error': 'Ce boost a déjà été payé.', 'boost_status': self.current_status(boost)},
+                status=status.HTTP_409_CONFLICT,
+            )
 
+        message = 'Paiement accepté, Boost activé.'
+        if boost.status == BoostStatus.SCHEDULED:
+            message = 'Paiement accepté, Boost programmé.'
         return Response({
             'status': 'success',
-            'message': 'Paiement accepté, Boost activé.',
+            'message': message,
             'boost_status': boost.status,
         })
 
     @action(detail=True, methods=['post'])
     def pause(self, request, pk=None):
         boost = self.get_object()
-        if boost.status != BoostStatus.ACTIVE:
+        if not boosts.transition(boost, [BoostStatus.ACTIVE, BoostStatus.SCHEDULED], BoostStatus.PAUSED):
             return Response(
-                {'error': 'Seuls les boosts actifs peuvent être mis en pause.'},
+                {'error': 'Seuls les boosts actifs ou programmés peuvent être mis en pause.'},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        boost.status = BoostStatus.PAUSED
-        boost.save()
         return Response({'status': 'success', 'boost_status': boost.status})
 
     @action(detail=True, methods=['post'])
     def resume(self, request, pk=None):
         boost = self.get_object()
-        if boost.status != BoostStatus.PAUSED:
+        if not boosts.transition(boost, [BoostStatus.PAUSED], boosts.status_after_payment(boost)):
             return Response(
                 {'error': 'Seuls les boosts en pause peuvent être repris.'},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        boost.status = BoostStatus.ACTIVE
-        boost.save()
         return Response({'status': 'success', 'boost_status': boost.status})
 
     @action(detail=True, methods=['post'])
     def stop(self, request, pk=None):
         boost = self.get_object()
-        if boost.status == BoostStatus.COMPLETED:
+        active = [BoostStatus.SCHEDULED, BoostStatus.ACTIVE, BoostStatus.PAUSED]
+        if not boosts.transition(boost, active, BoostStatus.COMPLETED, end_date=timezone.now()):
             return Response(
                 {'error': 'Ce boost est déjà terminé.'},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        boost.status = BoostStatus.COMPLETED
-        boost.end_date = timezone.now()
-        boost.save()
         return Response({'status': 'success', 'boost_status': boost.status})
 
+    @staticmethod
+    def current_status(boost):
+        return Boost.objects.filter(pk=boost.pk).values_list('status', flat=True).first()
+
+    @action(detail=False, methods=['get'])
+    def reach_estimate(self, request):
+        """
+        Nombre estimé d'utilisateurs correspondant à un ciblage, lu dans le cube
+        d'audience précalculé (python manage.py refresh_audience_cube).
+        """
+        criteria = ReachEstimateSerializer(data=request.query_params)
+        criteria.is_valid(raise_exception=True)
+
+        cube = audience.current_cube()
+        if cube is None:
+            return Response(
+                {'error': "Estimation indisponible : le cube d'audience n'a pas encore été calculé."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+
+        params = criteria.validated_data
+        reach = audience.estimate(
+            cube.data,
+            location=params.get('audience_location'),
+            gender=params.get('audience_gender'),
+            age_min=params.get('audience_age_min'),
+            age_max=params.get('audience_age_max'),
+            interests=params.get('audience_interests'),
+        )
+        return Response({
+            'estimated_reach': reach,
+            'total_users': cube.total_users,
+            'computed_at': cube.computed_at,
+        })
+
+    @action(detail=True, methods=['get'])
+    def stats(self, request, pk=None):
+        """
+        Performances du boost, lues uniquement dans les agrégats (core/rollups.py) :
+        ?granularity=day (défaut) ou hour. `as_of` indique la fin de la dernière
+        heure agrégée.
+        """
+        boost = self.get_object()
+        granularity = request.query_params.get('granularity', 'day')
+        if granularity == 'day':
+            series = BoostStatDailySerializer(boost.daily_stats.order_by('day'), many=True).data
+        elif granularity == 'hour':
+            series = BoostStatHourlySerializer(boost.hourly_stats.order_by('bucket'), many=True).data
+        else:
+            return Response(
+                {'error': "granularity doit être 'day' ou 'hour'."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        totals = boost.daily_stats.aggregate(**{field: Sum(field) for field in rollups.STAT_FIELDS})
+        totals = {field: value or 0 for field, value in totals.items()}
+        totals['spend'] = f"{totals['spend']:.4f}"
+
+        return Response({
+            'boost': boost.id,
+            'budget': str(boost.budget),
+            'granularity': granularity,
+            'as_of': rollups.last_aggregated(),
+            'totals': totals,
+            'series': series,
+        })
 
-class CommentViewSet(viewsets.ModelViewSet):
+
+class CommentViewSet(FastSerializationMixin, viewsets.ModelViewSet):
     queryset = Comment.objects.all()
     serializer_class = CommentSerializer
+    fast_serializer_class = FastCommentSerializer
+    pagination_class = CommentPagination
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        queryset = Comment.objects.all()
+        queryset = Comment.objects.select_related('user')
         post_id = self.request.query_params.get('post')
         if post_id:
             queryset = queryset.filter(post_id=post_id)
-        return queryset.order_by('-created_at')
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        """Commentaires d'un post (?post= obligatoire), pagination par curseur."""
+        try:
+            post_id = uuid.UUID(request.query_params.get('post'))
+        except (TypeError, ValueError):
+            return Response({'detail': "Paramètre 'post' requis (identifiant de post)."}, status=status.HTTP_400_BAD_REQUEST)
+        self.post = get_object_or_404(Post.objects.only('id', 'comments_count'), pk=post_id)
+        return super().list(request, *args, **kwargs)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data, count=self.post.comments_count)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    @action(detail=False, methods=['get'])
+    def threads(self, request):
+        """
+        Fils d'un post (?post=) : commentaires de premier niveau, pagination par
+        curseur, chacun avec ses premières réponses (?replies=), leur nombre et
+        le lien vers la suite. Deux requêtes indexées par page de fils.
+        """
+        post_id = request.query_params.get('post')
+        try:
+            post_id = uuid.UUID(post_id)
+        except (TypeError, ValueError):
+            return Response({'detail': "Paramètre 'post' requis (identifiant de post)."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = int(request.query_params.get('replies', settings.COMMENT_THREAD_REPLIES))
+        except ValueError:
+            return Response({'detail': "'replies' doit être un entier."}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(0, min(limit, settings.COMMENT_THREAD_REPLIES_MAX))
+
+        roots = Comment.objects.filter(post_id=post_id, parent_comment__isnull=True).select_related('user')
+        paginator = ThreadPagination()
+        page = paginator.paginate_queryset(roots, request, view=self)
+        self.attach_replies(page, limit)
+        serializer = CommentThreadSerializer(page, many=True, context=self.get_serializer_context())
+        return paginator.get_paginated_response(serializer.data)
+
+    def attach_replies(self, roots, limit):
+        """
+        Les `limit` premières réponses de chaque fil en une requête : ROW_NUMBER()
+        par fil sur l'index (thread, created_at), plus le total du fil.
+        """
+        by_thread = {root.pk: root for root in roots}
+        for root in roots:
+            root.replies_count, root.first_replies, root.replies_next = 0, [], None
+        if not roots:
+            return
+
+        # Une réponse de plus que demandé : elle positionne le curseur de la suite.
+        replies = (
+            Comment.objects.filter(thread_id__in=by_thread, depth__gt=0)
+            .annotate(
+                rank=Window(RowNumber(), partition_by=F('thread_id'), order_by=ReplyPagination.ordering),
+                thread_size=Window(Count('pk'), partition_by=F('thread_id')),
+            )
+            .filter(rank__lte=limit + 1)
+            .select_related('user')
+            .order_by('thread_id', 'rank')
+        )
+        following = {}
+        for reply in replies:
+            root = by_thread[reply.thread_id]
+            root.replies_count = reply.thread_size
+            if reply.rank <= limit:
+                root.first_replies.append(reply)
+            else:
+                following[root.pk] = reply
+
+        for root_id, reply in following.items():
+            root = by_thread[root_id]
+            url = self.request.build_absolute_uri(reverse('comment-replies', args=[root_id]))
+            root.replies_next = ReplyPagination().next_link_after(url, root.first_replies, reply)
+
+    @action(detail=True, methods=['get'])
+    def replies(self, request, pk=None):
+        """Réponses du fil de ce commentaire (tous niveaux, ordre chronologique, curseur)."""
+        comment = self.get_object()
+        queryset = Comment.objects.filter(thread_id=comment.thread_id, depth__gt=0).select_related('user')
+        paginator = ReplyPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = CommentSerializer(page, many=True, context=self.get_serializer_context())
+        return paginator.get_paginated_response(serializer.data)
+
 
 class FriendshipViewSet(viewsets.ModelViewSet):
     serializer_class = FriendshipSerializer
@@ -405,7 +1015,7 @@ class FriendshipViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return Friendship.objects.filter(
             Q(requester=self.request.user) | Q(addressee=self.request.user)
-        )
+        ).select_related('requester', 'addressee')
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -480,27 +1090,41 @@ class MediaUploadView(viewsets.ViewSet):
         file_obj = request.FILES.get('file')
         if not file_obj:
             return Response({'error': 'Aucun fichier fourni'}, status=400)
-        
-        # 1. Extraire l'extension et préparer un nom unique
-        ext = file_obj.name.split('.')[-1].lower()
-        # On définit le nom du fichier (Cloudinary créera les dossiers automatiquement)
-        filename = f"uploads/{request.user.id}/{uuid.uuid4()}.{ext}"
-        
-        # 2. Sauvegarder le fichier
-        # Si DEFAULT_FILE_STORAGE est configuré sur Cloudinary, 
-        # cette ligne envoie le fichier directement sur leurs serveurs.
-        path = default_storage.save(filename, ContentFile(file_obj.read()))
-        
-        # 3. RÉCUPÉRATION DE L'URL (LA CORRECTION EST ICI)
-        # default_storage.url(path) détecte automatiquement si l'image est sur Cloudinary 
-        # et renvoie l'URL complète commençant par https://res.cloudinary.com/...
-        url = default_storage.url(path)
-        
-        return Response({
-            'url': url, 
-            'type': 'IMAGE' if ext in ['jpg', 'jpeg', 'png', 'gif', 'webp'] else 'VIDEO'
-        })
-        
+        try:
+            return Response(self.store(request, file_obj))
+        except uploads.UnsupportedMedia as exc:
+            return Response({'error': str(exc)}, status=400)
+
+    def retrieve(self, request, pk=None):
+        """État de l'envoi : l'URL devient l'URL finale une fois le fichier sur le stockage distant."""
+        upload = get_object_or_404(MediaUpload, pk=pk, user=request.user)
+        return Response(uploads.describe(upload, request))
+
+    @staticmethod
+    def store(request, file_obj):
+        """
+        Dépose le fichier en staging local et retourne {'id', 'url', 'type', 'status'}
+        avec une URL provisoire ; l'envoi au stockage distant se fait en arrière-plan.
+        """
+        upload = uploads.stage(request.user, file_obj)
+        return uploads.describe(upload, request)
+
+
+def staged_media(request, path):
+    """
+    URL provisoires des uploads (core/uploads.py), valables jusqu'à l'envoi au
+    stockage distant. Type déduit de l'extension, jamais deviné par le
+    navigateur (nosniff), et téléchargement forcé : même un fichier piégé
+    n'est pas interprété sous l'origine de l'API.
+    """
+    content_type = uploads.MEDIA_TYPES.get(path.rsplit('.', 1)[-1].lower())
+    if content_type is None or not uploads.staging().exists(path):
+        raise Http404
+    response = FileResponse(uploads.staging().open(path), as_attachment=True, content_type=content_type)
+    response['X-Content-Type-Options'] = 'nosniff'
+    return response
+
+
 class GlobalSearchView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -510,23 +1134,26 @@ class GlobalSearchView(APIView):
         if not query:
             return Response({'users': [], 'pages': []}, status=200)
 
-        # 1. Recherche des utilisateurs (Prénom ou Nom)
+        return Response({
+            'users': self.search_users(query),
+            'pages': self.search_pages(query)
+        }, status=status.HTTP_200_OK)
+
+    # Les deux recherches sont indépendantes (la vue async les lance en parallèle).
+    @staticmethod
+    def search_users(query):
+        # Recherche des utilisateurs (Prénom ou Nom)
         users = User.objects.filter(
             Q(first_name__icontains=query) | 
             Q(last_name__icontains=query) |
             Q(email__icontains=query) # Optionnel: recherche par email aussi
         ).distinct()[:10] # On limite à 10 résultats pour la performance
+        return UserSerializer(users, many=True).data
 
-        # 2. Recherche des pages (Nom)
+    @staticmethod
+    def search_pages(query):
+        # Recherche des pages (Nom)
         pages = Page.objects.filter(
             name__icontains=query
         ).distinct()[:10]
-
-        # 3. Sérialisation
-        user_serializer = UserSerializer(users, many=True)
-        page_serializer = PageSerializer(pages, many=True)
-
-        return Response({
-            'users': user_serializer.data,
-            'pages': page_serializer.data
-        }, status=status.HTTP_200_OK)        
\ No newline at end of file
+        return PageSerializer(pages, many=True).data
@@ -1,13 +1,30 @@
+"""
+Générateur de données synthétiques pour les tests de charge.
+
+    python populate_db.py --posts 100000 --workers 4
+
+La taille cible (--posts, de 10k à 10M) détermine le nombre d'utilisateurs,
+d'agences et d'interactions. Les lignes sont insérées par lots avec COPY sur
+PostgreSQL (bulk_create sinon), le mot de passe est haché une seule fois et
+les tables indépendantes peuvent être chargées en parallèle (--workers).
+Les identifiants sont dérivés de (seed, table, index) : chaque processus peut
+recalculer les clés étrangères sans partager de listes en mémoire.
+"""
+import argparse
+import hashlib
+import io
+import json
 import os
 import random
 import uuid
 import sys
 import time
-from datetime import datetime, timedelta
+import multiprocessing
+from contextlib import contextmanager
+from datetime import date, timedelta
+from decimal import Decimal
 from django.utils import timezone
-from django.db import models
 from django.contrib.auth.hashers import make_password
-from django.core.files.uploadedfile import SimpleUploadedFile
 
 _START_TIME = time.time()
 
@@ -20,12 +37,16 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'boost_backend.settings')
 import django
 django.setup()
 
-from core.models import User, Page, Post, Like, Comment, Friendship, Boost
+from django.db import connection, connections, models, transaction
+from core.models import User, Page, PageSubscription, Post, Like, Comment, Share, Friendship, Boost
+from django.db.models import Case, When, F
+from core import counters, interests, locations, versions
 
 # Désactiver les logs de débogage pour le peuplement
 import logging
 logging.disable(logging.INFO)
 
+
 # Données de base - Villes du Cameroun
 CITIES = [
     'Yaoundé', 'Douala', 'Bamenda', 'Bafoussam', 'Garoua', 'Maroua', 'Ngaoundéré',
@@ -59,14 +80,99 @@ COMPANY_NAMES = [
     'Inter-Urbain', 'Jovial', 'Kake Express', 'Kekem Express', 'La Benjamine'
 ]
 
-# Génération des 30 agences de transport
-def get_random_transport_image():
+# Prénoms courants au Cameroun
+FIRST_NAMES_MALE = ['Jean', 'Pierre', 'Thomas', 'Nicolas', 'Alexandre', 'François', 'Serge', 'Alain', 'Eric', 'Christian',
+                    'Patrice', 'André', 'Michel', 'David', 'Olivier', 'Emmanuel', 'Didier', 'Roger', 'Joseph', 'Jacques',
+                    'Paul', 'Daniel', 'Yannick', 'Yves', 'Brice', 'Guy', 'Armel', 'Boris', 'Cédric', 'Désiré',
+                    'Ernest', 'Fabrice', 'Gaston', 'Hervé', 'Ivan', 'Joël', 'Kevin', 'Lionel', 'Marc', 'Noël']
+
+FIRST_NAMES_FEMALE = ['Marie', 'Sophie', 'Julie', 'Laura', 'Sarah', 'Clara', 'Léa', 'Chloé', 'Inès', 'Emma',
+                      'Alice', 'Léna', 'Anna', 'Juliette', 'Charlotte', 'Ambre', 'Amina', 'Béatrice', 'Carine', 'Diane',
+                      'Esther', 'Fabiola', 'Grace', 'Hélène', 'Irène', 'Jessica', 'Karen', 'Laure', 'Mariam', 'Nadège',
+                      'Olga', 'Prisca', 'Rachel', 'Sandra', 'Tatiana', 'Valérie', 'Yvette', 'Zoe', 'Aïcha', 'Brigitte']
+
+# Noms de famille courants au Cameroun
+LAST_NAMES = ['Ngo', 'Tchakounte', 'Ndong', 'Mvogo', 'Tchoupo', 'Nkoulou', 'Aboubakar', 'Anguissa', 'Zambo', 'Choupo-Moting',
+              'Ondoua', 'Kunde', 'Nkoudou', 'Toko', 'N\'Jie', 'Bassogog', 'Fai', 'Oyongo', 'Moukandjo',
+              'Ngadeu', 'Castelletto', 'Ondoa']
+
+EMAIL_DOMAINS = ['gmail.com', 'yahoo.fr', 'hotmail.com', 'outlook.com', 'yahoo.com', 'live.fr', 'icloud.com', 'camnet.cm']
+
+AGENCY_INTERESTS = [
+    'transport', 'mobilité', 'bus', 'taxi', 'moto', 'voyage', 'tourisme',
+    'développement durable', 'urbain', 'innovation', 'afrique', 'cameroun',
+    'entrepreneuriat', 'technologie', 'logistique', 'commerce', 'import-export',
+    'tourisme local', 'découverte', 'aventure', 'randonnée', 'safari', 'nature'
+]
+
+# Centres d'intérêt adaptés au contexte camerounais
+CLIENT_INTERESTS = [
+    # Transport et mobilité
+    'voyage', 'transport', 'mobilité', 'aventure', 'randonnée',
+    # Loisirs
+    'musique', 'danse', 'cinéma', 'sport', 'football', 'basketball', 'tennis',
+    # Culture
+    'art', 'culture', 'littérature', 'histoire', 'patrimoine', 'traditions',
+    # Technologie
+    'technologie', 'informatique', 'réseaux sociaux', 'gaming',
+    # Mode et beauté
+    'mode', 'beauté', 'coiffure', 'esthétique',
+    # Gastronomie
+    'cuisine', 'gastronomie', 'restauration', 'pâtisserie',
+    # Éducation
+    'éducation', 'formation', 'apprentissage', 'langues',
+    # Business
+    'entrepreneuriat', 'business', 'marketing', 'communication',
+    # Santé et bien-être
+    'santé', 'bien-être', 'fitness', 'yoga', 'méditation',
+    # Nature et environnement
+    'nature', 'environnement', 'écologie', 'jardinage',
+    # Autres
+    'photographie', 'lecture', 'écriture', 'voyages', 'découverte',
+    # Spécifiques au Cameroun
+    'culture camerounaise', 'musique africaine', 'danse africaine',
+    'cuisine camerounaise', 'tourisme au Cameroun', 'développement du Cameroun'
+]
+
+COMMENT_CONTENTS = [
+    "Super service !",
+    "J'adore ce nouveau service de transport !",
+    "Très pratique pour mes déplacements quotidiens.",
+    "Je recommande vivement !",
+    "Service de qualité, continuez comme ça !",
+    "Les nouveaux bus sont vraiment confortables.",
+    "Ponctualité au rendez-vous, merci !",
+    "Je suis ravi de cette nouvelle ligne.",
+    "Service client réactif et efficace.",
+    "Je prends ce transport tous les jours, c'est parfait !"
+]
+
+PAGE_POST_CONTENTS = [
+    "J'ai essayé les services de {name}, c'était génial !",
+    "Je recommande vivement {name} pour vos déplacements !",
+    "Une excellente expérience avec {name} aujourd'hui.",
+    "Merci à {name} pour leur service de qualité.",
+    "J'ai été agréablement surpris par les services de {name}."
+]
+
+WALL_POST_CONTENTS = [
+    "Je recherche des recommandations pour un voyage en train.",
+    "Quelqu'un connaît les meilleures lignes de bus pour la ville ?",
+    "Je partage mon expérience de voyage d'aujourd'hui.",
+    "Quelqu'un a déjà essayé le nouveau service de location de vélos ?",
+    "Je cherche un moyen de transport écologique pour me déplacer en ville.",
+    "Avez-vous des astuces pour les déplacements du quotidien ?"
+]
+
+DEFAULT_PASSWORD = 'password123'
+
+def get_random_transport_image(rng=random):
     """Retourne une URL d'image aléatoire liée aux transports au Cameroun"""
     transport_types = [
         'bus', 'taxi', 'moto', 'bush_taxi', 'train', 'bike', 'truck', 'minibus',
         'car_rapide', 'clando', 'bend_skin', 'okada', 'benskin', 'coaster'
     ]
-    transport = random.choice(transport_types)
+    transport = rng.choice(transport_types)
     
     # Utilisation d'Unsplash pour des images libres de droits
     if transport in ['bus', 'taxi', 'train', 'bike', 'truck']:
@@ -86,154 +192,6 @@ def get_random_transport_image():
     
     return f"https://source.unsplash.com/800x600/?{transport_keywords.get(transport, 'african+transport')}"
 
-def generate_agencies():
-    agencies = []
-    used_usernames = set()
-    used_emails = set()
-    
-    for i in range(30):
-        city = random.choice(CITIES)
-        region = random.choice(REGIONS)
-        company_type = random.choice(COMPANY_TYPES)
-        
-        # 70% de chance d'avoir le nom de la ville dans le nom de l'entreprise
-        if random.random() < 0.7:
-            company_name = f"{random.choice(COMPANY_NAMES)} {company_type} {city}"
-        else:
-            company_name = f"{random.choice(COMPANY_NAMES)} {company_type} {region}"
-            
-        base_username = f"{company_name.lower().replace(' ', '_').replace('é','e').replace('è','e')}"
-    
-        username = base_username
-        final_username = username[:30]
-        while final_username in used_usernames:
-            suffix = str(random.randint(1, 9999))
-            candidate = f"{base_username}_{suffix}"
-            username = candidate
-            final_username = username[:30]
-        used_usernames.add(final_username)
-
-        email_domain = random.choice(['gmail.com', 'yahoo.fr', 'hotmail.com', 'outlook.com', 'camnet.cm'])
-        email_local = f"contact_{final_username[:15]}"
-        email = f"{email_local}@{email_domain}"
-
-        # S'assurer que l'email est unique (sans boucle infinie si le prefix reste identique)
-        while email in used_emails:
-            email = f"{email_local}{random.randint(1, 9999)}@{email_domain}"
-        used_emails.add(email)
-        
-        agencies.append({
-            'username': final_username,  # Limiter la longueur du nom d'utilisateur
-            'email': email,
-            'company_name': company_name,
-            'description': f"Service de transport en commun desservant la ville de {city} et ses alentours. Nous nous engageons à fournir un service de qualité pour tous nos usagers.",
-            'city': city,
-            'interests': random.sample(
-                ['transport', 'mobilité', 'bus', 'taxi', 'moto', 'voyage', 'tourisme', 
-                 'développement durable', 'urbain', 'innovation', 'afrique', 'cameroun',
-                 'entrepreneuriat', 'technologie', 'logistique', 'commerce', 'import-export',
-                 'tourisme local', 'découverte', 'aventure', 'randonnée', 'safari', 'nature'],
-                k=random.randint(3, 6)
-            )
-        })
-    
-    return agencies
-
-# Génération de 100 utilisateurs clients
-def generate_clients():
-    # Prénoms courants au Cameroun
-    first_names_male = ['Jean', 'Pierre', 'Thomas', 'Nicolas', 'Alexandre', 'François', 'Serge', 'Alain', 'Eric', 'Christian',
-                       'Patrice', 'André', 'Michel', 'David', 'Olivier', 'Emmanuel', 'Didier', 'Roger', 'Joseph', 'Jacques',
-                       'Paul', 'Daniel', 'Yannick', 'Yves', 'Brice', 'Guy', 'Armel', 'Boris', 'Cédric', 'Désiré',
-                       'Ernest', 'Fabrice', 'Gaston', 'Hervé', 'Ivan', 'Joël', 'Kevin', 'Lionel', 'Marc', 'Noël']
-    
-    first_names_female = ['Marie', 'Sophie', 'Julie', 'Laura', 'Sarah', 'Clara', 'Léa', 'Chloé', 'Inès', 'Emma',
-                         'Alice', 'Léna', 'Anna', 'Juliette', 'Charlotte', 'Ambre', 'Amina', 'Béatrice', 'Carine', 'Diane',
-                         'Esther', 'Fabiola', 'Grace', 'Hélène', 'Irène', 'Jessica', 'Karen', 'Laure', 'Mariam', 'Nadège',
-                         'Olga', 'Prisca', 'Rachel', 'Sandra', 'Tatiana', 'Valérie', 'Yvette', 'Zoe', 'Aïcha', 'Brigitte']
-    
-    # Noms de famille courants au Cameroun
-    last_names = ['Ngo', 'Tchakounte', 'Ndong', 'Mvogo', 'Tchoupo', 'Nkoulou', 'Aboubakar', 'Anguissa', 'Zambo', 'Choupo-Moting',
-                 'Ondoua', 'Kunde', 'Nkoudou', 'Toko', 'Nkoulou', 'N\'Jie', 'Bassogog', 'Fai', 'Oyongo', 'Moukandjo',
-                 'Ngadeu', 'Castelletto', 'Ondoa', 'Ondoua', 'N\'Jie', 'Aboubakar', 'Nkoulou', 'Anguissa', 'Toko', 'Bassogog',
-                 'Nkoudou', 'Ondoua', 'Kunde', 'Ngadeu', 'Oyongo', 'Fai', 'Moukandjo', 'Castelletto', 'Ondoa', 'N\'Jie',
-                 'Toko', 'Bassogog', 'Nkoudou', 'Ondoua', 'Kunde', 'Ngadeu', 'Oyongo', 'Fai', 'Moukandjo', 'Castelletto']
-    
-    clients = []
-    used_usernames = set()
-    used_emails = set()
-    
-    for _ in range(100):
-        # Choisir un genre et un prénom approprié
-        gender = random.choice(['M', 'F'])
-        first_name = random.choice(first_names_male if gender == 'M' else first_names_female)
-        last_name = random.choice(last_names)
-        
-        # Créer un nom d'utilisateur unique
-        base_username = f"{first_name.lower()}.{last_name.lower()}"
-        username = f"{base_username[:25]}{random.randint(1, 99) if random.random() > 0.5 else ''}"
-        while username in used_usernames:
-            suffix = str(random.randint(1, 9999))
-            max_base_len = max(1, 30 - len(suffix))
-            username = f"{base_username[:max_base_len]}{suffix}"
-        used_usernames.add(username)
-        
-        # Créer un email avec des domaines camerounais
-        email_domains = ['gmail.com', 'yahoo.fr', 'hotmail.com', 'outlook.com', 'yahoo.com', 'live.fr', 'icloud.com']
-        email = f"{base_username.replace('.', '')}{random.randint(1, 99)}@{random.choice(email_domains)}"
-        
-        # S'assurer que l'email est unique
-        while email in used_emails:
-            email = f"{base_username.replace('.', '')}{random.randint(1, 999)}@{random.choice(email_domains)}"
-        used_emails.add(email)
-        
-        # Centres d'intérêt adaptés au contexte camerounais
-        interests_pool = [
-            # Transport et mobilité
-            'voyage', 'transport', 'mobilité', 'aventure', 'randonnée',
-            # Loisirs
-            'musique', 'danse', 'cinéma', 'sport', 'football', 'basketball', 'tennis',
-            # Culture
-            'art', 'culture', 'littérature', 'histoire', 'patrimoine', 'traditions',
-            # Technologie
-            'technologie', 'informatique', 'réseaux sociaux', 'gaming',
-            # Mode et beauté
-            'mode', 'beauté', 'coiffure', 'esthétique',
-            # Gastronomie
-            'cuisine', 'gastronomie', 'restauration', 'pâtisserie',
-            # Éducation
-            'éducation', 'formation', 'apprentissage', 'langues',
-            # Business
-            'entrepreneuriat', 'business', 'marketing', 'communication',
-            # Santé et bien-être
-            'santé', 'bien-être', 'fitness', 'yoga', 'méditation',
-            # Nature et environnement
-            'nature', 'environnement', 'écologie', 'jardinage',
-            # Autres
-            'photographie', 'lecture', 'écriture', 'voyages', 'découverte'
-        ]
-        
-        # Ajouter des intérêts spécifiques au Cameroun
-        cameroon_specific = ['culture camerounaise', 'musique africaine', 'danse africaine',
-                           'cuisine camerounaise', 'tourisme au Cameroun', 'développement du Cameroun']
-        
-        # Mélanger les intérêts et en sélectionner entre 4 et 8
-        all_interests = interests_pool + random.sample(cameroon_specific, min(2, len(cameroon_specific)))
-        selected_interests = random.sample(all_interests, k=random.randint(4, 8))
-        
-        clients.append({
-            'first_name': first_name,
-            'last_name': last_name,
-            'username': username[:30],
-            'email': email,
-            'city': random.choice(CITIES),
-            'gender': gender,
-            'birth_date': datetime(1980, 1, 1) + timedelta(days=random.randint(0, 14600)),  # Entre 20 et 60 ans
-            'interests': selected_interests
-        })
-    
-    return clients
-
 POST_CONTENTS = [
     {
         'content': 'Découvrez nos nouveaux bus électriques plus écologiques ! 🌱 #transportvert #mobilitédouce',
@@ -287,382 +245,510 @@ POST_CONTENTS = [
     }
 ]
 
-def create_users_and_pages():
-    # Générer les agences et les clients
-    agencies = generate_agencies()
-    clients = generate_clients()
-    
+
+# --- Dimensionnement et identifiants déterministes ---
+
+class Plan:
+    """Tailles des tables dérivées de la cible --posts, partagées par les workers (fork)."""
+
+    def __init__(self, args):
+        self.seed = args.seed
+        self.posts = args.posts
+        self.users = args.users or max(130, args.posts // 5)
+        self.agencies = max(30, self.users // 40)
+        self.boosts = max(20, args.posts // 500)
+        self.likes_per_post = args.likes_per_post
+        self.comments_per_post = args.comments_per_post
+        self.reply_ratio = args.reply_ratio
+        self.friends_per_user = args.friends_per_user
+        self.batch_size = args.batch_size
+        self.workers = args.workers
+        self.use_copy = connection.vendor == 'postgresql' and not args.no_copy
+        self.now = timezone.now()
+        # Un seul hachage (coûteux par conception) pour tous les comptes.
+        self.password_hash = make_password(DEFAULT_PASSWORD)
+
+    def chunks(self, count):
+        return (count + self.batch_size - 1) // self.batch_size
+
+    def bounds(self, chunk, count):
+        return chunk * self.batch_size, min((chunk + 1) * self.batch_size, count)
+
+
+PLAN = None
+
+
+def _uuid(table, index):
+    """Même (seed, table, index) -> même UUID, dans n'importe quel processus."""
+    digest = hashlib.md5(f"{PLAN.seed}:{table}:{index}".encode()).digest()
+    return uuid.UUID(bytes=digest, version=4)
+
+
+def _rng(table, chunk):
+    return random.Random(f"{PLAN.seed}:{table}:{chunk}")
+
+
+def _past(rng, days):
+    return PLAN.now - timedelta(seconds=rng.randint(0, days * 86400))
+
+
+_AGENCY_CACHE = {}
+
+def _username(base, index):
+    """Nom d'utilisateur unique et reproductible : base tronquée + index de la ligne (30 caractères max)."""
+    suffix = f"_{index}"
+    return f"{base[:30 - len(suffix)]}{suffix}"
+
+
+def _agency_profile(index):
+    """Nom, ville et intérêts d'une agence, communs à l'utilisateur et à sa page."""
+    profile = _AGENCY_CACHE.get(index)
+    if profile is None:
+        rng = _rng('agency', index)
+        city = rng.choice(CITIES)
+        # 70% de chance d'avoir le nom de la ville dans le nom de l'entreprise
+        place = city if rng.random() < 0.7 else rng.choice(REGIONS)
+        profile = {
+            'company_name': f"{rng.choice(COMPANY_NAMES)} {rng.choice(COMPANY_TYPES)} {place}",
+            'city': city,
+            'interests': rng.sample(AGENCY_INTERESTS, k=rng.randint(3, 6)),
+            'domain': rng.choice(EMAIL_DOMAINS),
+        }
+        _AGENCY_CACHE[index] = profile
+    return profile
+
+
+# --- Générateurs de lignes (un lot = un chunk d'une table) ---
+
+def build_users(chunk):
+    rng = _rng('users', chunk)
+    start, end = PLAN.bounds(chunk, PLAN.users)
     users = []
-    agency_users = []
-    client_users = []
+    for i in range(start, end):
+        if i < PLAN.agencies:
+            agency = _agency_profile(i)
+            slug = agency['company_name'].lower().replace(' ', '_').replace('é', 'e').replace('è', 'e')
+            users.append(User(
+                id=_uuid('user', i),
+                username=_username(slug, i),
+                email=f"contact{i}_{slug[:15]}@{agency['domain']}",
+                password=PLAN.password_hash,
+                city=agency['city'],
+                interests=agency['interests'],
+                profile_picture_url=f"https://ui-avatars.com/api/?name={agency['company_name'].replace(' ', '+')}&background=random",
+                cover_photo_url=f"https://source.unsplash.com/random/800x300/?{rng.choice(['african+bus', 'cameroon+transport', 'bush+taxi', 'africa+transport'])}",
+                date_joined=PLAN.now,
+                created_at=_past(rng, 365),
+            ))
+        else:
+            gender = rng.choice(['M', 'F'])
+            first_name = rng.choice(FIRST_NAMES_MALE if gender == 'M' else FIRST_NAMES_FEMALE)
+            last_name = rng.choice(LAST_NAMES)
+            base_username = f"{first_name.lower()}.{last_name.lower()}"
+            users.append(User(
+                id=_uuid('user', i),
+                username=_username(base_username, i),
+                email=f"{base_username.replace('.', '').replace(' ', '')}{i}@{rng.choice(EMAIL_DOMAINS)}",
+                password=PLAN.password_hash,
+                first_name=first_name,
+                last_name=last_name,
+                city=rng.choice(CITIES),
+                gender=gender,
+                birth_date=date(1980, 1, 1) + timedelta(days=rng.randint(0, 14600)),  # Entre 20 et 60 ans
+                interests=rng.sample(CLIENT_INTERESTS, k=rng.randint(4, 8)),
+                profile_picture_url=f"https://randomuser.me/api/portraits/{'men' if gender == 'M' else 'women'}/{rng.randint(1, 99)}.jpg",
+                date_joined=PLAN.now,
+                created_at=_past(rng, 365),
+            ))
+    return users
+
+
+def build_pages(chunk):
+    rng = _rng('pages', chunk)
+    start, end = PLAN.bounds(chunk, PLAN.agencies)
     pages = []
-    
-    _log("Création des utilisateurs agences...")
-    # Création des utilisateurs agences
-    for idx, agency in enumerate(agencies, start=1):
-        # Création de l'utilisateur agence
-        user = User.objects.create_user(
-            username=agency['username'],
-            email=agency['email'],
-            password='password123',  # Mot de passe par défaut
-            city=agency['city'],
-            interests=agency['interests']
-        )
-        
-        # Utiliser des images d'agences de transport africaines
-        user.profile_picture_url = f"https://ui-avatars.com/api/?name={agency['company_name'].replace(' ', '+')}&background=random"
-        
-        # Utiliser des images de transport en Afrique
-        transport_keywords = [
-            'african+bus', 'cameroon+transport', 'african+taxi', 'bush+taxi',
-            'cameroon+travel', 'africa+transport', 'public+transport+africa'
-        ]
-        user.cover_photo_url = f"https://source.unsplash.com/random/800x300/?{random.choice(transport_keywords)}"
-        
-        user.save()
-        users.append(user)
-        agency_users.append(user)
-        
-        # Création de la page de l'agence
-        page = Page.objects.create(
-            owner=user,
+    for i in range(start, end):
+        agency = _agency_profile(i)
+        pages.append(Page(
+            id=_uuid('page', i),
+            owner_id=_uuid('user', i),
             name=agency['company_name'],
-            description=agency['description'],
-            profile_picture_url=user.profile_picture_url,
-            cover_photo_url=user.cover_photo_url,
+            description=f"Service de transport en commun desservant la ville de {agency['city']} et ses alentours. "
+                        f"Nous nous engageons à fournir un service de qualité pour tous nos usagers.",
+            profile_picture_url=f"https://ui-avatars.com/api/?name={agency['company_name'].replace(' ', '+')}&background=random",
+            cover_photo_url=get_random_transport_image(rng),
             category='Transport',
-        )
-        pages.append(page)
+            created_at=_past(rng, 365),
+        ))
+    return pages
 
-        if idx % 5 == 0 or idx == len(agencies):
-            _log(f"Agences: {idx}/{len(agencies)} créées")
-    
-    _log("Création des utilisateurs clients...")
-    # Création des utilisateurs clients
-    for idx, client in enumerate(clients, start=1):
-        user = User.objects.create_user(
-            username=client['username'],
-            email=client['email'],
-            password='password123',  # Mot de passe par défaut
-            first_name=client['first_name'],
-            last_name=client['last_name'],
-            city=client['city'],
-            gender=client['gender'],
-            birth_date=client['birth_date'],
-            interests=client['interests']
-        )
-        
-        # Utilisation d'une API d'avatars avec des visages africains
-        gender_param = 'men' if client['gender'] == 'M' else 'women'
-        user.profile_picture_url = f"https://randomuser.me/api/portraits/{gender_param}/{random.randint(1, 99)}.jpg"
-        
-        # Images de couverture liées au Cameroun
-        cameroon_keywords = [
-            'cameroon+landscape', 'yaounde+city', 'douala+city', 'mount+cameroon',
-            'waza+national+park', 'limbe+beach', 'kribi+beach', 'bamenda+grassfields',
-            'foumban+palace', 'dja+faunal+reserve', 'cameroon+culture', 'african+market'
-        ]
-        user.cover_photo_url = f"https://source.unsplash.com/random/800x300/?{random.choice(cameroon_keywords)}"
-        user.save()
-        users.append(user)
-        client_users.append(user)
-
-        if idx % 20 == 0 or idx == len(clients):
-            _log(f"Clients: {idx}/{len(clients)} créés")
-    
-    return users, agency_users, client_users, pages
 
-def create_posts(agency_users, client_users, pages):
+def build_posts(chunk):
+    rng = _rng('posts', chunk)
+    start, end = PLAN.bounds(chunk, PLAN.posts)
     posts = []
-    _log(f"Création des posts (agences={len(agency_users)}, clients={len(client_users)})")
-    
-    # Créer des posts pour les agences (2-5 par agence)
-    for a_idx, agency_user in enumerate(agency_users, start=1):
-        agency_pages = Page.objects.filter(owner=agency_user)
-        if not agency_pages.exists():
-            continue
-            
-        agency_page = agency_pages.first()
-        num_posts = random.randint(2, 5)
-        
-        for _ in range(num_posts):
-            post_data = random.choice(POST_CONTENTS)
-            post = Post.objects.create(
-                author=agency_user,
-                page=agency_page,
+    for i in range(start, end):
+        created_at = _past(rng, 90)
+        if rng.random() < 0.4:
+            # Publication d'une agence sur sa page
+            agency = rng.randrange(PLAN.agencies)
+            post_data = rng.choice(POST_CONTENTS)
+            posts.append(Post(
+                id=_uuid('post', i), author_id=_uuid('user', agency), page_id=_uuid('page', agency),
                 content=post_data['content'],
                 media=[{"type": post_data['media_type'].upper(), "url": post_data['media_url']}],
-                created_at=timezone.now() - timedelta(days=random.randint(0, 90))
-            )
-            posts.append(post)
-
-        if a_idx % 5 == 0 or a_idx == len(agency_users):
-            _log(f"Posts agences: {a_idx}/{len(agency_users)} auteurs traités (posts={len(posts)})")
-    
-    # Créer des posts pour les utilisateurs clients (0-3 par utilisateur)
-    for c_idx, client_user in enumerate(client_users, start=1):
-        num_posts = random.choices([0, 1, 2, 3], weights=[0.3, 0.4, 0.2, 0.1])[0]
-        
-        for _ in range(num_posts):
-            # 70% de chance de poster sur un mur d'agence, 30% sur son propre mur
-            if random.random() < 0.7 and pages:
-                page = random.choice(pages)
-                post_content = random.choice([
-                    f"J'ai essayé les services de {page.name}, c'était génial !",
-                    f"Je recommande vivement {page.name} pour vos déplacements !",
-                    f"Une excellente expérience avec {page.name} aujourd'hui.",
-                    f"Merci à {page.name} pour leur service de qualité.",
-                    f"J'ai été agréablement surpris par les services de {page.name}."
-                ])
-                post = Post.objects.create(
-                    author=client_user,
-                    page=page,
-                    content=post_content,
-                    media=[],  # Les clients ne peuvent pas ajouter de médias sur les pages d'agence
-                    created_at=timezone.now() - timedelta(days=random.randint(0, 90))
-                )
-            else:
-                # Post sur son propre mur
-                post_content = random.choice([
-                    "Je recherche des recommandations pour un voyage en train.",
-                    "Quelqu'un connaît les meilleures lignes de bus pour la ville ?",
-                    "Je partage mon expérience de voyage d'aujourd'hui.",
-                    "Quelqu'un a déjà essayé le nouveau service de location de vélos ?",
-                    "Je cherche un moyen de transport écologique pour me déplacer en ville.",
-                    "Avez-vous des astuces pour les déplacements du quotidien ?"
-                ])
-                post = Post.objects.create(
-                    author=client_user,
-                    page=None,
-                    content=post_content,
-                    media=[{"type": random.choice(['IMAGE', 'VIDEO']), "url": f"https://source.unsplash.com/random/800x600/?transport,{random.choice(['bus', 'train', 'bike', 'scooter', 'car'])}"}] if random.random() > 0.5 else [],
-                    created_at=timezone.now() - timedelta(days=random.randint(0, 90))
-                )
-            posts.append(post)
-
-        if c_idx % 20 == 0 or c_idx == len(client_users):
-            _log(f"Posts clients: {c_idx}/{len(client_users)} auteurs traités (posts={len(posts)})")
-    
+                created_at=created_at,
+            ))
+        elif rng.random() < 0.7:
+            # Client sur le mur d'une agence (sans média)
+            agency = rng.randrange(PLAN.agencies)
+            posts.append(Post(
+                id=_uuid('post', i), author_id=_uuid('user', rng.randrange(PLAN.agencies, PLAN.users)),
+                page_id=_uuid('page', agency),
+                content=rng.choice(PAGE_POST_CONTENTS).format(name=_agency_profile(agency)['company_name']),
+                media=[],
+                created_at=created_at,
+            ))
+        else:
+            # Client sur son propre mur
+            media = []
+            if rng.random() > 0.5:
+                media = [{"type": rng.choice(['IMAGE', 'VIDEO']), "url": f"https://source.unsplash.com/random/800x600/?transport,{rng.choice(['bus', 'train', 'bike', 'scooter', 'car'])}"}]
+            posts.append(Post(
+                id=_uuid('post', i), author_id=_uuid('user', rng.randrange(PLAN.agencies, PLAN.users)),
+                page_id=None,
+                content=rng.choice(WALL_POST_CONTENTS),
+                media=media,
+                created_at=created_at,
+            ))
     return posts
 
-def create_likes_and_comments(users, posts):
-    # Créer des likes
-    _log(f"Création des likes & commentaires (users={len(users)}, posts={len(posts)})")
-    for p_idx, post in enumerate(posts, start=1):
-        likers = random.sample(users, min(10, len(users)))
-        for user in likers:
-            Like.objects.get_or_create(user=user, post=post)
 
-        if p_idx % 25 == 0 or p_idx == len(posts):
-            _log(f"Likes: {p_idx}/{len(posts)} posts traités")
-    
-    # Créer des commentaires
-    for p_idx, post in enumerate(posts, start=1):
-        commenters = random.sample(users, min(5, len(users)))
-        for user in commenters:
-            Comment.objects.create(
-                user=user,
-                post=post,
-                content=random.choice([
-                    "Super service !",
-                    "J'adore ce nouveau service de transport !",
-                    "Très pratique pour mes déplacements quotidiens.",
-                    "Je recommande vivement !",
-                    "Service de qualité, continuez comme ça !",
-                    "Les nouveaux bus sont vraiment confortables.",
-                    "Ponctualité au rendez-vous, merci !",
-                    "Je suis ravi de cette nouvelle ligne.",
-                    "Service client réactif et efficace.",
-                    "Je prends ce transport tous les jours, c'est parfait !"
-                ]),
-                created_at=post.created_at + timedelta(minutes=random.randint(1, 1440))
+def build_likes(chunk):
+    rng = _rng('likes', chunk)
+    start, end = PLAN.bounds(chunk, PLAN.posts)
+    likes = []
+    for i in range(start, end):
+        post_id = _uuid('post', i)
+        count = min(rng.randint(0, 2 * PLAN.likes_per_post), PLAN.users)
+        for user_index in rng.sample(range(PLAN.users), count):
+            likes.append(Like(user_id=_uuid('user', user_index), post_id=post_id, created_at=_past(rng, 90)))
+    return likes
+
+
+def build_comments(chunk):
+    rng = _rng('comments', chunk)
+    start, end = PLAN.bounds(chunk, PLAN.posts)
+    comments = []
+    for i in range(start, end):
+        post_id = _uuid('post', i)
+        thread = []
+        for c in range(rng.randint(0, 2 * PLAN.comments_per_post)):
+            comment = Comment(
+                id=_uuid('comment', f"{i}:{c}"),
+                user_id=_uuid('user', rng.randrange(PLAN.users)),
+                post_id=post_id,
+                content=rng.choice(COMMENT_CONTENTS),
+                created_at=_past(rng, 90),
             )
-
-        if p_idx % 25 == 0 or p_idx == len(posts):
-            _log(f"Commentaires: {p_idx}/{len(posts)} posts traités")
-
-def create_friendships(users):
-    # Créer des relations d'amitié
-    _log(f"Création des relations d'amitié (users={len(users)})")
-    for u_idx, user in enumerate(users, start=1):
-        # Déterminer le nombre d'amis (entre 5 et 20% des autres utilisateurs)
-        num_friends = min(
-            max(5, int(len(users) * random.uniform(0.05, 0.2))),  # Entre 5 et 20% des utilisateurs
-            len(users) - 1
-        )
-        
-        # Sélectionner des amis aléatoires
-        potential_friends = [u for u in users if u != user]
-        friends = random.sample(potential_friends, min(num_friends, len(potential_friends)))
-        
-        for friend in friends:
-            # Vérifier si une relation d'amitié existe déjà dans un sens ou dans l'autre
-            existing = Friendship.objects.filter(
-                (models.Q(requester=user, addressee=friend) | 
-                 models.Q(requester=friend, addressee=user))
-            ).exists()
-            
-            if not existing:
-                # Créer une relation d'amitié (seulement dans un sens)
-                status = 'ACCEPTED' if random.random() > 0.2 else 'PENDING'
-                Friendship.objects.create(
-                    requester=user,
-                    addressee=friend,
-                    status=status,
-                    created_at=timezone.now() - timedelta(days=random.randint(1, 30))
-                )
-                
-                # Si la demande est acceptée, créer la relation inverse
-                if status == 'ACCEPTED' and random.random() > 0.5:
-                    Friendship.objects.create(
-                        requester=friend,
-                        addressee=user,
-                        status='ACCEPTED',
-                        created_at=timezone.now() - timedelta(days=random.randint(1, 30))
-                    )
-
-        if u_idx % 10 == 0 or u_idx == len(users):
-            _log(f"Amitiés: {u_idx}/{len(users)} utilisateurs traités")
-
-def create_boosts(users, posts, pages):
-    # Créer des boosts pour certaines publications et pages
-    for _ in range(20):  # Créer 20 boosts
-        user = random.choice(users)
-        target_type = random.choice(['POST', 'PAGE'])
-        
-        if target_type == 'POST':
-            target = random.choice(posts)
-            target_id = target.id
+            # bulk_create contourne le signal : fil et profondeur renseignés ici.
+            parent = rng.choice(thread) if thread and rng.random() < PLAN.reply_ratio else None
+            if parent is None:
+                comment.thread_id, comment.depth = comment.id, 0
+            else:
+                comment.parent_comment_id = parent.id
+                comment.thread_id, comment.depth = parent.thread_id, parent.depth + 1
+                comment.created_at = min(PLAN.now, parent.created_at + timedelta(minutes=rng.randint(1, 720)))
+            thread.append(comment)
+            comments.append(comment)
+    return comments
+
+
+def build_friendships(chunk):
+    """
+    Chaque utilisateur i ne demande que des utilisateurs j > i ; la relation
+    inverse (j -> i) n'est créée que depuis le lot de i. Les couples
+    (requester, addressee) sont donc uniques sans aucune lecture en base.
+    """
+    rng = _rng('friendships', chunk)
+    start, end = PLAN.bounds(chunk, PLAN.users)
+    friendships = []
+    for i in range(start, end):
+        candidates = range(i + 1, PLAN.users)
+        count = min(rng.randint(0, 2 * PLAN.friends_per_user), len(candidates))
+        for j in rng.sample(candidates, count):
+            status = 'ACCEPTED' if rng.random() > 0.2 else 'PENDING'
+            friendships.append(Friendship(
+                requester_id=_uuid('user', i), addressee_id=_uuid('user', j),
+                status=status, created_at=_past(rng, 30),
+            ))
+            # Si la demande est acceptée, créer parfois la relation inverse
+            if status == 'ACCEPTED' and rng.random() > 0.5:
+                friendships.append(Friendship(
+                    requester_id=_uuid('user', j), addressee_id=_uuid('user', i),
+                    status='ACCEPTED', created_at=_past(rng, 30),
+                ))
+    return friendships
+
+
+def build_subscriptions(chunk):
+    rng = _rng('subscriptions', chunk)
+    start, end = PLAN.bounds(chunk, PLAN.users)
+    subscriptions = []
+    for i in range(max(start, PLAN.agencies), end):
+        for agency in rng.sample(range(PLAN.agencies), rng.randint(0, 3)):
+            subscriptions.append(PageSubscription(
+                user_id=_uuid('user', i), page_id=_uuid('page', agency), subscribed_at=_past(rng, 180),
+            ))
+    return subscriptions
+
+
+def build_boosts(chunk):
+    rng = _rng('boosts', chunk)
+    start, end = PLAN.bounds(chunk, PLAN.boosts)
+    boosts = []
+    for i in range(start, end):
+        agency = rng.randrange(PLAN.agencies)
+        if rng.random() < 0.5:
+            target_type, target_id = 'POST', _uuid('post', rng.randrange(PLAN.posts))
         else:
-            target = random.choice(pages)
-            target_id = target.id
-        
-        start_date = timezone.now() - timedelta(days=random.randint(1, 10))
-        end_date = start_date + timedelta(days=random.randint(5, 30))
-        
-        Boost.objects.create(
-            user=user,
+            target_type, target_id = 'PAGE', _uuid('page', agency)
+        start_date = PLAN.now - timedelta(days=rng.randint(1, 10))
+        age_min = rng.randint(18, 25)
+        boost = Boost(
+            id=_uuid('boost', i),
+            user_id=_uuid('user', agency),
             target_id=target_id,
             target_type=target_type,
-            budget=random.uniform(50, 500),
+            budget=Decimal(str(round(rng.uniform(50, 500), 2))),
             start_date=start_date,
-            end_date=end_date,
-            status=random.choices(
-                ['ACTIVE', 'PAUSED', 'COMPLETED'],
-                weights=[0.6, 0.2, 0.2],
-                k=1
-            )[0],
-            audience_location=random.choice(['France', 'Europe', 'Monde']),
-            audience_age_min=random.randint(18, 25),
-            audience_age_max=random.randint(26, 65),
-            audience_gender=random.choice(['M', 'F', None]),
-            audience_interests=random.sample(
-                ['transport', 'voyage', 'mobilité', 'écologie', 'technologie'],
-                k=random.randint(1, 3)
-            )
+            end_date=start_date + timedelta(days=rng.randint(5, 30)),
+            status=rng.choices(['ACTIVE', 'PAUSED', 'COMPLETED'], weights=[0.6, 0.2, 0.2], k=1)[0],
+            audience_location=rng.choice(CITIES + REGIONS + [None]),
+            audience_age_min=age_min,
+            audience_age_max=rng.randint(max(26, age_min), 65),
+            audience_gender=rng.choice(['M', 'F', None]),
+            audience_interests=rng.sample(['transport', 'voyage', 'mobilité', 'écologie', 'technologie'], k=rng.randint(1, 3)),
         )
+        boost.calculate_weight()  # bulk_create / COPY ne passent pas par save()
+        boosts.append(boost)
+    return boosts
+
+
+# table -> (modèle, générateur, nombre de lignes "pilotes" qui définit les lots)
+TABLES = {
+    'users': (User, build_users, lambda: PLAN.users),
+    'pages': (Page, build_pages, lambda: PLAN.agencies),
+    'posts': (Post, build_posts, lambda: PLAN.posts),
+    'friendships': (Friendship, build_friendships, lambda: PLAN.users),
+    'subscriptions': (PageSubscription, build_subscriptions, lambda: PLAN.users),
+    'likes': (Like, build_likes, lambda: PLAN.posts),
+    'comments': (Comment, build_comments, lambda: PLAN.posts),
+    'boosts': (Boost, build_boosts, lambda: PLAN.boosts),
+}
+
+# Les tables d'une même étape sont indépendantes entre elles et peuvent être
+# chargées en parallèle ; une étape ne commence qu'une fois la précédente finie.
+STAGES = [
+    ['users'],
+    ['pages'],
+    ['posts', 'friendships', 'subscriptions'],
+    ['likes', 'comments', 'boosts'],
+]
+
+
+# --- Écriture ---
+
+def _copy_value(field, value):
+    if value is None:
+        return '\\N'
+    if isinstance(field, models.JSONField):
+        value = json.dumps(value, ensure_ascii=False)
+    elif isinstance(value, bool):
+        return 't' if value else 'f'
+    else:
+        value = str(value)
+    return value.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def _copy(model, objs):
+    """COPY ... FROM STDIN (format texte) : le chemin le plus rapide sur PostgreSQL."""
+    fields = [
+        f for f in model._meta.concrete_fields
+        if not (f.primary_key and isinstance(f, models.AutoField))
+    ]
+    buffer = io.StringIO()
+    for obj in objs:
+        buffer.write('\t'.join(_copy_value(f, getattr(obj, f.attname)) for f in fields))
+        buffer.write('\n')
+    buffer.seek(0)
+
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(f.column) for f in fields)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(f"COPY {quote(model._meta.db_table)} ({columns}) FROM STDIN", buffer)
+
+
+@contextmanager
+def _explicit_timestamps(model):
+    """bulk_create applique auto_now_add : on le suspend pour garder les dates générées."""
+    fields = [f for f in model._meta.concrete_fields if getattr(f, 'auto_now_add', False)]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def load_chunk(task):
+    table, chunk = task
+    model, build, _ = TABLES[table]
+    started = time.time()
+    objs = build(chunk)
+    if objs:
+        with transaction.atomic():
+            if PLAN.use_copy:
+                _copy(model, objs)
+            else:
+                with _explicit_timestamps(model):
+                    model.objects.bulk_create(objs, batch_size=PLAN.batch_size)
+    return table, len(objs), time.time() - started
+
+
+def run_stage(tables):
+    tasks = [(table, chunk) for table in tables for chunk in range(PLAN.chunks(TABLES[table][2]()))]
+    counts = dict.fromkeys(tables, 0)
+    durations = dict.fromkeys(tables, 0.0)
+    started = time.time()
+
+    if PLAN.workers > 1 and len(tasks) > 1:
+        # Chaque processus ouvre sa propre connexion : on ferme celle du parent avant le fork.
+        connections.close_all()
+        with multiprocessing.get_context('fork').Pool(PLAN.workers) as pool:
+            results = list(pool.imap_unordered(load_chunk, tasks))
+    else:
+        results = [load_chunk(task) for task in tasks]
+
+    for table, count, duration in results:
+        counts[table] += count
+        durations[table] += duration
+
+    # Débit par table mesuré sur le temps cumulé de ses lots (indépendant du parallélisme).
+    for table, count in counts.items():
+        rate = count / max(durations[table], 1e-6)
+        _log(f"{table}: {count} lignes, {durations[table]:.1f}s de travail ({rate:,.0f} lignes/s)")
+    _log(f"Étape terminée en {time.time() - started:.1f}s")
+    return counts
+
+
+def clear_tables():
+    # Vider les tables existantes (attention, cette opération est destructrice)
+    if connection.vendor == 'postgresql':
+        tables = ', '.join(m._meta.db_table for m in (Like, Comment, Share, Boost, Post, PageSubscription, Page, Friendship))
+        with connection.cursor() as cursor:
+            cursor.execute(f"TRUNCATE {tables} CASCADE")
+    else:
+        for model in (Like, Comment, Share, Boost, Post, PageSubscription, Page, Friendship):
+            model.objects.all().delete()
+    deleted, _ = User.objects.exclude(is_superuser=True).delete()
+    _log(f"Tables vidées ({deleted} lignes utilisateurs supprimées, superusers conservés)")
+
+
+def show_suggestions(sample=3):
+    """
+    Aperçu des suggestions d'amis (intérêts communs, bonus même ville).
+    Les intérêts communs sont comptés en SQL : popcount(masque & masque).
+    """
+    others = User.objects.exclude(is_superuser=True)
+    for user in others.values('id', 'username', 'city', 'interests_mask')[PLAN.agencies:PLAN.agencies + sample]:
+        candidates = others.exclude(id=user['id']).annotate(
+            common=interests.shared('interests_mask', user['interests_mask'])
+        ).filter(common__gt=0)
+        if user['city']:
+            score = Case(When(city=user['city'], then=F('common') * 2), default=F('common'))
+        else:
+            score = F('common')
+        suggestions = candidates.annotate(score=score).order_by('-score').values('username', 'city', 'common')[:5]
+
+        print(f"\nSuggestions pour {user['username']}:")
+        for i, suggested in enumerate(suggestions, 1):
+            print(f"  {i}. {suggested['username']} (Ville: {suggested['city'] or 'Inconnue'}, Intérêts communs: {suggested['common']})")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Génère un jeu de données synthétique pour les tests de charge.")
+    parser.add_argument('--posts', type=int, default=10_000, help="Nombre cible de publications (10k à 10M)")
+    parser.add_argument('--users', type=int, default=None, help="Nombre d'utilisateurs (défaut: posts / 5)")
+    parser.add_argument('--likes-per-post', type=int, default=5, help="Likes moyens par publication")
+    parser.add_argument('--comments-per-post', type=int, default=2, help="Commentaires moyens par publication")
+    parser.add_argument('--reply-ratio', type=float, default=0.3, help="Part des commentaires qui répondent à un autre")
+    parser.add_argument('--friends-per-user', type=int, default=8, help="Demandes d'amitié moyennes par utilisateur")
+    parser.add_argument('--batch-size', type=int, default=5000, help="Lignes par lot (COPY ou bulk_create)")
+    parser.add_argument('--workers', type=int, default=1, help="Processus parallèles par étape")
+    parser.add_argument('--seed', type=int, default=42, help="Graine : même graine, mêmes données")
+    parser.add_argument('--no-copy', action='store_true', help="Forcer bulk_create même sur PostgreSQL")
+    return parser.parse_args()
 
-def create_suggestions(users):
-    """Créer des suggestions d'amis basées sur des intérêts communs et la localisation."""
-    _log("Création des suggestions d'amis...")
-    
-    for u_idx, user in enumerate(users, start=1):
-        # Pour chaque utilisateur, trouver des utilisateurs avec des intérêts similaires
-        similar_users = []
-        
-        # Chercher des utilisateurs avec des intérêts similaires
-        if hasattr(user, 'interests') and user.interests:
-            for other_user in User.objects.exclude(id=user.id):
-                if hasattr(other_user, 'interests') and other_user.interests:
-                    # Compter les intérêts communs
-                    common_interests = set(user.interests) & set(other_user.interests)
-                    if common_interests:
-                        # Ajouter un poids pour la même ville
-                        city_bonus = 2 if user.city and user.city == other_user.city else 1
-                        similar_users.append((other_user, len(common_interests) * city_bonus))
-        
-        # Trier par similarité et prendre les 10 premiers
-        similar_users.sort(key=lambda x: x[1], reverse=True)
-        suggested_users = [u[0] for u in similar_users[:10]]
-        
-        # Ajouter des suggestions aléatoires si nécessaire
-        while len(suggested_users) < 10:
-            random_user = random.choice([u for u in User.objects.exclude(id=user.id) if u not in suggested_users])
-            suggested_users.append(random_user)
-            if len(suggested_users) >= 10:
-                break
-        
-        # Stocker les suggestions dans le profil utilisateur (ou dans une table dédiée en production)
-        # Ici, on se contente de les afficher
-        if u_idx <= 3:
-            print(f"\nSuggestions pour {user.username}:")
-            for i, suggested in enumerate(suggested_users[:5], 1):
-                common = set(getattr(user, 'interests', [])) & set(getattr(suggested, 'interests', []))
-                print(f"  {i}. {suggested.username} (Ville: {suggested.city or 'Inconnue'}, Intérêts communs: {len(common)})")
-
-        if u_idx % 20 == 0 or u_idx == len(users):
-            _log(f"Suggestions: {u_idx}/{len(users)} utilisateurs traités")
 
 def main():
+    global PLAN
+    PLAN = Plan(parse_args())
+
     _log("Début du peuplement de la base de données...")
-    
-    # Vider les tables existantes (attention, cette opération est destructrice)
-    _log("Vidage des tables existantes...")
-    before_users = User.objects.exclude(is_superuser=True).count()
-    User.objects.exclude(is_superuser=True).delete()
-    after_users = User.objects.exclude(is_superuser=True).count()
-    _log(f"Users supprimés (hors superuser): {before_users - after_users}")
-    
-    # Créer les utilisateurs et les pages
-    _log("Création des utilisateurs et des pages...")
-    all_users, agency_users, client_users, pages = create_users_and_pages()
-    
-    # Créer des publications
-    _log("Création des publications...")
-    posts = create_posts(agency_users, client_users, pages)
-    
-    # Ajouter des likes et des commentaires
-    _log("Ajout des likes et commentaires...")
-    create_likes_and_comments(all_users, posts)
-    
-    # Créer des relations d'amitié
-    _log("Création des relations d'amitié et des invitations...")
-    create_friendships(all_users)
-    
-    # Créer des suggestions d'amis
-    create_suggestions(client_users)
-    
-    # Créer des boosts (uniquement pour les agences)
-    _log("Création des boosts...")
-    create_boosts(agency_users, posts, pages)
+    _log(f"Cible: {PLAN.posts} posts, {PLAN.users} utilisateurs dont {PLAN.agencies} agences, "
+         f"{PLAN.boosts} boosts ({'COPY' if PLAN.use_copy else 'bulk_create'}, {PLAN.workers} worker(s))")
+    clear_tables()
+
+    totals = {}
+    for tables in STAGES:
+        _log(f"Étape: {', '.join(tables)}")
+        totals.update(run_stage(tables))
+
+    if connection.vendor == 'postgresql':
+        _log("ANALYZE des tables chargées...")
+        with connection.cursor() as cursor:
+            for model, _, _ in TABLES.values():
+                cursor.execute(f"ANALYZE {model._meta.db_table}")
+
+    # Les insertions en masse ne déclenchent pas les signaux : masques d'intérêts,
+    # clés de localisation, compteurs et ETag sont mis à jour ici.
+    _log(f"Masques des centres d'intérêt: {interests.rebuild_masks()} lignes mises à jour")
+    _log(f"Clés de localisation: {locations.rebuild_keys()} lignes mises à jour")
+    _log(f"Compteurs de commentaires: {counters.rebuild_comment_counts()} posts mis à jour")
+    _log(f"Compteurs d'abonnés: {counters.rebuild_subscriber_counts()} pages mises à jour")
+    versions.bump('feed', 'users')
+
+    show_suggestions()
 
-    _log("Calcul des statistiques...")
-    
     # Statistiques
     print("\n" + "="*50)
     print("PEUPLEMENT TERMINÉ AVEC SUCCÈS !")
     print("="*50)
-    print(f"- {len(all_users)} utilisateurs au total")
-    print(f"  - {len(agency_users)} comptes agences")
-    print(f"  - {len(client_users)} comptes clients")
-    print(f"- {len(pages)} pages d'agences créées")
-    print(f"- {len(posts)} publications créées")
-    print(f"- {Like.objects.count()} likes")
-    print(f"- {Comment.objects.count()} commentaires")
-    print(f"- {Friendship.objects.count()} relations d'amitié")
-    print(f"- {Boost.objects.count()} boosts créés")
-    
+    print(f"- {totals['users']} utilisateurs au total")
+    print(f"  - {PLAN.agencies} comptes agences")
+    print(f"  - {PLAN.users - PLAN.agencies} comptes clients")
+    print(f"- {totals['pages']} pages d'agences créées")
+    print(f"- {totals['posts']} publications créées")
+    print(f"- {totals['likes']} likes")
+    print(f"- {totals['comments']} commentaires")
+    print(f"- {totals['friendships']} relations d'amitié")
+    print(f"- {totals['subscriptions']} abonnements aux pages")
+    print(f"- {totals['boosts']} boosts créés")
+
     # Afficher quelques identifiants de connexion
-    print("\nQuelques identifiants de connexion (mot de passe: password123):")
+    print(f"\nQuelques identifiants de connexion (mot de passe: {DEFAULT_PASSWORD}):")
     print("\n--- COMPTES AGENCES ---")
-    for user in agency_users[:3]:  # Afficher 3 comptes agences
-        print(f"Email: {user.email}")
-    
+    for email in User.objects.filter(id__in=[_uuid('user', i) for i in range(3)]).values_list('email', flat=True):
+        print(f"Email: {email}")
+
     print("\n--- COMPTES CLIENTS ---")
-    for user in client_users[:5]:  # Afficher 5 comptes clients
-        print(f"Email: {user.email}")
-    
-    print("\nPour vous connecter, utilisez l'un des emails ci-dessus avec le mot de passe: password123")
+    clients = [_uuid('user', i) for i in range(PLAN.agencies, PLAN.agencies + 5)]
+    for email in User.objects.filter(id__in=clients).values_list('email', flat=True):
+        print(f"Email: {email}")
+
+    print(f"\nPour vous connecter, utilisez l'un des emails ci-dessus avec le mot de passe: {DEFAULT_PASSWORD}")
 
 if __name__ == "__main__":
     main()